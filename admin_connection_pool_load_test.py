@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Admin Connection Pool Load Test
+Fires concurrent authenticated admin requests and checks they are served from the shared
+MongoDB pool instead of opening connections per request.
+
+    python admin_connection_pool_load_test.py --base-url http://localhost:8001
+    python admin_connection_pool_load_test.py --mongo-url mongodb://localhost:27017   # also check serverStatus
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+
+import aiohttp
+
+ADMIN_ENDPOINTS = [
+    "/api/admin/me",
+    "/api/admin/dashboard/stats",
+    "/api/admin/articles/?limit=20",
+    "/api/admin/users?limit=20",
+    "/api/admin/media/?limit=20",
+    "/api/admin/homepage/content",
+]
+
+class AdminPoolLoadTester:
+    def __init__(self, base_url: str, username: str, password: str):
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+        self.headers = {}
+        self.test_results = []
+
+    def log_test(self, test_name: str, success: bool, message: str):
+        """Log test results"""
+        result = {
+            "test": test_name,
+            "success": success,
+            "message": message,
+            "timestamp": datetime.now().isoformat()
+        }
+        self.test_results.append(result)
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+
+    async def login(self, session: aiohttp.ClientSession):
+        async with session.post(
+            f"{self.base_url}/api/admin/login",
+            json={"username": self.username, "password": self.password}
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Admin login failed: HTTP {response.status}")
+            token = (await response.json())["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    async def pool_stats(self, session: aiohttp.ClientSession) -> dict:
+        async with session.get(f"{self.base_url}/api/admin/system/health", headers=self.headers) as response:
+            health = await response.json()
+        return health["database_pool"]
+
+    async def fire(self, session: aiohttp.ClientSession, total: int, concurrency: int) -> dict:
+        """Send `total` admin requests round-robin over ADMIN_ENDPOINTS, `concurrency` at a time"""
+        remaining = total
+        errors = 0
+
+        async def worker(offset: int):
+            nonlocal remaining, errors
+            i = offset
+            while remaining > 0:
+                remaining -= 1
+                path = ADMIN_ENDPOINTS[i % len(ADMIN_ENDPOINTS)]
+                i += 1
+                try:
+                    async with session.get(f"{self.base_url}{path}", headers=self.headers) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                except Exception:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {"requests": total, "errors": errors, "seconds": round(elapsed, 2),
+                "requests_per_second": round(total / elapsed, 1) if elapsed else None}
+
+    def server_connections_created(self, mongo_url: str):
+        """Connections ever accepted by mongod (serverStatus), or None if unavailable"""
+        try:
+            from pymongo import MongoClient
+            client = MongoClient(mongo_url, maxPoolSize=1)
+            created = client.admin.command("serverStatus")["connections"]["totalCreated"]
+            client.close()
+            return created
+        except Exception as e:
+            print(f"⚠️ serverStatus unavailable: {str(e)}")
+            return None
+
+    async def run(self, total: int, concurrency: int, mongo_url: str = None) -> dict:
+        print(f"🚀 Admin pool load test against {self.base_url}: {total} requests, concurrency {concurrency}")
+        print("=" * 60)
+
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await self.login(session)
+
+            # Warm the pool so the measured window only shows connections the load itself needs
+            await self.fire(session, concurrency, concurrency)
+
+            server_before = self.server_connections_created(mongo_url) if mongo_url else None
+            before = await self.pool_stats(session)
+            load = await self.fire(session, total, concurrency)
+            after = await self.pool_stats(session)
+            server_after = self.server_connections_created(mongo_url) if mongo_url else None
+
+        created = after["connections_created"] - before["connections_created"]
+        checkouts = after["checkouts"] - before["checkouts"]
+
+        self.log_test("Load completed", load["errors"] == 0,
+                      f"{load['requests']} requests in {load['seconds']}s ({load['requests_per_second']} req/s), {load['errors']} errors")
+        self.log_test("Requests used the shared pool", checkouts >= total,
+                      f"{checkouts} connection check-outs for {total} requests")
+        self.log_test("No connections opened per request", created < total and created <= before["max_pool_size"],
+                      f"{created} new connections for {total} requests (pool max {before['max_pool_size']}, "
+                      f"{after['connections_open']} open)")
+        self.log_test("Pool wait time", after["checkout_failures"] == before["checkout_failures"],
+                      f"avg {after['avg_wait_ms']}ms, max {after['max_wait_ms']}ms, "
+                      f"{after['checkout_failures'] - before['checkout_failures']} check-out failures")
+
+        if server_before is not None and server_after is not None:
+            # The two serverStatus calls open one connection each
+            server_created = server_after - server_before - 1
+            self.log_test("mongod connections", server_created < total and server_created <= before["max_pool_size"],
+                          f"{server_created} connections accepted by mongod during the load")
+
+        return {"load": load, "pool_before": before, "pool_after": after, "results": self.test_results}
+
+def main():
+    parser = argparse.ArgumentParser(description="Admin connection pool load test")
+    parser.add_argument("--base-url", default=os.getenv("BENCHMARK_BASE_URL", "http://localhost:8001"))
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mongo-url", default=None, help="Also compare mongod serverStatus connection totals")
+    parser.add_argument("--report", default="admin_connection_pool_report.json")
+    args = parser.parse_args()
+
+    tester = AdminPoolLoadTester(args.base_url, args.username, args.password)
+    report = asyncio.run(tester.run(args.requests, args.concurrency, args.mongo_url))
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+
+    passed = sum(1 for result in tester.test_results if result["success"])
+    print(f"\n📋 {passed}/{len(tester.test_results)} checks passed - saved to {args.report}")
+    raise SystemExit(0 if passed == len(tester.test_results) else 1)
+
+if __name__ == "__main__":
+    main()
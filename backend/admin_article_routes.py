@@ -1,8 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Query
 from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import os
 import uuid
 import shutil
 from pathlib import Path
@@ -13,13 +12,14 @@ from bson import ObjectId
 
 from admin_models import *
 from admin_auth import get_current_admin_user
-from pymongo import MongoClient
-import os
-
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
+from homepage_snapshot import invalidate_homepage_snapshot
+from content_versions import bump_content_version
+from pagination import paginate, cached_count, ADMIN_ARTICLE_SORT
+from search_index import article_search, sync_search_index
+from related_articles import sync_related_articles
+from dashboard_counters import dashboard_counters
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
 
 article_router = APIRouter(prefix="/api/admin/articles", tags=["admin-articles"])
 
@@ -30,17 +30,42 @@ ARTICLE_DIR = UPLOAD_DIR / "articles"
 ARTICLE_DIR.mkdir(exist_ok=True)
 
 @article_router.get("/")
-def get_articles(
+async def get_articles(
     current_admin: AdminUser = Depends(get_current_admin_user),
     page: int = 1,
     limit: int = 10,
     category: Optional[str] = None,
     search: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    search_mode: str = Query("index", regex="^(index|regex)$"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get all articles with pagination and filters"""
+    """Get all articles with pagination and filters; pass next_cursor back as cursor for constant-cost paging
+
+    With a search term, search_mode=index ranks matches by relevance from the search index;
+    search_mode=regex scans title, body and author with the old case-insensitive match.
+    """
     skip = (page - 1) * limit
     
+    if search and search_mode == "index":
+        result = await article_search.search(search, status=status, category=category, offset=skip, limit=limit)
+        articles = await article_search.load_results(result.hits)
+        for article in articles:
+            article["id"] = str(article.get("_id", article.get("id")))
+            if "_id" in article:
+                del article["_id"]
+        return {
+            "articles": articles,
+            "total_count": result.total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (result.total + limit - 1) // limit,
+            "next_cursor": None,
+            "took_ms": result.took_ms
+        }
+    
     # Build query filters
     query = {}
     if category:
@@ -55,8 +80,8 @@ def get_articles(
         ]
     
     # Get articles
-    articles = list(db.articles.find(query).skip(skip).limit(limit).sort([("created_at", -1)]))
-    total_count = db.articles.count_documents(query)
+    articles, next_cursor = await paginate(db.articles, query, ADMIN_ARTICLE_SORT, limit, cursor, skip=skip)
+    total_count = await cached_count(db.articles, query) if include_total else None
     
     # Convert ObjectId to string and ensure id field
     for article in articles:
@@ -69,33 +94,41 @@ def get_articles(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit
+        "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 @article_router.delete("/{article_id}")
-def delete_article(
+async def delete_article(
     article_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete an article"""
     try:
         # Try multiple ways to delete the article
-        result = db.articles.delete_one({"id": article_id})
+        result = await db.articles.delete_one({"id": article_id})
         
         # If no match with custom id, try with _id as ObjectId
         if result.deleted_count == 0:
             try:
-                result = db.articles.delete_one({"_id": ObjectId(article_id)})
+                result = await db.articles.delete_one({"_id": ObjectId(article_id)})
             except:
                 pass
         
         # If still no match, try with _id as string
         if result.deleted_count == 0:
-            result = db.articles.delete_one({"_id": article_id})
+            result = await db.articles.delete_one({"_id": article_id})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Article not found")
         
+        await bump_content_version("articles", changed=[article_id])
+        await invalidate_homepage_snapshot()
+        await sync_search_index(article_id)
+        await sync_related_articles(article_id)
+        await dashboard_counters.article_deleted(article_id)
+        
         return {"message": "Article deleted successfully"}
         
     except HTTPException:
@@ -117,7 +150,8 @@ async def upload_article(
     premium: bool = Form(False),
     reading_time: int = Form(5),
     hero_image_url: str = Form(None),
-    content_file: UploadFile = File(...)
+    content_file: UploadFile = File(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Upload a new article from RTF or text file"""
     try:
@@ -158,7 +192,7 @@ async def upload_article(
         slug = generate_article_slug(title)
         
         # Check if slug already exists
-        existing_article = db.articles.find_one({"slug": slug})
+        existing_article = await db.articles.find_one({"slug": slug})
         if existing_article:
             slug = f"{slug}-{str(uuid.uuid4())[:8]}"
         
@@ -191,7 +225,12 @@ async def upload_article(
         }
         
         # Save to database
-        result = db.articles.insert_one(article_data)
+        result = await db.articles.insert_one(article_data)
+        await bump_content_version("articles", changed=[article_data["id"]])
+        await invalidate_homepage_snapshot()
+        await sync_search_index(article_data["id"])
+        await sync_related_articles(article_data["id"])
+        await dashboard_counters.article_created(article_data)
         
         return {
             "message": "Article uploaded successfully",
@@ -219,7 +258,8 @@ async def update_article(
     premium: Optional[bool] = Form(None),
     reading_time: Optional[int] = Form(None),
     hero_image: Optional[str] = Form(None),
-    status: Optional[str] = Form(None)
+    status: Optional[str] = Form(None),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update an existing article"""
     try:
@@ -233,7 +273,7 @@ async def update_article(
             update_data["title"] = title
             # Update slug if title changed
             new_slug = generate_article_slug(title)
-            existing_with_slug = db.articles.find_one({"slug": new_slug, "id": {"$ne": article_id}})
+            existing_with_slug = await db.articles.find_one({"slug": new_slug, "id": {"$ne": article_id}})
             if existing_with_slug:
                 new_slug = f"{new_slug}-{str(uuid.uuid4())[:8]}"
             update_data["slug"] = new_slug
@@ -265,7 +305,7 @@ async def update_article(
             update_data["status"] = status
         
         # Update article - try multiple query methods
-        result = db.articles.update_one(
+        result = await db.articles.update_one(
             {"id": article_id},
             {"$set": update_data}
         )
@@ -274,7 +314,7 @@ async def update_article(
         if result.matched_count == 0:
             try:
                 from bson import ObjectId
-                result = db.articles.update_one(
+                result = await db.articles.update_one(
                     {"_id": ObjectId(article_id)},
                     {"$set": update_data}
                 )
@@ -283,7 +323,7 @@ async def update_article(
         
         # If still no match, try with _id as string
         if result.matched_count == 0:
-            result = db.articles.update_one(
+            result = await db.articles.update_one(
                 {"_id": article_id},
                 {"$set": update_data}
             )
@@ -291,6 +331,11 @@ async def update_article(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Article not found")
         
+        await bump_content_version("articles", changed=[article_id])
+        await invalidate_homepage_snapshot()
+        await sync_search_index(article_id)
+        await sync_related_articles(article_id)
+        
         return {"message": "Article updated successfully", "updated_fields": len(update_data)}
         
     except Exception as e:
@@ -299,24 +344,25 @@ async def update_article(
 @article_router.get("/{article_id}/edit")
 async def get_article_for_edit(
     article_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get article data for editing"""
     try:
         # Try multiple ways to find the article
-        article = db.articles.find_one({"id": article_id})
+        article = await db.articles.find_one({"id": article_id})
         
         if not article:
             # Try with ObjectId for MongoDB _id field
             try:
                 from bson import ObjectId
-                article = db.articles.find_one({"_id": ObjectId(article_id)})
+                article = await db.articles.find_one({"_id": ObjectId(article_id)})
             except:
                 pass
         
         if not article:
             # Try with _id as string (common in our database)
-            article = db.articles.find_one({"_id": article_id})
+            article = await db.articles.find_one({"_id": article_id})
         
         if not article:
             raise HTTPException(status_code=404, detail="Article not found")
@@ -336,24 +382,25 @@ async def get_article_for_edit(
 @article_router.post("/{article_id}/duplicate")
 async def duplicate_article(
     article_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Duplicate an existing article"""
     try:
         # Get original article - try multiple query methods  
-        original_article = db.articles.find_one({"id": article_id})
+        original_article = await db.articles.find_one({"id": article_id})
         
         if not original_article:
             # Try with ObjectId for MongoDB _id field
             try:
                 from bson import ObjectId
-                original_article = db.articles.find_one({"_id": ObjectId(article_id)})
+                original_article = await db.articles.find_one({"_id": ObjectId(article_id)})
             except:
                 pass
         
         if not original_article:
             # Try with _id as string
-            original_article = db.articles.find_one({"_id": article_id})
+            original_article = await db.articles.find_one({"_id": article_id})
         
         if not original_article:
             raise HTTPException(status_code=404, detail="Article not found")
@@ -374,7 +421,11 @@ async def duplicate_article(
             del new_article["_id"]
         
         # Save duplicate
-        result = db.articles.insert_one(new_article)
+        result = await db.articles.insert_one(new_article)
+        await bump_content_version("articles", changed=[new_article["id"]])
+        await sync_search_index(new_article["id"])
+        await sync_related_articles(new_article["id"])
+        await dashboard_counters.article_created(new_article)
         
         return {
             "message": "Article duplicated successfully",
@@ -389,7 +440,8 @@ async def duplicate_article(
 async def update_article_status(
     article_id: str,
     status: str = Form(...),  # published, draft, archived
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update article status"""
     try:
@@ -397,7 +449,7 @@ async def update_article_status(
         if status not in valid_statuses:
             raise HTTPException(status_code=400, detail="Invalid status")
         
-        result = db.articles.update_one(
+        result = await db.articles.update_one(
             {"id": article_id},
             {
                 "$set": {
@@ -412,7 +464,7 @@ async def update_article_status(
         if result.matched_count == 0:
             try:
                 from bson import ObjectId
-                result = db.articles.update_one(
+                result = await db.articles.update_one(
                     {"_id": ObjectId(article_id)},
                     {
                         "$set": {
@@ -427,7 +479,7 @@ async def update_article_status(
         
         # If still no match, try with _id as string
         if result.matched_count == 0:
-            result = db.articles.update_one(
+            result = await db.articles.update_one(
                 {"_id": article_id},
                 {
                     "$set": {
@@ -441,13 +493,18 @@ async def update_article_status(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Article not found")
         
+        await bump_content_version("articles", changed=[article_id])
+        await invalidate_homepage_snapshot()
+        await sync_search_index(article_id)
+        await sync_related_articles(article_id)
+        
         return {"message": f"Article status updated to {status}"}
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status update failed: {str(e)}")
 
 @article_router.get("/categories/stats")
-async def get_category_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def get_category_stats(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get article statistics by category"""
     try:
         pipeline = [
@@ -463,7 +520,7 @@ async def get_category_stats(current_admin: AdminUser = Depends(get_current_admi
             {"$sort": {"count": -1}}
         ]
         
-        stats = list(db.articles.aggregate(pipeline))
+        stats = await db.articles.aggregate(pipeline).to_list(length=None)
         
         return {"category_stats": stats}
         
@@ -475,7 +532,8 @@ async def bulk_update_articles(
     article_ids: str = Form(...),  # Comma-separated IDs
     action: str = Form(...),  # featured, trending, premium, category, status
     value: str = Form(...),
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Bulk update multiple articles"""
     try:
@@ -508,10 +566,14 @@ async def bulk_update_articles(
             raise HTTPException(status_code=400, detail="Invalid action")
         
         # Update articles
-        result = db.articles.update_many(
+        result = await db.articles.update_many(
             {"id": {"$in": ids}},
             {"$set": update_data}
         )
+        await bump_content_version("articles", changed=ids)
+        await invalidate_homepage_snapshot()
+        await sync_search_index(*ids)
+        await sync_related_articles(*ids)
         
         return {
             "message": f"Bulk update completed: {action} = {value}",
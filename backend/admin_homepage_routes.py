@@ -1,27 +1,26 @@
 from fastapi import APIRouter, HTTPException, Depends, Form
 from fastapi.responses import JSONResponse
-from typing import List, Optional, Dict, Any
+from typing import Optional, Dict, Any
 from datetime import datetime
 import uuid
 
 from admin_models import *
 from admin_auth import get_current_admin_user
-from pymongo import MongoClient
-import os
-
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
+from homepage_snapshot import invalidate_homepage_snapshot
+from section_queries import SectionSpec, run_sections, fetch_articles, POPULAR_SORT
+from trending import trending_ranking
+from pagination import ADMIN_ARTICLE_SORT
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
 
 homepage_router = APIRouter(prefix="/api/admin/homepage", tags=["admin-homepage"])
 
 @homepage_router.get("/content")
-def get_homepage_content(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def get_homepage_content(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get current homepage content configuration"""
     try:
         # Get homepage configuration
-        homepage_config = db.homepage_config.find_one({"active": True})
+        homepage_config = await db.homepage_config.find_one({"active": True})
         
         if not homepage_config:
             # Create default homepage configuration
@@ -48,7 +47,7 @@ def get_homepage_content(current_admin: AdminUser = Depends(get_current_admin_us
                 "updated_by": current_admin.username
             }
             
-            result = db.homepage_config.insert_one(default_config)
+            result = await db.homepage_config.insert_one(default_config)
             homepage_config = default_config
         
         # Convert ObjectId to string
@@ -57,7 +56,7 @@ def get_homepage_content(current_admin: AdminUser = Depends(get_current_admin_us
             del homepage_config["_id"]
         
         # Get actual article data for configured articles
-        homepage_data = populate_homepage_articles(homepage_config)
+        homepage_data = await populate_homepage_articles(homepage_config, db)
         
         return homepage_data
         
@@ -65,19 +64,20 @@ def get_homepage_content(current_admin: AdminUser = Depends(get_current_admin_us
         raise HTTPException(status_code=500, detail=f"Failed to get homepage content: {str(e)}")
 
 @homepage_router.put("/hero")
-def set_hero_article(
+async def set_hero_article(
     article_id: str = Form(...),
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Set the hero article for homepage"""
     try:
         # Verify article exists
-        article = db.articles.find_one({"id": article_id})
+        article = await db.articles.find_one({"id": article_id})
         if not article:
             raise HTTPException(status_code=404, detail="Article not found")
         
         # Update homepage configuration
-        result = db.homepage_config.update_one(
+        result = await db.homepage_config.update_one(
             {"active": True},
             {
                 "$set": {
@@ -88,6 +88,7 @@ def set_hero_article(
             },
             upsert=True
         )
+        await invalidate_homepage_snapshot()
         
         return {"message": "Hero article updated successfully", "article_id": article_id}
         
@@ -95,10 +96,11 @@ def set_hero_article(
         raise HTTPException(status_code=500, detail=f"Failed to set hero article: {str(e)}")
 
 @homepage_router.put("/section/{section_name}")
-def update_homepage_section(
+async def update_homepage_section(
     section_name: str,
     article_ids: str = Form(...),  # Comma-separated article IDs
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update a specific homepage section with selected articles"""
     try:
@@ -117,12 +119,12 @@ def update_homepage_section(
         
         # Verify all articles exist
         for article_id in article_id_list:
-            article = db.articles.find_one({"id": article_id})
+            article = await db.articles.find_one({"id": article_id})
             if not article:
                 raise HTTPException(status_code=404, detail=f"Article {article_id} not found")
         
         # Update homepage configuration
-        result = db.homepage_config.update_one(
+        result = await db.homepage_config.update_one(
             {"active": True},
             {
                 "$set": {
@@ -133,6 +135,7 @@ def update_homepage_section(
             },
             upsert=True
         )
+        await invalidate_homepage_snapshot()
         
         return {
             "message": f"Section {section_name} updated successfully", 
@@ -143,11 +146,12 @@ def update_homepage_section(
         raise HTTPException(status_code=500, detail=f"Failed to update section: {str(e)}")
 
 @homepage_router.get("/articles/available")
-def get_available_articles(
+async def get_available_articles(
     current_admin: AdminUser = Depends(get_current_admin_user),
     category: Optional[str] = None,
     search: Optional[str] = None,
-    limit: int = 50
+    limit: int = 50,
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get available articles for homepage selection"""
     try:
@@ -163,7 +167,7 @@ def get_available_articles(
                 {"author_name": {"$regex": search, "$options": "i"}}
             ]
         
-        articles = list(db.articles.find(query).limit(limit).sort([("created_at", -1)]))
+        articles = await db.articles.find(query).limit(limit).sort([("created_at", -1)]).to_list(length=None)
         
         # Convert ObjectId to string and format for frontend
         formatted_articles = []
@@ -191,16 +195,17 @@ def get_available_articles(
         raise HTTPException(status_code=500, detail=f"Failed to get articles: {str(e)}")
 
 @homepage_router.post("/categories/reorder")
-def reorder_homepage_categories(
+async def reorder_homepage_categories(
     category_order: str = Form(...),  # Comma-separated category names
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Reorder homepage categories"""
     try:
         categories = [cat.strip().lower() for cat in category_order.split(",") if cat.strip()]
         
         # Update homepage configuration
-        result = db.homepage_config.update_one(
+        result = await db.homepage_config.update_one(
             {"active": True},
             {
                 "$set": {
@@ -211,6 +216,7 @@ def reorder_homepage_categories(
             },
             upsert=True
         )
+        await invalidate_homepage_snapshot()
         
         return {"message": "Category order updated successfully", "categories": categories}
         
@@ -218,45 +224,51 @@ def reorder_homepage_categories(
         raise HTTPException(status_code=500, detail=f"Failed to reorder categories: {str(e)}")
 
 @homepage_router.post("/auto-populate")
-def auto_populate_homepage(
-    current_admin: AdminUser = Depends(get_current_admin_user)
+async def auto_populate_homepage(
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Auto-populate homepage with smart article selection"""
     try:
         # Get articles by category
         categories = ["fashion", "people", "business", "technology", "travel", "culture", "art", "entertainment"]
         
-        homepage_config = {
-            "featured_articles": [],
-            "trending_articles": [],
-            "latest_articles": []
-        }
+        # Trending comes from the decayed-views ranking; lifetime views only until one exists
+        trending = await trending_ranking.articles({"status": "published"}, {"id": 1}, limit=4)
         
-        # Get trending articles (highest views)
-        trending = list(db.articles.find({}).sort([("views", -1)]).limit(4))
-        homepage_config["trending_articles"] = [article.get("id", str(article["_id"])) for article in trending]
+        # Latest needs its own order, which a $facet sub-pipeline would sort in memory; the
+        # (created_at, _id) index serves it directly
+        latest = await db.articles.find({}, {"id": 1}).sort(ADMIN_ARTICLE_SORT).limit(6).to_list(length=None)
         
-        # Get latest articles
-        latest = list(db.articles.find({}).sort([("created_at", -1)]).limit(6))
-        homepage_config["latest_articles"] = [article.get("id", str(article["_id"])) for article in latest]
+        # All other selections share the views order: one $facet aggregation over the views index
+        specs = [
+            SectionSpec("featured_articles", match={"featured": True}, limit=3, fields=["id"]),
+            SectionSpec("most_viewed", limit=3, fields=["id"])
+        ]
+        for category in categories:
+            specs.append(SectionSpec(f"{category}_articles", match={"category": category}, limit=4, fields=["id"]))
         
-        # Get featured articles
-        featured = list(db.articles.find({"featured": True}).limit(3))
-        if not featured:
-            # If no featured articles, use most viewed
-            featured = list(db.articles.find({}).sort([("views", -1)]).limit(3))
-        homepage_config["featured_articles"] = [article.get("id", str(article["_id"])) for article in featured]
+        if trending is None:
+            specs.append(SectionSpec("trending_articles", limit=4, fields=["id"]))
+        sections = await run_sections(specs, base_sort=POPULAR_SORT)
+        if trending is not None:
+            sections["trending_articles"] = [{"id": article.get("id") or str(article["_id"])} for article in trending]
         
-        # Set hero article (most viewed article)
-        hero_articles = list(db.articles.find({}).sort([("views", -1)]).limit(1))
-        if hero_articles:
-            homepage_config["hero_article"] = hero_articles[0].get("id", str(hero_articles[0]["_id"]))
+        sections["latest_articles"] = [{"id": article.get("id") or str(article["_id"])} for article in latest]
         
-        # Populate category sections
-        for category in categories:
-            category_articles = list(db.articles.find({"category": category}).sort([("views", -1)]).limit(4))
-            section_name = f"{category}_articles"
-            homepage_config[section_name] = [article.get("id", str(article["_id"])) for article in category_articles]
+        homepage_config = {
+            name: [article["id"] for article in articles]
+            for name, articles in sections.items()
+        }
+        
+        # If no featured articles, use most viewed
+        most_viewed = homepage_config.pop("most_viewed")
+        if not homepage_config["featured_articles"]:
+            homepage_config["featured_articles"] = most_viewed
+        
+        # Set hero article (most viewed article)
+        if most_viewed:
+            homepage_config["hero_article"] = most_viewed[0]
         
         # Update homepage configuration
         update_data = {
@@ -266,11 +278,12 @@ def auto_populate_homepage(
             "auto_populated": True
         }
         
-        result = db.homepage_config.update_one(
+        result = await db.homepage_config.update_one(
             {"active": True},
             {"$set": update_data},
             upsert=True
         )
+        await invalidate_homepage_snapshot()
         
         return {"message": "Homepage auto-populated successfully", "sections_updated": len(homepage_config)}
         
@@ -278,37 +291,61 @@ def auto_populate_homepage(
         raise HTTPException(status_code=500, detail=f"Failed to auto-populate homepage: {str(e)}")
 
 @homepage_router.get("/preview")
-def preview_homepage(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def preview_homepage(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get homepage preview data"""
     try:
         # Get current homepage configuration
-        homepage_config = db.homepage_config.find_one({"active": True})
+        homepage_config = await db.homepage_config.find_one({"active": True})
         
         if not homepage_config:
             return {"message": "No homepage configuration found"}
         
         # Get populated article data
-        preview_data = populate_homepage_articles(homepage_config)
+        preview_data = await populate_homepage_articles(homepage_config, db)
         
         return preview_data
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get homepage preview: {str(e)}")
 
-def populate_homepage_articles(config: dict) -> dict:
+async def populate_homepage_articles(config: dict, db: AsyncIOMotorDatabase) -> dict:
     """Helper function to populate homepage configuration with actual article data"""
     populated_config = dict(config)
     
-    # Helper function to get article data
-    def get_articles_data(article_ids: List[str]) -> List[dict]:
-        if not article_ids:
-            return []
-        
-        articles = []
-        for article_id in article_ids:
-            article = db.articles.find_one({"id": article_id})
-            if article:
-                formatted_article = {
+    sections = [
+        "featured_articles", "fashion_articles", "people_articles",
+        "business_articles", "technology_articles", "travel_articles",
+        "culture_articles", "entertainment_articles", "trending_articles", "latest_articles"
+    ]
+    
+    # Every article the config references, resolved in one query
+    refs = [config["hero_article"]] if config.get("hero_article") else []
+    for section in sections:
+        refs.extend(config.get(section) or [])
+    fields = [
+        "id", "title", "summary", "author_name", "category", "subcategory",
+        "hero_image", "views", "reading_time", "created_at"
+    ]
+    articles = dict(zip(refs, await fetch_articles(refs, projection={field: 1 for field in fields})))
+    
+    # Populate hero article
+    hero_article = articles.get(config.get("hero_article"))
+    if hero_article:
+        populated_config["hero_article_data"] = {
+            "id": hero_article.get("id", str(hero_article["_id"])),
+            "title": hero_article.get("title", ""),
+            "summary": hero_article.get("summary", ""),
+            "author_name": hero_article.get("author_name", ""),
+            "hero_image": hero_article.get("hero_image", ""),
+            "category": hero_article.get("category", ""),
+            "views": hero_article.get("views", 0)
+        }
+    
+    # Populate all sections
+    for section in sections:
+        if section in config and config[section]:
+            populated_config[f"{section}_data"] = [
+                {
                     "id": article.get("id", str(article["_id"])),
                     "title": article.get("title", ""),
                     "summary": article.get("summary", ""),
@@ -320,32 +357,8 @@ def populate_homepage_articles(config: dict) -> dict:
                     "reading_time": article.get("reading_time", 5),
                     "created_at": article.get("created_at", datetime.utcnow())
                 }
-                articles.append(formatted_article)
-        return articles
-    
-    # Populate hero article
-    if config.get("hero_article"):
-        hero_article = db.articles.find_one({"id": config["hero_article"]})
-        if hero_article:
-            populated_config["hero_article_data"] = {
-                "id": hero_article.get("id", str(hero_article["_id"])),
-                "title": hero_article.get("title", ""),
-                "summary": hero_article.get("summary", ""),
-                "author_name": hero_article.get("author_name", ""),
-                "hero_image": hero_article.get("hero_image", ""),
-                "category": hero_article.get("category", ""),
-                "views": hero_article.get("views", 0)
-            }
-    
-    # Populate all sections
-    sections = [
-        "featured_articles", "fashion_articles", "people_articles",
-        "business_articles", "technology_articles", "travel_articles",
-        "culture_articles", "entertainment_articles", "trending_articles", "latest_articles"
-    ]
-    
-    for section in sections:
-        if section in config and config[section]:
-            populated_config[f"{section}_data"] = get_articles_data(config[section])
+                for article in (articles.get(article_id) for article_id in config[section])
+                if article
+            ]
     
     return populated_config
\ No newline at end of file
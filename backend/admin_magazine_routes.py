@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form
 from fastapi.responses import JSONResponse
 from typing import List, Optional
 from datetime import datetime
-import os
 import uuid
 import shutil
 from pathlib import Path
@@ -11,13 +10,11 @@ from bson import ObjectId
 
 from admin_models import *
 from admin_auth import get_current_admin_user
-from pymongo import MongoClient
-import os
-
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
+from content_versions import bump_content_version
+from dashboard_counters import dashboard_counters
+from pagination import paginate, cached_count, MAGAZINE_SORT, ISSUE_SORT
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
 
 magazine_router = APIRouter(prefix="/api/admin/magazines", tags=["admin-magazines"])
 
@@ -35,7 +32,8 @@ async def upload_magazine(
     month: str = Form(...),
     year: int = Form(...),
     is_featured: bool = Form(False),
-    pdf_file: UploadFile = File(...)
+    pdf_file: UploadFile = File(...),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Upload a new magazine PDF"""
     try:
@@ -73,7 +71,7 @@ async def upload_magazine(
         }
         
         # Save to database
-        result = db.magazines.insert_one(magazine_data)
+        result = await db.magazines.insert_one(magazine_data)
         
         # Update issues collection for compatibility
         issue_data = {
@@ -88,7 +86,9 @@ async def upload_magazine(
             "published_at": datetime.utcnow(),
             "pdf_url": magazine_data["pdf_url"]
         }
-        db.issues.insert_one(issue_data)
+        await db.issues.insert_one(issue_data)
+        await bump_content_version("magazines", "issues")
+        await dashboard_counters.magazine_added()
         
         return {
             "message": "Magazine uploaded successfully",
@@ -104,22 +104,26 @@ async def upload_magazine(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @magazine_router.get("/")
-def get_magazines(
+async def get_magazines(
     current_admin: AdminUser = Depends(get_current_admin_user),
     page: int = 1,
-    limit: int = 10
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get all magazines with pagination"""
+    """Get all magazines with pagination; next_cursor gives constant-cost paging"""
     skip = (page - 1) * limit
     
     # Get magazines from both collections
-    magazines = list(db.magazines.find({}).skip(skip).limit(limit).sort([("upload_date", -1)]))
-    total_count = db.magazines.count_documents({})
+    collection, sort = db.magazines, MAGAZINE_SORT
     
     # If no magazines in magazines collection, fall back to issues
-    if not magazines:
-        magazines = list(db.issues.find({}).skip(skip).limit(limit).sort([("published_at", -1)]))
-        total_count = db.issues.count_documents({})
+    if await collection.estimated_document_count() == 0:
+        collection, sort = db.issues, ISSUE_SORT
+    
+    magazines, next_cursor = await paginate(collection, {}, sort, limit, cursor, skip=skip)
+    total_count = await cached_count(collection, {}) if include_total else None
     
     # Convert ObjectId to string
     for magazine in magazines:
@@ -131,34 +135,36 @@ def get_magazines(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit
+        "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 @magazine_router.get("/{magazine_id}")
-def get_magazine(
+async def get_magazine(
     magazine_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a specific magazine by ID"""
     try:
         # Try both custom id field and MongoDB _id field
-        magazine = db.magazines.find_one({"id": magazine_id})
+        magazine = await db.magazines.find_one({"id": magazine_id})
         
         if not magazine:
             # Try with ObjectId for MongoDB _id field
             try:
-                magazine = db.magazines.find_one({"_id": ObjectId(magazine_id)})
+                magazine = await db.magazines.find_one({"_id": ObjectId(magazine_id)})
             except:
                 pass
         
         if not magazine:
             # Try issues collection with custom id
-            magazine = db.issues.find_one({"id": magazine_id})
+            magazine = await db.issues.find_one({"id": magazine_id})
         
         if not magazine:
             # Try issues collection with ObjectId
             try:
-                magazine = db.issues.find_one({"_id": ObjectId(magazine_id)})
+                magazine = await db.issues.find_one({"_id": ObjectId(magazine_id)})
             except:
                 pass
         
@@ -178,7 +184,7 @@ def get_magazine(
         raise HTTPException(status_code=500, detail=f"Failed to get magazine: {str(e)}")
 
 @magazine_router.put("/{magazine_id}")
-def update_magazine(
+async def update_magazine(
     magazine_id: str,
     current_admin: AdminUser = Depends(get_current_admin_user),
     title: Optional[str] = Form(None),
@@ -186,7 +192,8 @@ def update_magazine(
     month: Optional[str] = Form(None),
     year: Optional[int] = Form(None),
     is_featured: Optional[bool] = Form(None),
-    is_published: Optional[bool] = Form(None)
+    is_published: Optional[bool] = Form(None),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update magazine metadata"""
     try:
@@ -209,7 +216,7 @@ def update_magazine(
         update_data["updated_by"] = current_admin.username
         
         # Try updating with custom id first
-        result = db.magazines.update_one(
+        result = await db.magazines.update_one(
             {"id": magazine_id}, 
             {"$set": update_data}
         )
@@ -217,7 +224,7 @@ def update_magazine(
         # If no match, try with ObjectId
         if result.matched_count == 0:
             try:
-                result = db.magazines.update_one(
+                result = await db.magazines.update_one(
                     {"_id": ObjectId(magazine_id)}, 
                     {"$set": update_data}
                 )
@@ -225,14 +232,14 @@ def update_magazine(
                 pass
         
         # Also update in issues collection for compatibility
-        db.issues.update_one(
+        await db.issues.update_one(
             {"id": magazine_id}, 
             {"$set": update_data}
         )
         
         # Try issues with ObjectId if needed
         try:
-            db.issues.update_one(
+            await db.issues.update_one(
                 {"_id": ObjectId(magazine_id)}, 
                 {"$set": update_data}
             )
@@ -242,6 +249,8 @@ def update_magazine(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Magazine not found")
         
+        await bump_content_version("magazines", "issues")
+        
         return {"message": "Magazine updated successfully"}
         
     except HTTPException:
@@ -250,27 +259,28 @@ def update_magazine(
         raise HTTPException(status_code=500, detail=f"Failed to update magazine: {str(e)}")
 
 @magazine_router.delete("/{magazine_id}")
-def delete_magazine(
+async def delete_magazine(
     magazine_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete a magazine and its PDF file"""
     try:
         # Get magazine to find PDF path (try multiple ways)
-        magazine = db.magazines.find_one({"id": magazine_id})
+        magazine = await db.magazines.find_one({"id": magazine_id})
         
         if not magazine:
             try:
-                magazine = db.magazines.find_one({"_id": ObjectId(magazine_id)})
+                magazine = await db.magazines.find_one({"_id": ObjectId(magazine_id)})
             except:
                 pass
         
         if not magazine:
-            magazine = db.issues.find_one({"id": magazine_id})
+            magazine = await db.issues.find_one({"id": magazine_id})
         
         if not magazine:
             try:
-                magazine = db.issues.find_one({"_id": ObjectId(magazine_id)})
+                magazine = await db.issues.find_one({"_id": ObjectId(magazine_id)})
             except:
                 pass
         
@@ -284,18 +294,22 @@ def delete_magazine(
                 pdf_path.unlink()
         
         # Delete from both databases using multiple query methods
-        db.magazines.delete_one({"id": magazine_id})
+        await db.magazines.delete_one({"id": magazine_id})
         try:
-            db.magazines.delete_one({"_id": ObjectId(magazine_id)})
+            await db.magazines.delete_one({"_id": ObjectId(magazine_id)})
         except:
             pass
             
-        db.issues.delete_one({"id": magazine_id})
+        deleted_issues = (await db.issues.delete_one({"id": magazine_id})).deleted_count
         try:
-            db.issues.delete_one({"_id": ObjectId(magazine_id)})
+            deleted_issues += (await db.issues.delete_one({"_id": ObjectId(magazine_id)})).deleted_count
         except:
             pass
         
+        await bump_content_version("magazines", "issues")
+        if deleted_issues:
+            await dashboard_counters.magazine_deleted()
+        
         return {"message": "Magazine deleted successfully"}
         
     except HTTPException:
@@ -304,18 +318,19 @@ def delete_magazine(
         raise HTTPException(status_code=500, detail=f"Failed to delete magazine: {str(e)}")
 
 @magazine_router.post("/{magazine_id}/feature")
-def toggle_featured_magazine(
+async def toggle_featured_magazine(
     magazine_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Toggle featured status of a magazine"""
     try:
         # First, unfeature all magazines
-        db.magazines.update_many({}, {"$set": {"is_featured": False}})
-        db.issues.update_many({}, {"$set": {"is_featured": False}})
+        await db.magazines.update_many({}, {"$set": {"is_featured": False}})
+        await db.issues.update_many({}, {"$set": {"is_featured": False}})
         
         # Feature the selected magazine (try multiple query methods)
-        result = db.magazines.update_one(
+        result = await db.magazines.update_one(
             {"id": magazine_id}, 
             {"$set": {"is_featured": True, "updated_by": current_admin.username}}
         )
@@ -323,7 +338,7 @@ def toggle_featured_magazine(
         # Try with ObjectId if custom id didn't work
         if result.matched_count == 0:
             try:
-                result = db.magazines.update_one(
+                result = await db.magazines.update_one(
                     {"_id": ObjectId(magazine_id)}, 
                     {"$set": {"is_featured": True, "updated_by": current_admin.username}}
                 )
@@ -331,13 +346,13 @@ def toggle_featured_magazine(
                 pass
         
         # Update issues collection too
-        db.issues.update_one(
+        await db.issues.update_one(
             {"id": magazine_id}, 
             {"$set": {"is_featured": True}}
         )
         
         try:
-            db.issues.update_one(
+            await db.issues.update_one(
                 {"_id": ObjectId(magazine_id)}, 
                 {"$set": {"is_featured": True}}
             )
@@ -347,6 +362,8 @@ def toggle_featured_magazine(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Magazine not found")
         
+        await bump_content_version("magazines", "issues")
+        
         return {"message": "Magazine featured successfully"}
         
     except HTTPException:
@@ -355,7 +372,7 @@ def toggle_featured_magazine(
         raise HTTPException(status_code=500, detail=f"Failed to feature magazine: {str(e)}")
 
 @magazine_router.get("/{magazine_id}/analytics")
-def get_magazine_analytics(
+async def get_magazine_analytics(
     magazine_id: str,
     current_admin: AdminUser = Depends(get_current_admin_user)
 ):
@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, Depends, File, UploadFile, Form, Q
 from fastapi.responses import JSONResponse, FileResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import os
 import uuid
 import shutil
 from pathlib import Path
@@ -13,13 +12,9 @@ import mimetypes
 from admin_models import *
 from admin_auth import get_current_admin_user
 from image_optimizer import image_optimizer
-from pymongo import MongoClient
-import os
-
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
+from pagination import paginate, cached_count, MEDIA_SORT
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database
 
 media_router = APIRouter(prefix="/api/admin/media", tags=["admin-media"])
 
@@ -52,7 +47,8 @@ async def upload_media(
     files: List[UploadFile] = File(...),
     alt_text: str = Form(""),
     tags: str = Form(""),
-    generate_resolutions: str = Form("thumbnail,small,medium")  # Comma-separated
+    generate_resolutions: str = Form("thumbnail,small,medium"),  # Comma-separated
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Upload multiple media files with automatic resolution generation"""
     try:
@@ -170,7 +166,7 @@ async def upload_media(
             }
             
             # Save to database
-            result = db.media_files.insert_one(media_data)
+            result = await db.media_files.insert_one(media_data)
             uploaded_files.append({
                 "id": file_id,
                 "filename": file.filename,
@@ -195,15 +191,18 @@ async def upload_media(
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @media_router.get("/")
-def get_media_files(
+async def get_media_files(
     current_admin: AdminUser = Depends(get_current_admin_user),
     file_type: Optional[str] = Query(None),  # image, video
     tags: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Get media files with filtering and pagination"""
+    """Get media files with filtering and pagination; next_cursor gives constant-cost paging"""
     try:
         skip = (page - 1) * limit
         query = {}
@@ -222,8 +221,8 @@ def get_media_files(
                 {"tags": {"$in": [search]}}
             ]
         
-        media_files = list(db.media_files.find(query).skip(skip).limit(limit).sort([("uploaded_at", -1)]))
-        total_count = db.media_files.count_documents(query)
+        media_files, next_cursor = await paginate(db.media_files, query, MEDIA_SORT, limit, cursor, skip=skip)
+        total_count = await cached_count(db.media_files, query) if include_total else None
         
         # Convert ObjectId to string
         for media_file in media_files:
@@ -235,20 +234,24 @@ def get_media_files(
             "total_count": total_count,
             "page": page,
             "limit": limit,
-            "total_pages": (total_count + limit - 1) // limit
+            "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+            "next_cursor": next_cursor
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get media files: {str(e)}")
 
 @media_router.get("/{media_id}")
-def get_media_file(
+async def get_media_file(
     media_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get specific media file details"""
     try:
-        media_file = db.media_files.find_one({"id": media_id})
+        media_file = await db.media_files.find_one({"id": media_id})
         
         if not media_file:
             raise HTTPException(status_code=404, detail="Media file not found")
@@ -262,11 +265,12 @@ def get_media_file(
         raise HTTPException(status_code=500, detail=f"Failed to get media file: {str(e)}")
 
 @media_router.put("/{media_id}")
-def update_media_file(
+async def update_media_file(
     media_id: str,
     current_admin: AdminUser = Depends(get_current_admin_user),
     alt_text: Optional[str] = Form(None),
-    tags: Optional[str] = Form(None)
+    tags: Optional[str] = Form(None),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update media file metadata"""
     try:
@@ -281,7 +285,7 @@ def update_media_file(
         if tags is not None:
             update_data["tags"] = [tag.strip() for tag in tags.split(",") if tag.strip()]
         
-        result = db.media_files.update_one(
+        result = await db.media_files.update_one(
             {"id": media_id},
             {"$set": update_data}
         )
@@ -295,14 +299,15 @@ def update_media_file(
         raise HTTPException(status_code=500, detail=f"Update failed: {str(e)}")
 
 @media_router.delete("/{media_id}")
-def delete_media_file(
+async def delete_media_file(
     media_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Delete media file and all its resolutions"""
     try:
         # Get media file info
-        media_file = db.media_files.find_one({"id": media_id})
+        media_file = await db.media_files.find_one({"id": media_id})
         
         if not media_file:
             raise HTTPException(status_code=404, detail="Media file not found")
@@ -320,7 +325,7 @@ def delete_media_file(
                     resolution_path.unlink()
         
         # Delete from database
-        db.media_files.delete_one({"id": media_id})
+        await db.media_files.delete_one({"id": media_id})
         
         return {"message": "Media file deleted successfully"}
         
@@ -328,15 +333,16 @@ def delete_media_file(
         raise HTTPException(status_code=500, detail=f"Delete failed: {str(e)}")
 
 @media_router.post("/{media_id}/generate-resolutions")
-def generate_resolutions(
+async def generate_resolutions(
     media_id: str,
     resolutions: str = Form(...),  # Comma-separated resolution names
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Generate new resolutions for an existing image"""
     try:
         # Get media file
-        media_file = db.media_files.find_one({"id": media_id})
+        media_file = await db.media_files.find_one({"id": media_id})
         
         if not media_file:
             raise HTTPException(status_code=404, detail="Media file not found")
@@ -375,7 +381,7 @@ def generate_resolutions(
         current_resolutions = media_file.get("resolutions", {})
         current_resolutions.update(resolutions_generated)
         
-        db.media_files.update_one(
+        await db.media_files.update_one(
             {"id": media_id},
             {
                 "$set": {
@@ -395,12 +401,12 @@ def generate_resolutions(
         raise HTTPException(status_code=500, detail=f"Resolution generation failed: {str(e)}")
 
 @media_router.get("/stats/overview")
-def get_media_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def get_media_stats(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     """Get media library statistics"""
     try:
         # Total counts by type
-        total_images = db.media_files.count_documents({"file_type": "image"})
-        total_videos = db.media_files.count_documents({"file_type": "video"})
+        total_images = await db.media_files.count_documents({"file_type": "image"})
+        total_videos = await db.media_files.count_documents({"file_type": "video"})
         
         # Storage usage
         pipeline = [
@@ -413,7 +419,7 @@ def get_media_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
             }
         ]
         
-        storage_stats = list(db.media_files.aggregate(pipeline))
+        storage_stats = await db.media_files.aggregate(pipeline).to_list(length=None)
         
         # Most used tags
         tag_pipeline = [
@@ -423,7 +429,7 @@ def get_media_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
             {"$limit": 10}
         ]
         
-        popular_tags = list(db.media_files.aggregate(tag_pipeline))
+        popular_tags = await db.media_files.aggregate(tag_pipeline).to_list(length=None)
         
         return {
             "total_files": total_images + total_videos,
@@ -438,11 +444,12 @@ def get_media_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
         raise HTTPException(status_code=500, detail=f"Failed to get stats: {str(e)}")
 
 @media_router.post("/bulk-tag")
-def bulk_tag_media(
+async def bulk_tag_media(
     media_ids: str = Form(...),  # Comma-separated IDs
     tags: str = Form(...),  # Comma-separated tags
     action: str = Form("add"),  # add, remove, replace
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Bulk tag operations on multiple media files"""
     try:
@@ -454,7 +461,7 @@ def bulk_tag_media(
         
         if action == "add":
             # Add tags to existing tags
-            result = db.media_files.update_many(
+            result = await db.media_files.update_many(
                 {"id": {"$in": ids}},
                 {
                     "$addToSet": {"tags": {"$each": tag_list}},
@@ -466,7 +473,7 @@ def bulk_tag_media(
             )
         elif action == "remove":
             # Remove specified tags
-            result = db.media_files.update_many(
+            result = await db.media_files.update_many(
                 {"id": {"$in": ids}},
                 {
                     "$pullAll": {"tags": tag_list},
@@ -478,7 +485,7 @@ def bulk_tag_media(
             )
         elif action == "replace":
             # Replace all tags with new tags
-            result = db.media_files.update_many(
+            result = await db.media_files.update_many(
                 {"id": {"$in": ids}},
                 {
                     "$set": {
@@ -2,7 +2,6 @@ from fastapi import APIRouter, HTTPException, Depends, status, File, UploadFile,
 from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-import os
 import uuid
 import shutil
 from pathlib import Path
@@ -10,48 +9,53 @@ import json
 
 from admin_models import *
 from admin_auth import *
-from pymongo import MongoClient
-import razorpay
-import os
-
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
-
-# Razorpay Configuration
-RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
-RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
-
-# Initialize Razorpay client
-razorpay_client = None
-if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
-    razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+from homepage_snapshot import invalidate_homepage_snapshot
+from content_versions import bump_content_version
+from pagination import paginate, cached_count, USER_SORT, ADMIN_ARTICLE_SORT
+from view_counter import view_counter
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database, database_provider
+from auth_cache import auth_cache, invalidate_admin_principal
+from search_index import article_search, sync_search_index
+from related_articles import related_articles, sync_related_articles
+from trending import trending_ranking
+from response_cache import response_cache
+from password_hashing import password_hasher
+from single_flight import single_flight
+from payment_gateway import payment_gateway
+from webhook_inbox import webhook_inbox
+from revenue_rollups import rollup_rows, summarize
+from dashboard_counters import dashboard_counters
 
 admin_router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 # Initialize default admin on startup
 @admin_router.on_event("startup")
-def startup_event():
-    create_default_admin()
+async def startup_event():
+    await create_default_admin()
 
 # Admin Authentication Endpoints
 @admin_router.post("/login", response_model=AdminToken)
-def admin_login(admin_credentials: AdminLogin):
+async def admin_login(admin_credentials: AdminLogin, db: AsyncIOMotorDatabase = Depends(get_database)):
     # Find admin user
-    admin_user = db.admin_users.find_one({"username": admin_credentials.username})
-    if not admin_user or not verify_admin_password(admin_credentials.password, admin_user["hashed_password"]):
+    admin_user = await db.admin_users.find_one({"username": admin_credentials.username})
+    valid, new_hash = await verify_admin_password(admin_credentials.password, admin_user.get("hashed_password")) if admin_user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Update last login
-    db.admin_users.update_one(
+    # Update last login, upgrading a hash made with old cost parameters
+    login_update = {"last_login": datetime.utcnow()}
+    if new_hash:
+        login_update["hashed_password"] = new_hash
+    await db.admin_users.update_one(
         {"_id": admin_user["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
+    invalidate_admin_principal(admin_user["username"])
     
     # Create access token
     access_token_expires = timedelta(minutes=ADMIN_ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -75,61 +79,31 @@ def admin_login(admin_credentials: AdminLogin):
     }
 
 @admin_router.get("/me")
-def get_current_admin(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def get_current_admin(current_admin: AdminUser = Depends(get_current_admin_user)):
     return current_admin
 
 # Dashboard Analytics Endpoints
 @admin_router.get("/dashboard/stats")
-def get_dashboard_stats(current_admin: AdminUser = Depends(get_current_admin_user)):
-    # Get basic counts
-    total_articles = db.articles.count_documents({})
-    total_magazines = db.issues.count_documents({})
-    total_users = db.users.count_documents({})
-    total_subscribers = db.users.count_documents({"is_premium": True})
-    
-    # Calculate total revenue from transactions
-    revenue_pipeline = [
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
+async def get_dashboard_stats(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
+    # One document kept current by the write paths and reconciled in the background
+    counters = await dashboard_counters.snapshot()
+    total_revenue = counters["total_revenue"] / 100  # Convert from paise
+    popular_articles = [{k: v for k, v in article.items() if k != "refs"} for article in counters["popular_articles"]]
+    
+    recent_activities = [
+        {k: v for k, v in activity.items() if k != "refs"}
+        for activity in counters["recent_articles"] + counters["recent_payments"]
     ]
-    revenue_result = list(db.transactions.aggregate(revenue_pipeline))
-    total_revenue = revenue_result[0]["total"] / 100 if revenue_result else 0  # Convert from paise
-    
-    # Get popular articles (top 5 by views)
-    popular_articles = list(db.articles.find({}, {"title": 1, "views": 1, "category": 1}).sort([("views", -1)]).limit(5))
-    for article in popular_articles:
-        article["id"] = str(article["_id"])
-        del article["_id"]
-    
-    # Get recent activities (recent articles and transactions)
-    recent_articles = list(db.articles.find({}).sort([("created_at", -1)]).limit(3))
-    recent_transactions = list(db.transactions.find({}).sort([("created_at", -1)]).limit(3))
-    
-    recent_activities = []
-    for article in recent_articles:
-        recent_activities.append({
-            "type": "article_created",
-            "title": f"New article: {article['title']}",
-            "timestamp": article.get("created_at", datetime.utcnow()),
-            "details": {"category": article.get("category", ""), "author": article.get("author_name", "")}
-        })
-    
-    for transaction in recent_transactions:
-        recent_activities.append({
-            "type": "payment_received",
-            "title": f"Payment received: ₹{transaction.get('amount', 0) / 100}",
-            "timestamp": transaction.get("created_at", datetime.utcnow()),
-            "details": {"package": transaction.get("package_id", ""), "status": transaction.get("status", "")}
-        })
     
     # Sort recent activities by timestamp (newest first)
     recent_activities.sort(key=lambda x: x["timestamp"], reverse=True)
     recent_activities = recent_activities[:10]  # Keep only top 10
     
     dashboard_stats = DashboardStats(
-        total_articles=total_articles,
-        total_magazines=total_magazines,
-        total_users=total_users,
-        total_subscribers=total_subscribers,
+        total_articles=counters["total_articles"],
+        total_magazines=counters["total_magazines"],
+        total_users=counters["total_users"],
+        total_subscribers=counters["total_subscribers"],
         total_revenue=total_revenue,
         monthly_visitors=0,  # TODO: Implement visitor tracking
         popular_articles=popular_articles,
@@ -144,14 +118,36 @@ def get_dashboard_stats(current_admin: AdminUser = Depends(get_current_admin_use
 
 # Content Management Endpoints
 @admin_router.get("/articles")
-def get_all_articles_admin(
+async def get_all_articles_admin(
     current_admin: AdminUser = Depends(get_current_admin_user),
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     category: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    search_mode: str = Query("index", regex="^(index|regex)$"),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     skip = (page - 1) * limit
+    
+    if search and search_mode == "index":
+        # Admins search drafts and archived articles too
+        result = await article_search.search(search, status=None, category=category, offset=skip, limit=limit)
+        articles = await article_search.load_results(result.hits)
+        for article in articles:
+            article["id"] = str(article.get("_id", article.get("id")))
+            if "_id" in article:
+                del article["_id"]
+        return {
+            "articles": articles,
+            "total_count": result.total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (result.total + limit - 1) // limit,
+            "next_cursor": None
+        }
+    
     query = {}
     
     if category:
@@ -164,8 +160,8 @@ def get_all_articles_admin(
             {"author_name": {"$regex": search, "$options": "i"}}
         ]
     
-    articles = list(db.articles.find(query).skip(skip).limit(limit).sort([("created_at", -1)]))
-    total_count = db.articles.count_documents(query)
+    articles, next_cursor = await paginate(db.articles, query, ADMIN_ARTICLE_SORT, limit, cursor, skip=skip)
+    total_count = await cached_count(db.articles, query) if include_total else None
     
     # Convert ObjectId to string
     for article in articles:
@@ -177,24 +173,32 @@ def get_all_articles_admin(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit
+        "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 @admin_router.delete("/articles/{article_id}")
-def delete_article_admin(
+async def delete_article_admin(
     article_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     # Delete article
-    result = db.articles.delete_one({"id": article_id})
+    result = await db.articles.delete_one({"id": article_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Article not found")
     
+    await bump_content_version("articles", changed=[article_id])
+    await invalidate_homepage_snapshot()
+    await sync_search_index(article_id)
+    await sync_related_articles(article_id)
+    await dashboard_counters.article_deleted(article_id)
+    
     return {"message": "Article deleted successfully"}
 
 @admin_router.get("/magazines")
-def get_all_magazines_admin(current_admin: AdminUser = Depends(get_current_admin_user)):
-    magazines = list(db.issues.find({}).sort([("year", -1), ("month", -1)]))
+async def get_all_magazines_admin(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
+    magazines = await db.issues.find({}).sort([("year", -1), ("month", -1)]).to_list(length=None)
     
     # Convert ObjectId to string
     for magazine in magazines:
@@ -204,19 +208,20 @@ def get_all_magazines_admin(current_admin: AdminUser = Depends(get_current_admin
     return {"magazines": magazines}
 
 @admin_router.get("/magazines/{magazine_id}")
-def get_magazine_admin(
+async def get_magazine_admin(
     magazine_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Get a specific magazine by ID"""
     # Try with custom id first
-    magazine = db.issues.find_one({"id": magazine_id})
+    magazine = await db.issues.find_one({"id": magazine_id})
     
     # If not found with custom id, try with MongoDB ObjectId
     if not magazine:
         try:
             from bson import ObjectId
-            magazine = db.issues.find_one({"_id": ObjectId(magazine_id)})
+            magazine = await db.issues.find_one({"_id": ObjectId(magazine_id)})
         except:
             pass
     
@@ -230,31 +235,36 @@ def get_magazine_admin(
     return magazine
 
 @admin_router.delete("/magazines/{magazine_id}")
-def delete_magazine_admin(
+async def delete_magazine_admin(
     magazine_id: str,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     # Delete magazine - try both custom id and ObjectId
-    result = db.issues.delete_one({"id": magazine_id})
+    result = await db.issues.delete_one({"id": magazine_id})
     
     # If not found with custom id, try with MongoDB ObjectId
     if result.deleted_count == 0:
         try:
             from bson import ObjectId
-            result = db.issues.delete_one({"_id": ObjectId(magazine_id)})
+            result = await db.issues.delete_one({"_id": ObjectId(magazine_id)})
         except:
             pass
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Magazine not found")
     
+    await bump_content_version("issues")
+    await dashboard_counters.magazine_deleted()
+    
     return {"message": "Magazine deleted successfully"}
 
 @admin_router.put("/magazines/{magazine_id}")
-def update_magazine_admin(
+async def update_magazine_admin(
     magazine_id: str,
     magazine_update: dict,
-    current_admin: AdminUser = Depends(get_current_admin_user)
+    current_admin: AdminUser = Depends(get_current_admin_user),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Update magazine metadata"""
     # Remove None values and prepare update data
@@ -264,7 +274,7 @@ def update_magazine_admin(
         raise HTTPException(status_code=400, detail="No update data provided")
     
     # Try updating with custom id first
-    result = db.issues.update_one(
+    result = await db.issues.update_one(
         {"id": magazine_id}, 
         {"$set": update_data}
     )
@@ -273,7 +283,7 @@ def update_magazine_admin(
     if result.matched_count == 0:
         try:
             from bson import ObjectId
-            result = db.issues.update_one(
+            result = await db.issues.update_one(
                 {"_id": ObjectId(magazine_id)}, 
                 {"$set": update_data}
             )
@@ -283,18 +293,23 @@ def update_magazine_admin(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Magazine not found")
     
+    await bump_content_version("issues")
+    
     return {"message": "Magazine updated successfully"}
 
 # User Management Endpoints
 @admin_router.get("/users")
-def get_all_users_admin(
+async def get_all_users_admin(
     current_admin: AdminUser = Depends(get_current_admin_user),
     page: int = Query(1, ge=1),
-    limit: int = Query(20, ge=1, le=100)
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     skip = (page - 1) * limit
-    users = list(db.users.find({}, {"hashed_password": 0}).skip(skip).limit(limit).sort([("created_at", -1)]))
-    total_count = db.users.count_documents({})
+    users, next_cursor = await paginate(db.users, {}, USER_SORT, limit, cursor, {"hashed_password": 0}, skip=skip)
+    total_count = await cached_count(db.users, {}) if include_total else None
     
     # Convert ObjectId to string
     for user in users:
@@ -306,58 +321,51 @@ def get_all_users_admin(
         "total_count": total_count,
         "page": page,
         "limit": limit,
-        "total_pages": (total_count + limit - 1) // limit
+        "total_pages": (total_count + limit - 1) // limit if total_count is not None else None,
+        "next_cursor": next_cursor
     }
 
 # Payment Analytics Endpoints
 @admin_router.get("/payments/analytics")
-def get_payment_analytics(current_admin: AdminUser = Depends(get_current_admin_user)):
-    # Monthly revenue calculation
-    monthly_revenue = {}
-    transactions = list(db.transactions.find({"status": "success"}))
-    
-    for transaction in transactions:
-        created_at = transaction.get("created_at", datetime.utcnow())
-        month_key = created_at.strftime("%Y-%m")
-        amount = transaction.get("amount", 0) / 100  # Convert from paise
-        
-        if month_key in monthly_revenue:
-            monthly_revenue[month_key] += amount
-        else:
-            monthly_revenue[month_key] = amount
-    
-    # Package popularity
-    package_stats = {}
-    for transaction in transactions:
-        package_id = transaction.get("package_id", "unknown")
-        if package_id in package_stats:
-            package_stats[package_id] += 1
-        else:
-            package_stats[package_id] = 1
+async def get_payment_analytics(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
+    # Monthly revenue and package popularity from one row per day, package and currency
+    summary = summarize(await rollup_rows())
     
     return {
-        "monthly_revenue": monthly_revenue,
-        "package_popularity": package_stats,
-        "total_transactions": len(transactions),
-        "total_revenue": sum(t.get("amount", 0) for t in transactions) / 100
+        "monthly_revenue": {month: amount / 100 for month, amount in sorted(summary["monthly_revenue"].items())},  # Convert from paise
+        "package_popularity": summary["package_popularity"],
+        "total_transactions": summary["total_transactions"],
+        "total_revenue": summary["total_revenue"] / 100
     }
 
 # System Health Endpoints
 @admin_router.get("/system/health")
-def admin_system_health(current_admin: AdminUser = Depends(get_current_admin_user)):
+async def admin_system_health(current_admin: AdminUser = Depends(get_current_admin_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     # Check database connection
     try:
-        db.command("ping")
+        await db.command("ping")
         db_status = {"status": "connected", "message": "Database connection healthy"}
     except Exception as e:
         db_status = {"status": "error", "message": f"Database error: {str(e)}"}
     
     # Check Razorpay connection
-    razorpay_status = {"status": "configured", "message": "Razorpay client initialized"} if razorpay_client else {"status": "not_configured", "message": "Razorpay not configured"}
+    razorpay_status = {"status": "configured", "message": "Razorpay client initialized"} if payment_gateway.configured else {"status": "not_configured", "message": "Razorpay not configured"}
+    razorpay_status["gateway"] = payment_gateway.stats()
     
     return {
         "database": db_status,
         "razorpay": razorpay_status,
+        "view_counter": view_counter.stats(),
+        "database_pool": database_provider.stats(),
+        "auth_cache": auth_cache.stats(),
+        "search_index": article_search.stats(),
+        "related_articles": related_articles.stats(),
+        "trending": trending_ranking.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "password_hashing": password_hasher.stats(),
+        "webhook_inbox": webhook_inbox.stats(),
+        "dashboard_counters": dashboard_counters.stats(),
         "server_time": datetime.utcnow().isoformat(),
         "system_status": "healthy"
     }
\ No newline at end of file
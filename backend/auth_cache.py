@@ -0,0 +1,134 @@
+"""
+Just Urbane - Verified Token Cache
+Decoded JWT claims and the loaded user/admin principal, keyed by token digest
+
+Entries live until the token expires, AUTH_CACHE_TTL passes or the principal is invalidated.
+Invalidation is per process, so AUTH_CACHE_TTL also bounds how long another worker can serve
+a principal changed elsewhere (password change, subscription change, admin removal).
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+import threading
+import hashlib
+import time
+import os
+
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", "10000"))
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "300"))  # seconds; 0 disables the cache
+
+class CachedPrincipal:
+    """Claims and principal for one verified token"""
+
+    def __init__(self, realm: str, subject: str, claims: dict, principal: Any, expires_at: float):
+        self.realm = realm
+        self.subject = subject
+        self.claims = claims
+        self.principal = principal
+        self.expires_at = expires_at
+
+class PrincipalCache:
+    """Bounded LRU of verified tokens with per-subject invalidation"""
+
+    def __init__(self, max_entries: int = AUTH_CACHE_MAX_ENTRIES, ttl: int = AUTH_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._by_subject: Dict[Tuple[str, str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def token_key(realm: str, token: str) -> str:
+        # Raw tokens never sit in memory as keys
+        return realm + ":" + hashlib.sha256(token.encode()).hexdigest()
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_subject.get((entry.realm, entry.subject))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_subject[(entry.realm, entry.subject)]
+
+    def get(self, realm: str, token: str) -> Optional[CachedPrincipal]:
+        if self.ttl <= 0:
+            return None
+        key = self.token_key(realm, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, realm: str, token: str, subject: str, claims: dict, principal: Any):
+        """Remember a verified token until its exp claim or the cache TTL, whichever is first"""
+        if self.ttl <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        if claims.get("exp"):
+            expires_at = min(expires_at, float(claims["exp"]))
+        key = self.token_key(realm, token)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = CachedPrincipal(realm, subject, claims, principal, expires_at)
+            self._by_subject.setdefault((realm, subject), set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, realm: str, subject: str) -> int:
+        """Drop every cached token of one user/admin; returns how many were dropped"""
+        with self._lock:
+            keys = list(self._by_subject.get((realm, subject), ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_subject.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+# Global token cache
+auth_cache = PrincipalCache()
+
+USER_REALM = "user"
+ADMIN_REALM = "admin"
+
+def invalidate_user_principal(email: str) -> int:
+    """Call after changing a user's password, subscription or premium status"""
+    return auth_cache.invalidate(USER_REALM, email)
+
+def invalidate_admin_principal(username: str) -> int:
+    """Call after changing or removing an admin account"""
+    return auth_cache.invalidate(ADMIN_REALM, username)
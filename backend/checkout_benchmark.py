@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Checkout Benchmark
+Order-creation throughput and tail latency against the local Razorpay stand-in, with a blocking
+client (as the razorpay SDK does) versus the async gateway client
+
+    python checkout_benchmark.py [--orders 200] [--concurrency 32] [--latency-ms 150] [--jitter-ms 100] [--error-rate 0.02]
+
+Starts razorpay_standin.py in a background thread unless --url points at a running one.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import threading
+import time
+import urllib.request
+
+import uvicorn
+
+from password_benchmark import percentile, ticker
+from razorpay_standin import create_standin, STANDIN_KEY_ID, STANDIN_KEY_SECRET
+from payment_gateway import RazorpayGateway
+
+ORDER = {"amount": 99900, "currency": "INR", "receipt": "bench", "notes": {"package_id": "digital_annual"}}
+
+def start_standin(port, latency_ms, jitter_ms, error_rate):
+    config = uvicorn.Config(create_standin(latency_ms, jitter_ms, error_rate), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def blocking_create_order(url):
+    """One order the way the synchronous SDK sends it: the calling thread waits on the socket"""
+    request = urllib.request.Request(f"{url}/orders", data=json.dumps(ORDER).encode(), method="POST")
+    request.add_header("Content-Type", "application/json")
+    request.add_header("Authorization", "Basic " + base64.b64encode(f"{STANDIN_KEY_ID}:{STANDIN_KEY_SECRET}".encode()).decode())
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+async def run(label, create_order, orders, concurrency):
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def checkout():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await create_order()
+            except Exception:
+                failures += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(checkout() for _ in range(orders)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    latencies, lags = latencies or [0.0], lags or [0.0]
+    print(f"{label:>8}: {orders / elapsed:6.1f} orders/s, p50 {percentile(latencies, 0.5):.0f} ms "
+          f"p95 {percentile(latencies, 0.95):.0f} ms p99 {percentile(latencies, 0.99):.0f} ms, "
+          f"{failures} failed, loop lag max {max(lags):.0f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="Checkout order-creation benchmark against the Razorpay stand-in")
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=100)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--url", help="A stand-in that is already running, e.g. http://127.0.0.1:8010/v1")
+    args = parser.parse_args()
+
+    url = args.url
+    if url is None:
+        start_standin(args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+        url = f"http://127.0.0.1:{args.port}/v1"
+    print(f"💳 {args.orders} orders, {args.concurrency} concurrent, gateway {url} "
+          f"({args.latency_ms:.0f}±{args.jitter_ms:.0f} ms, {args.error_rate:.0%} errors)")
+
+    async def blocking():
+        return blocking_create_order(url)
+    await run("blocking", blocking, args.orders, args.concurrency)
+
+    gateway = RazorpayGateway(key_id=STANDIN_KEY_ID, key_secret=STANDIN_KEY_SECRET, api_url=url, pool_size=args.concurrency)
+
+    async def pooled():
+        return await gateway.create_order(ORDER)
+    await run("async", pooled, args.orders, args.concurrency)
+    print(f"   gateway: {gateway.stats()}")
+    await gateway.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
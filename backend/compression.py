@@ -0,0 +1,248 @@
+"""
+Just Urbane - Response Compression
+Negotiated brotli/gzip for dynamic responses and precompressed variants for static files
+
+Static text assets are compressed ahead of time by precompress_static.py; the mounts serve
+the .br/.gz sibling directly, so only API responses are compressed per request.
+"""
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles, NotModifiedResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, List, Optional, Tuple
+import mimetypes
+import gzip
+import io
+import os
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Responses smaller than this go out uncompressed; framing overhead outweighs the savings
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# CPU budget for per-request compression: fast | balanced | max
+COMPRESSION_LEVEL = os.getenv("COMPRESSION_LEVEL", "balanced").lower()
+
+# (gzip level, brotli quality) per budget
+COMPRESSION_LEVELS: Dict[str, Tuple[int, int]] = {
+    "fast": (1, 1),
+    "balanced": (6, 4),
+    "max": (9, 11),
+}
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "application/rtf", "image/svg+xml", "application/manifest+json"
+)
+
+# Content-Encoding -> file suffix, in server preference order
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+def available_encodings() -> List[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def is_compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE_TYPES)
+
+def choose_encoding(accept_encoding: Optional[str], encodings: List[str]) -> Optional[str]:
+    """Best encoding the client accepts (by q-value, ties broken by server preference)"""
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def add_vary(headers: MutableHeaders):
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+class _Compressor:
+    """Streaming gzip or brotli encoder"""
+
+    def __init__(self, encoding: str, level: Tuple[int, int]):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level[1])
+        else:
+            self._buffer = io.BytesIO()
+            self._gzip = gzip.GzipFile(mode="wb", fileobj=self._buffer, compresslevel=level[0])
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def process(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(chunk)
+        self._gzip.write(chunk)
+        return self._drain()
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        self._gzip.close()
+        return self._drain()
+
+class CompressionMiddleware:
+    """Compress compressible responses above a size threshold with the negotiated encoding"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, level: str = COMPRESSION_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = COMPRESSION_LEVELS.get(level, COMPRESSION_LEVELS["balanced"])
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _CompressionResponder(self.app, encoding, self.level, self.minimum_size)(scope, receive, send)
+
+class _CompressionResponder:
+    def __init__(self, app: ASGIApp, encoding: str, level: Tuple[int, int], minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.level = level
+        self.minimum_size = minimum_size
+        self.send: Send = None
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    def _should_compress(self, headers: MutableHeaders, status: int) -> bool:
+        return (
+            status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and is_compressible(headers.get("content-type"))
+        )
+
+    def _mark_encoded(self, headers: MutableHeaders):
+        headers["Content-Encoding"] = self.encoding
+        add_vary(headers)
+        # The encoded bytes differ from the identity representation, so the tag becomes weak
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+
+    async def send_with_compression(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows whether compression is worthwhile
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._should_compress(headers, self.start_message["status"]):
+                self.passthrough = True
+                if is_compressible(headers.get("content-type")):
+                    add_vary(headers)
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            if not more_body:
+                if len(body) < self.minimum_size:
+                    self.passthrough = True
+                    add_vary(headers)
+                    await self.send(self.start_message)
+                    await self.send(message)
+                    return
+                compressor = _Compressor(self.encoding, self.level)
+                compressed = compressor.process(body) + compressor.finish()
+                self._mark_encoded(headers)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming body: length is unknown up front
+            self.compressor = _Compressor(self.encoding, self.level)
+            self._mark_encoded(headers)
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self.send(self.start_message)
+
+        chunk = self.compressor.process(body)
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves a fresh .br/.gz sibling when the client accepts it"""
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+
+        if is_compressible(media_type) and "range" not in request_headers:
+            # Serving a precompressed file needs no encoder, so brotli is offered even without the module
+            encoding = choose_encoding(request_headers.get("accept-encoding"), list(ENCODING_SUFFIXES))
+            if encoding is not None:
+                variant = f"{full_path}{ENCODING_SUFFIXES[encoding]}"
+                try:
+                    variant_stat = os.stat(variant)
+                except OSError:
+                    variant_stat = None
+                # A variant older than its source is stale; fall back to the original
+                if variant_stat is not None and variant_stat.st_mtime >= stat_result.st_mtime:
+                    response = FileResponse(
+                        variant,
+                        status_code=status_code,
+                        stat_result=variant_stat,
+                        method=scope["method"],
+                        media_type=media_type
+                    )
+                    response.headers["Content-Encoding"] = encoding
+                    add_vary(response.headers)
+                    if self.is_not_modified(response.headers, request_headers):
+                        return NotModifiedResponse(response.headers)
+                    return response
+
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if is_compressible(media_type):
+            add_vary(response.headers)
+        return response
@@ -0,0 +1,192 @@
+"""
+Just Urbane - Content Versions and Conditional GET
+Per-collection version counters bumped on admin writes, used to answer repeat reads with 304
+
+View counts are flushed without bumping the articles version, so article representations also
+carry a views epoch that rolls over every CONTENT_VIEWS_MAX_STALENESS seconds: a revalidated or
+cached body shows view counts at most that old (plus the Cache-Control max-age in browsers).
+
+Each bump also appends to a short change log on the version document: the documents the write
+touched, or nothing when the writer could not say. Other workers use it to re-read just those
+documents; a bump without them (a script) or a gap longer than the log means "re-read everything".
+
+Content written outside the API (seed and add_*_article scripts) should bump the version too:
+    python content_versions.py articles issues
+"""
+
+from fastapi import Request, Response
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import ReturnDocument
+from database import get_database
+import asyncio
+import hashlib
+import time
+import sys
+import os
+
+# How often a worker re-reads versions bumped by other workers (seconds)
+CONTENT_VERSION_REFRESH = float(os.getenv("CONTENT_VERSION_REFRESH", "5"))
+
+# Bumps per collection whose changed documents are remembered for other workers
+CONTENT_CHANGE_LOG = int(os.getenv("CONTENT_CHANGE_LOG", "200"))
+
+# Browser / reverse proxy caching for public content
+CONTENT_CACHE_MAX_AGE = int(os.getenv("CONTENT_CACHE_MAX_AGE", "60"))
+CONTENT_CACHE_STALE_WHILE_REVALIDATE = int(os.getenv("CONTENT_CACHE_STALE_WHILE_REVALIDATE", "300"))
+
+# Bound on how old view counts in an article response may be (seconds)
+CONTENT_VIEWS_MAX_STALENESS = int(os.getenv("CONTENT_VIEWS_MAX_STALENESS", "300"))
+
+# Change on deploys that alter response shapes so old tags stop matching
+CONTENT_ETAG_SALT = os.getenv("CONTENT_ETAG_SALT", "1")
+
+class ContentVersionStore:
+    """Process-local view of the content_versions collection"""
+
+    def __init__(self, refresh_interval: float = CONTENT_VERSION_REFRESH):
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        self._loaded_at = 0.0
+        self._listeners: List[Callable[..., Awaitable[None]]] = []
+
+    def on_bump(self, listener: Callable[..., Awaitable[None]]):
+        """Run `await listener(*names)` after every bump made by this process"""
+        self._listeners.append(listener)
+
+    async def _refresh(self):
+        try:
+            versions = {
+                doc["_id"]: (doc.get("version", 0), doc.get("updated_at"))
+                async for doc in get_database().content_versions.find({}, {"changes": 0})
+            }
+        except Exception as e:
+            print(f"Content version refresh error: {str(e)}")
+            return
+        self._versions = versions
+        self._loaded_at = time.time()
+
+    async def current(self, name: str) -> Tuple[int, Optional[datetime]]:
+        """(version, updated_at) for a collection; re-reads Mongo at most once per refresh interval"""
+        if time.time() - self._loaded_at > self.refresh_interval:
+            await self._refresh()
+        return self._versions.get(name, (0, None))
+
+    async def changes(self, name: str, since: Optional[int]) -> Tuple[int, Optional[List[Any]]]:
+        """The current version and the documents written after version `since`, read from Mongo;
+        None instead of the list when the change log cannot name them all"""
+        doc = await get_database().content_versions.find_one({"_id": name}, {"version": 1, "changes": 1}) or {}
+        version = doc.get("version", 0)
+        if since is None:
+            return version, None
+        missing = version - since
+        log = doc.get("changes", [])
+        if missing <= 0:
+            return version, []
+        if missing > len(log):
+            return version, None
+        changed: List[Any] = []
+        # The log's last entry belongs to the current version, one entry per bump
+        for entry in log[-missing:]:
+            if entry.get("changed") is None:
+                return version, None
+            changed.extend(entry["changed"])
+        return version, changed
+
+    async def bump(self, *names: str, changed: Optional[Iterable[Any]] = None):
+        """Record a write to one or more collections, and the documents it touched when known"""
+        now = datetime.utcnow().replace(microsecond=0)
+        entry = {"changed": list(changed) if changed is not None else None}
+        for name in names:
+            try:
+                doc = await get_database().content_versions.find_one_and_update(
+                    {"_id": name},
+                    {
+                        "$inc": {"version": 1},
+                        "$set": {"updated_at": now},
+                        "$push": {"changes": {"$each": [entry], "$slice": -CONTENT_CHANGE_LOG}}
+                    },
+                    projection={"changes": 0},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
+                )
+            except Exception as e:
+                print(f"Content version bump error for {name}: {str(e)}")
+                continue
+            self._versions[name] = (doc["version"], doc["updated_at"])
+        for listener in self._listeners:
+            try:
+                await listener(*names)
+            except Exception as e:
+                print(f"Content version listener error for {names}: {str(e)}")
+
+# Global version store
+content_versions = ContentVersionStore()
+
+async def bump_content_version(*names: str, changed: Optional[Iterable[Any]] = None):
+    await content_versions.bump(*names, changed=changed)
+
+def cache_headers(etag: str, last_modified: Optional[datetime] = None) -> Dict[str, str]:
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CONTENT_CACHE_MAX_AGE}, stale-while-revalidate={CONTENT_CACHE_STALE_WHILE_REVALIDATE}"
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = last_modified.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    return headers
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Evaluate If-None-Match against the version tag
+
+    If-Modified-Since is not honoured: HTTP dates have one-second resolution, so two bumps within a
+    second would look unchanged. Last-Modified is still sent for information.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Weak comparison: the compression middleware marks encoded representations W/
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        if "*" in candidates:
+            return True
+        opaque = etag[2:] if etag.startswith("W/") else etag
+        return any((tag[2:] if tag.startswith("W/") else tag) == opaque for tag in candidates)
+    return False
+
+def views_epoch(now: Optional[float] = None) -> int:
+    """Index of the current CONTENT_VIEWS_MAX_STALENESS window"""
+    return int((now or time.time()) // CONTENT_VIEWS_MAX_STALENESS)
+
+def request_target(request: Request) -> str:
+    """Path plus the query string in a canonical order, so equivalent requests compare equal"""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return f"{request.url.path}?{query}"
+
+async def conditional_get(request: Request, *collections: str) -> Tuple[Optional[Response], Dict[str, str]]:
+    """Validators for a read of `collections`: (304 response if the client is current, cache headers)"""
+    versions = [await content_versions.current(name) for name in collections]
+    last_modified = max((updated for _, updated in versions if updated), default=None)
+
+    # The request target is part of the tag so different filters never share one
+    key = f"{CONTENT_ETAG_SALT}|{request_target(request)}|" + ",".join(f"{name}:{version}" for name, (version, _) in zip(collections, versions))
+    if "articles" in collections:
+        # Article bodies include views, which change without a version bump
+        epoch = views_epoch()
+        key += f"|views:{epoch}"
+        epoch_start = datetime.utcfromtimestamp(epoch * CONTENT_VIEWS_MAX_STALENESS)
+        last_modified = max(last_modified, epoch_start) if last_modified else epoch_start
+    etag = '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    headers = cache_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
+async def main(names):
+    await bump_content_version(*names)
+    for name in names:
+        print(f"{name}: version {(await content_versions.current(name))[0]}")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python content_versions.py <collection> [<collection> ...]")
+        sys.exit(1)
+    asyncio.run(main(sys.argv[1:]))
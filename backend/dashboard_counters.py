@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Dashboard Counters
+The admin dashboard's totals and recent items, materialized in one document
+
+Registration, payment verification and article/magazine uploads and deletes adjust the
+dashboard_counters document with a single $inc (and $push/$pull for the recent lists) as they
+write, so /api/admin/dashboard/stats is one find_one. Writes that bypass those paths (seed and
+cleanup scripts, edits in the shell, a counter update lost to a crash) are corrected every
+DASHBOARD_RECONCILE_SECONDS by one worker recounting from source; popular articles follow views
+on the same schedule. Reconcile by hand with:
+
+    python dashboard_counters.py reconcile
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+from revenue_rollups import rollup_rows, summarize
+import asyncio
+import time
+import sys
+import os
+
+DASHBOARD_RECONCILE_SECONDS = int(os.getenv("DASHBOARD_RECONCILE_SECONDS", "300"))
+DASHBOARD_RECENT_ITEMS = 3
+DASHBOARD_POPULAR_ARTICLES = 5
+
+DASHBOARD_COUNTERS_ID = "dashboard"
+DASHBOARD_LEASE_ID = "reconcile_lease"
+
+def article_refs(article: dict) -> List[str]:
+    """Every id an admin route may delete the article by"""
+    return [ref for ref in (article.get("id"), str(article.get("_id", ""))) if ref]
+
+def article_activity(article: dict) -> dict:
+    return {
+        "type": "article_created",
+        "title": f"New article: {article['title']}",
+        "timestamp": article.get("created_at", datetime.utcnow()),
+        "details": {"category": article.get("category", ""), "author": article.get("author_name", "")},
+        "refs": article_refs(article)
+    }
+
+def payment_activity(transaction: dict) -> dict:
+    return {
+        "type": "payment_received",
+        "title": f"Payment received: ₹{transaction.get('amount', 0) / 100}",
+        "timestamp": transaction.get("created_at", datetime.utcnow()),
+        "details": {"package": transaction.get("package_id", ""), "status": transaction.get("status", "")}
+    }
+
+def popular_entry(article: dict) -> dict:
+    return {
+        "id": str(article["_id"]),
+        "title": article.get("title"),
+        "views": article.get("views", 0),
+        "category": article.get("category"),
+        "refs": article_refs(article)
+    }
+
+def recent(activity: dict) -> dict:
+    """A $push that keeps the list newest first and DASHBOARD_RECENT_ITEMS long"""
+    return {"$each": [activity], "$sort": {"timestamp": -1}, "$slice": DASHBOARD_RECENT_ITEMS}
+
+class DashboardCounters:
+    """Incremental updates to the dashboard document, its reconciliation and its read"""
+
+    def __init__(self, reconcile_seconds: int = DASHBOARD_RECONCILE_SECONDS):
+        self.reconcile_seconds = reconcile_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.updates = 0
+        self.update_failures = 0
+        self.reconciles = 0
+        self.reconcile_failures = 0
+        self.last_reconcile_seconds: Optional[float] = None
+        self.last_drift: dict = {}
+
+    async def _update(self, update: dict):
+        # No upsert: until the first reconcile there is nothing to adjust, and a partial
+        # document would pass for a complete one. A failed update is drift the next reconcile fixes.
+        try:
+            await get_database().dashboard_counters.update_one({"_id": DASHBOARD_COUNTERS_ID}, update)
+            self.updates += 1
+        except Exception as e:
+            self.update_failures += 1
+            print(f"Dashboard counter error: {str(e)}")
+
+    async def user_registered(self):
+        await self._update({"$inc": {"total_users": 1}})
+
+    async def payment_completed(self, transaction: dict, user_created: bool, subscriber_delta: int):
+        """A verified payment: its revenue (paise), the user it created and any premium flip"""
+        await self._update({
+            "$inc": {
+                "total_revenue": transaction.get("amount", 0),
+                "total_users": int(user_created),
+                "total_subscribers": subscriber_delta
+            },
+            "$push": {"recent_payments": recent(payment_activity(transaction))}
+        })
+
+    async def article_created(self, article: dict):
+        await self._update({
+            "$inc": {"total_articles": 1},
+            "$push": {"recent_articles": recent(article_activity(article))}
+        })
+
+    async def article_deleted(self, article_id: str):
+        # A recent list left short refills on the next reconcile
+        await self._update({
+            "$inc": {"total_articles": -1},
+            "$pull": {"recent_articles": {"refs": article_id}, "popular_articles": {"refs": article_id}}
+        })
+
+    async def magazine_added(self):
+        await self._update({"$inc": {"total_magazines": 1}})
+
+    async def magazine_deleted(self):
+        await self._update({"$inc": {"total_magazines": -1}})
+
+    async def _claim(self, now: datetime) -> bool:
+        """Take the reconcile lease so only one worker recounts per interval"""
+        try:
+            await get_database().dashboard_counters.update_one(
+                {"_id": DASHBOARD_LEASE_ID, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=self.reconcile_seconds * 0.9)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # the lease exists and has not expired
+        return True
+
+    async def compute(self) -> dict:
+        """The whole document recounted from source collections"""
+        db = get_database()
+        counts = await asyncio.gather(
+            db.articles.count_documents({}),
+            db.issues.count_documents({}),
+            db.users.count_documents({}),
+            db.users.count_documents({"is_premium": True}),
+            rollup_rows(),
+            db.articles.find({}, {"id": 1, "title": 1, "views": 1, "category": 1}).sort([("views", -1)]).limit(DASHBOARD_POPULAR_ARTICLES).to_list(length=None),
+            db.articles.find({}, {"id": 1, "title": 1, "created_at": 1, "category": 1, "author_name": 1}).sort([("created_at", -1)]).limit(DASHBOARD_RECENT_ITEMS).to_list(length=None),
+            db.transactions.find({}, {"amount": 1, "created_at": 1, "package_id": 1, "status": 1}).sort([("created_at", -1)]).limit(DASHBOARD_RECENT_ITEMS).to_list(length=None)
+        )
+        articles, magazines, users, subscribers, rows, popular, recent_articles, recent_payments = counts
+        return {
+            "total_articles": articles,
+            "total_magazines": magazines,
+            "total_users": users,
+            "total_subscribers": subscribers,
+            "total_revenue": summarize(rows)["total_revenue"],
+            "popular_articles": [popular_entry(article) for article in popular],
+            "recent_articles": [article_activity(article) for article in recent_articles],
+            "recent_payments": [payment_activity(transaction) for transaction in recent_payments]
+        }
+
+    async def reconcile(self, force: bool = False) -> bool:
+        """Recount and overwrite the document if this worker holds the lease; True if it ran"""
+        now = datetime.utcnow()
+        if not force and not await self._claim(now):
+            return False
+        started = time.perf_counter()
+        counters = await self.compute()
+        # Updates landing between the recount and this write are lost or doubled; the next pass settles them
+        previous = await get_database().dashboard_counters.find_one_and_update(
+            {"_id": DASHBOARD_COUNTERS_ID},
+            {"$set": {**counters, "reconciled_at": now}},
+            upsert=True
+        )
+        self.last_drift = {
+            field: counters[field] - previous.get(field, 0)
+            for field in counters
+            if field.startswith("total_") and previous and counters[field] != previous.get(field, 0)
+        }
+        self.reconciles += 1
+        self.last_reconcile_seconds = round(time.perf_counter() - started, 3)
+        return True
+
+    async def snapshot(self) -> dict:
+        """The dashboard document, recounted first if it has never been reconciled"""
+        counters = await get_database().dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID})
+        if counters is None or "reconciled_at" not in counters:
+            await self.reconcile(force=True)
+            counters = await get_database().dashboard_counters.find_one({"_id": DASHBOARD_COUNTERS_ID})
+        return counters
+
+    async def _run(self):
+        while True:
+            try:
+                await self.reconcile()
+            except Exception as e:
+                self.reconcile_failures += 1
+                print(f"Dashboard reconcile error: {str(e)}")
+            await asyncio.sleep(self.reconcile_seconds)
+
+    def start(self):
+        """Start the periodic reconciliation on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "reconcile_seconds": self.reconcile_seconds,
+            "updates": self.updates,
+            "update_failures": self.update_failures,
+            "reconciles": self.reconciles,
+            "reconcile_failures": self.reconcile_failures,
+            "last_reconcile_seconds": self.last_reconcile_seconds,
+            "last_drift": self.last_drift
+        }
+
+# Global dashboard counters
+dashboard_counters = DashboardCounters()
+
+async def main(command):
+    if command == "reconcile":
+        await dashboard_counters.reconcile(force=True)
+        print(f"Dashboard counters reconciled, drift: {dashboard_counters.last_drift or 'none'}")
+    else:
+        print("Usage: python dashboard_counters.py reconcile")
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else ""))
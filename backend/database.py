@@ -0,0 +1,176 @@
+"""
+Just Urbane - Database Provider
+One Motor client per process, shared by every router, with a tunable pool and pool metrics
+"""
+
+from typing import Optional, Dict, Any
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import monitoring
+import threading
+import time
+import os
+
+# Settings are read from the environment when the client is first built, so a .env loaded
+# after this module is imported still applies.
+DEFAULT_MONGO_URL = "mongodb://localhost:27017/just_urbane"
+DEFAULT_MONGO_DB_NAME = "just_urbane"
+
+def client_options() -> Dict[str, Any]:
+    """Keyword arguments for the Mongo client built from the environment"""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "30000")),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000")),  # max wait for a free connection
+        "readPreference": os.getenv("MONGO_READ_PREFERENCE", "primary"),
+    }
+    # Read / write concerns; empty values keep the server defaults
+    read_concern = os.getenv("MONGO_READ_CONCERN", "")  # local, majority, ...
+    write_concern = os.getenv("MONGO_WRITE_CONCERN", "")  # 1, majority, ...
+    write_journal = os.getenv("MONGO_WRITE_JOURNAL", "")  # true / false
+    write_timeout_ms = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", "0"))
+    if read_concern:
+        options["readConcernLevel"] = read_concern
+    if write_concern:
+        options["w"] = int(write_concern) if write_concern.isdigit() else write_concern
+    if write_journal:
+        options["journal"] = write_journal.lower() == "true"
+    if write_timeout_ms:
+        options["wTimeoutMS"] = write_timeout_ms
+    return options
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters fed by the driver's CMAP events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Check-out start and finish are published on the thread that runs the operation
+        self._local = threading.local()
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.pool_clears = 0
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._wait_ms()
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_created": self.connections_created,
+                "connections_closed": self.connections_closed,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_wait_ms": round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait_ms, 3),
+                "pool_clears": self.pool_clears
+            }
+
+class DatabaseProvider:
+    """Lazily builds the process-wide client; every router and helper goes through it"""
+
+    def __init__(self, url: Optional[str] = None, db_name: Optional[str] = None):
+        # None means MONGO_URL / MONGO_DB_NAME, looked up when the client is built
+        self.url = url
+        self.db_name = db_name
+        self.metrics = PoolMetrics()
+        self._client: Optional[AsyncIOMotorClient] = None
+        self._options: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self.url = self.url or os.getenv("MONGO_URL", DEFAULT_MONGO_URL)
+                    self.db_name = self.db_name or os.getenv("MONGO_DB_NAME", DEFAULT_MONGO_DB_NAME)
+                    self._options = client_options()
+                    self._client = AsyncIOMotorClient(
+                        self.url,
+                        event_listeners=[self.metrics],
+                        **self._options
+                    )
+        return self._client
+
+    @property
+    def db(self) -> AsyncIOMotorDatabase:
+        return self.client[self.db_name]
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "max_pool_size": self._options.get("maxPoolSize"),
+            "min_pool_size": self._options.get("minPoolSize"),
+            "wait_queue_timeout_ms": self._options.get("waitQueueTimeoutMS"),
+            **self.metrics.snapshot()
+        }
+
+# Global provider
+database_provider = DatabaseProvider()
+
+def get_database() -> AsyncIOMotorDatabase:
+    """FastAPI dependency (and plain accessor for helpers) returning the shared database"""
+    return database_provider.db
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Declarative Index Management
+Every index the backend relies on, reconciled at startup or from the command line
+
+    python db_indexes.py reconcile [--drop-extra]   create missing indexes, report extra/unused ones
+    python db_indexes.py check                      fail if a registered query shape does a COLLSCAN
+"""
+
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from pymongo import ASCENDING, DESCENDING
+from database import get_database
+from pagination import ARTICLE_LIST_SORT, ADMIN_ARTICLE_SORT, USER_SORT, MEDIA_SORT, MAGAZINE_SORT
+import argparse
+import asyncio
+import sys
+
+class IndexSpec:
+    """One declared index"""
+
+    def __init__(
+        self,
+        collection: str,
+        keys: List[Tuple[str, int]],
+        unique: bool = False,
+        sparse: bool = False,
+        expire_after_seconds: Optional[int] = None
+    ):
+        self.collection = collection
+        self.keys = keys
+        self.unique = unique
+        self.sparse = sparse
+        self.expire_after_seconds = expire_after_seconds  # TTL index when set
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def matches(self, info: Dict[str, Any]) -> bool:
+        """True if an existing index (from index_information) has the same keys and options"""
+        existing_keys = [(field, int(direction)) for field, direction in info["key"]]
+        return (
+            existing_keys == list(self.keys)
+            and bool(info.get("unique", False)) == self.unique
+            and bool(info.get("sparse", False)) == self.sparse
+            and info.get("expireAfterSeconds") == self.expire_after_seconds
+        )
+
+    def options(self) -> Dict[str, Any]:
+        options = {"name": self.name, "unique": self.unique, "sparse": self.sparse}
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return options
+
+# Idempotency key for payment verification; sparse because older transactions may lack it
+PAYMENT_ID_INDEX = IndexSpec("transactions", [("razorpay_payment_id", ASCENDING)], unique=True, sparse=True)
+
+INDEXES = [
+    # Articles - public listings, homepage sections and keyset pagination (sort keys end in _id)
+    IndexSpec("articles", [("status", ASCENDING), ("featured", DESCENDING), ("published_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("articles", [("status", ASCENDING), ("category", ASCENDING), ("featured", DESCENDING), ("published_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("articles", [("status", ASCENDING), ("category", ASCENDING), ("subcategory", ASCENDING), ("featured", DESCENDING), ("published_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("articles", [("status", ASCENDING), ("trending", ASCENDING), ("featured", DESCENDING), ("published_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("articles", [("views", DESCENDING)]),
+    IndexSpec("articles", [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("articles", [("id", ASCENDING)]),
+    IndexSpec("articles", [("slug", ASCENDING)]),
+
+    # Hourly view buckets - trending window scan and cleanup
+    IndexSpec("view_buckets", [("bucket", ASCENDING)]),
+
+    # Users and authentication
+    IndexSpec("users", [("email", ASCENDING)], unique=True),
+    IndexSpec("users", [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("users", [("is_premium", ASCENDING)]),
+    IndexSpec("admin_users", [("username", ASCENDING)], unique=True),
+
+    # Payments
+    IndexSpec("orders", [("razorpay_order_id", ASCENDING)], unique=True),
+    PAYMENT_ID_INDEX,
+    # Webhook inbox - due events (pending, or processing with an expired lease)
+    IndexSpec("webhook_events", [("status", ASCENDING), ("next_attempt_at", ASCENDING)]),
+    # Set only on processed and ignored events, which expire at that time
+    IndexSpec("webhook_events", [("expires_at", ASCENDING)], expire_after_seconds=0),
+    IndexSpec("transactions", [("status", ASCENDING), ("created_at", DESCENDING)]),
+    IndexSpec("transactions", [("created_at", DESCENDING)]),
+    # Payments whose revenue rollup is still to be recorded; sparse since the flag is cleared after
+    IndexSpec("transactions", [("revenue_pending", ASCENDING)], sparse=True),
+
+    # Media library
+    IndexSpec("media_files", [("id", ASCENDING)], unique=True),
+    IndexSpec("media_files", [("uploaded_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("media_files", [("file_type", ASCENDING), ("uploaded_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("media_files", [("tags", ASCENDING)]),
+
+    # Magazines, issues and homepage configuration
+    IndexSpec("magazines", [("id", ASCENDING)]),
+    IndexSpec("magazines", [("upload_date", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("issues", [("id", ASCENDING)]),
+    IndexSpec("issues", [("published_at", DESCENDING), ("_id", DESCENDING)]),
+    IndexSpec("homepage_config", [("active", ASCENDING)]),
+
+    # Shared response cache (RESPONSE_CACHE_SHARED=mongo) - invalidation by collection
+    IndexSpec("response_cache", [("tags", ASCENDING)]),
+]
+
+class QueryShape:
+    """A query the backend issues, with representative values, that must be index-backed"""
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        filter: Dict[str, Any],
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 20
+    ):
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.sort = sort
+        self.limit = limit
+
+    async def explain(self) -> dict:
+        cursor = get_database()[self.collection].find(self.filter)
+        if self.sort:
+            cursor = cursor.sort(self.sort)
+        return await cursor.limit(self.limit).explain()
+
+# Listing shapes use the sort definitions the routes page with, so the two cannot drift apart
+QUERY_SHAPES = [
+    QueryShape("public article list", "articles", {"status": "published"}, ARTICLE_LIST_SORT),
+    QueryShape("public category list", "articles", {"status": "published", "category": "fashion"}, ARTICLE_LIST_SORT),
+    QueryShape("public subcategory list", "articles", {"status": "published", "category": "fashion", "subcategory": "men"}, ARTICLE_LIST_SORT),
+    QueryShape("public trending list", "articles", {"status": "published", "trending": True}, ARTICLE_LIST_SORT),
+    QueryShape("article by id or slug", "articles", {"$and": [
+        {"$or": [{"id": "x"}, {"_id": "x"}, {"slug": "x"}]},
+        {"status": "published"}
+    ]}, limit=1),
+    QueryShape("admin article list", "articles", {}, ADMIN_ARTICLE_SORT),
+    QueryShape("popular articles", "articles", {}, [("views", DESCENDING)], limit=5),
+    QueryShape("user by email", "users", {"email": "reader@example.com"}, limit=1),
+    QueryShape("admin user list", "users", {}, USER_SORT),
+    QueryShape("admin by username", "admin_users", {"username": "admin"}, limit=1),
+    QueryShape("order by razorpay id", "orders", {"razorpay_order_id": "order_x"}, limit=1),
+    QueryShape("transaction by razorpay payment id", "transactions", {"razorpay_payment_id": "pay_x"}, limit=1),
+    QueryShape("due webhook events", "webhook_events", {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": datetime(2025, 1, 1)}}, [("next_attempt_at", ASCENDING)]),
+    QueryShape("payments pending a revenue rollup", "transactions", {"revenue_pending": True, "status": "success"}),
+    QueryShape("successful transactions", "transactions", {"status": "success"}, [("created_at", DESCENDING)]),
+    QueryShape("media by id", "media_files", {"id": "x"}, limit=1),
+    QueryShape("media library", "media_files", {}, MEDIA_SORT),
+    QueryShape("media by type", "media_files", {"file_type": "image"}, MEDIA_SORT),
+    QueryShape("media by tag", "media_files", {"tags": {"$in": ["cover"]}}),
+    QueryShape("magazine list", "magazines", {}, MAGAZINE_SORT),
+    QueryShape("active homepage config", "homepage_config", {"active": True}, limit=1),
+]
+
+async def reconcile_indexes(drop_extra: bool = False) -> Dict[str, List[str]]:
+    """Create missing indexes and report the ones nothing declares"""
+    db = get_database()
+    report = {"created": [], "existing": [], "extra": [], "unused": [], "errors": []}
+
+    for collection in sorted({spec.collection for spec in INDEXES}):
+        declared = [spec for spec in INDEXES if spec.collection == collection]
+        try:
+            existing = await db[collection].index_information()
+        except Exception as e:
+            report["errors"].append(f"{collection}: {str(e)}")
+            continue
+
+        for spec in declared:
+            if any(spec.matches(info) for info in existing.values()):
+                report["existing"].append(f"{collection}.{spec.name}")
+                continue
+            try:
+                await db[collection].create_index(spec.keys, **spec.options())
+                report["created"].append(f"{collection}.{spec.name}")
+            except Exception as e:
+                report["errors"].append(f"{collection}.{spec.name}: {str(e)}")
+
+        for name, info in existing.items():
+            if name == "_id_" or any(spec.matches(info) for spec in declared):
+                continue
+            report["extra"].append(f"{collection}.{name}")
+            if drop_extra:
+                await db[collection].drop_index(name)
+
+        # $indexStats is unavailable on some deployments; usage reporting is best-effort
+        try:
+            async for stats in db[collection].aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats.get("accesses", {}).get("ops", 0) == 0:
+                    report["unused"].append(f"{collection}.{stats['name']}")
+        except Exception:
+            pass
+
+    return report
+
+# Indexes confirmed present; an index is not dropped behind a running server, so once is enough
+_present: set = set()
+
+async def index_present(spec: IndexSpec) -> bool:
+    """True if the collection has an index matching spec (for code whose correctness depends on one)"""
+    key = (spec.collection, spec.name)
+    if key not in _present:
+        existing = await get_database()[spec.collection].index_information()
+        if not any(spec.matches(info) for info in existing.values()):
+            return False
+        _present.add(key)
+    return True
+
+def winning_stages(plan: dict) -> List[str]:
+    """All stage names in an explain plan tree"""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for child_key in ("inputStage", "queryPlan"):
+        if child_key in plan:
+            stages.extend(winning_stages(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(winning_stages(child))
+    return stages
+
+async def check_query_plans() -> List[str]:
+    """Names of registered query shapes whose winning plan scans the whole collection"""
+    failures = []
+    for shape in QUERY_SHAPES:
+        try:
+            explain = await shape.explain()
+        except Exception as e:
+            failures.append(f"{shape.name}: explain failed ({str(e)})")
+            continue
+        plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in winning_stages(plan):
+            failures.append(f"{shape.name}: COLLSCAN on {shape.collection}")
+    return failures
+
+def print_report(report: Dict[str, List[str]]):
+    for key in ("created", "extra", "unused", "errors"):
+        for entry in report[key]:
+            print(f"Index {key}: {entry}")
+    print(f"Indexes: {len(report['created'])} created, {len(report['existing'])} already present, "
+          f"{len(report['extra'])} extra, {len(report['errors'])} errors")
+
+def main():
+    parser = argparse.ArgumentParser(description="Just Urbane index management")
+    parser.add_argument("command", choices=["reconcile", "check"])
+    parser.add_argument("--drop-extra", action="store_true", help="Drop indexes that are not declared")
+    args = parser.parse_args()
+
+    if args.command == "reconcile":
+        report = asyncio.run(reconcile_indexes(drop_extra=args.drop_extra))
+        print_report(report)
+        sys.exit(1 if report["errors"] else 0)
+
+    failures = asyncio.run(check_query_plans())
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print(f"✅ All {len(QUERY_SHAPES)} query shapes are index-backed")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Just Urbane - Materialized Homepage Snapshot
+Builds the public homepage payload once per content change and serves it from memory
+
+The trending section comes from the precomputed ranking (trending.py) and so moves at most
+HOMEPAGE_SNAPSHOT_MAX_AGE behind it.
+"""
+
+from datetime import datetime
+from typing import Optional
+from database import get_database
+from section_queries import SectionSpec, run_sections, public_card, HOMEPAGE_SORT, CARD_FIELDS
+from trending import trending_ranking
+from single_flight import single_flight
+from serialization import dumps
+import asyncio
+import hashlib
+import time
+import os
+
+# Snapshot configuration
+HOMEPAGE_SNAPSHOT_MAX_AGE = int(os.getenv("HOMEPAGE_SNAPSHOT_MAX_AGE", "60"))  # seconds
+HOMEPAGE_SNAPSHOT_PERSIST = os.getenv("HOMEPAGE_SNAPSHOT_PERSIST", "true").lower() == "true"
+HOMEPAGE_SNAPSHOT_ID = "public"
+HOMEPAGE_SNAPSHOT_FLIGHT = "homepage_snapshot"
+
+HOMEPAGE_CATEGORIES = [
+    "food", "travel", "fashion", "people", "luxury",
+    "technology", "business", "culture", "entertainment"
+]
+
+class HomepageSnapshot:
+    """A rendered homepage payload with its version tag"""
+
+    def __init__(self, body: bytes, etag: str, built_at: float):
+        self.body = body
+        self.etag = etag
+        self.built_at = built_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    @property
+    def last_modified(self) -> datetime:
+        return datetime.utcfromtimestamp(self.built_at)
+
+class HomepageSnapshotStore:
+    """In-process homepage snapshot, optionally shared with other workers through Mongo"""
+
+    def __init__(self, max_age: int = HOMEPAGE_SNAPSHOT_MAX_AGE, persist: bool = HOMEPAGE_SNAPSHOT_PERSIST):
+        self.max_age = max_age
+        self.persist = persist
+        self._snapshot: Optional[HomepageSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    async def build_content(self) -> dict:
+        """Build the homepage sections from published articles in one aggregation"""
+        trending = await trending_ranking.articles(
+            {"status": "published"}, {field: 1 for field in CARD_FIELDS}, limit=6
+        )
+
+        # Featured first, then by published date; categories reuse the same index-backed order
+        specs = [
+            SectionSpec("hero", limit=1),
+            SectionSpec("featured", limit=4),
+            SectionSpec("latest", limit=8)
+        ]
+        if trending is None:
+            # Nothing ranked yet (no views recorded): fall back to the newest featured articles
+            specs.append(SectionSpec("trending", limit=6))
+        for category in HOMEPAGE_CATEGORIES:
+            specs.append(SectionSpec(category, match={"category": category}, limit=4))
+
+        sections = await run_sections(
+            specs,
+            base_match={"status": "published"},
+            base_sort=HOMEPAGE_SORT,
+            with_total=True,
+            normalize=public_card
+        )
+
+        # Hero article should be the first featured article or first published article
+        hero = sections.pop("hero")
+        total_articles = sections.pop("_total")
+        if trending is not None:
+            sections["trending"] = [public_card(article) for article in trending]
+
+        return {
+            "hero_article": hero[0] if hero else None,
+            "sections": sections,
+            "total_articles": total_articles
+        }
+
+    def render(self, content: dict, built_at: Optional[float] = None) -> HomepageSnapshot:
+        """Serialize homepage content once and tag it with a content hash"""
+        built_at = built_at or time.time()
+        # Hash the content before stamping it so identical builds share an ETag across workers
+        digest = hashlib.sha256(dumps(content, sort_keys=True)).hexdigest()[:32]
+
+        payload = dict(content)
+        payload["version"] = digest
+        payload["last_updated"] = datetime.utcfromtimestamp(built_at).isoformat()
+        body = dumps(payload)
+
+        return HomepageSnapshot(body=body, etag=f'"{digest}"', built_at=built_at)
+
+    async def rebuild(self) -> HomepageSnapshot:
+        """Rebuild the snapshot from the articles collection and publish it"""
+        async with self._lock:
+            snapshot = self.render(await self.build_content())
+            self._snapshot = snapshot
+
+            if self.persist:
+                try:
+                    await get_database().homepage_snapshots.replace_one(
+                        {"_id": HOMEPAGE_SNAPSHOT_ID},
+                        {
+                            "_id": HOMEPAGE_SNAPSHOT_ID,
+                            "body": snapshot.body.decode(),
+                            "etag": snapshot.etag,
+                            "built_at": snapshot.built_at
+                        },
+                        upsert=True
+                    )
+                except Exception as e:
+                    print(f"Homepage snapshot persist error: {str(e)}")
+
+            return snapshot
+
+    async def _load_shared(self) -> Optional[HomepageSnapshot]:
+        """Adopt a fresher snapshot built by another worker, if any"""
+        if not self.persist:
+            return None
+        try:
+            doc = await get_database().homepage_snapshots.find_one({"_id": HOMEPAGE_SNAPSHOT_ID})
+        except Exception as e:
+            print(f"Homepage snapshot load error: {str(e)}")
+            return None
+        if not doc or time.time() - doc["built_at"] > self.max_age:
+            return None
+        return HomepageSnapshot(body=doc["body"].encode(), etag=doc["etag"], built_at=doc["built_at"])
+
+    async def _refresh(self) -> HomepageSnapshot:
+        snapshot = self._snapshot
+        shared = await self._load_shared()
+        if shared is not None and (snapshot is None or shared.built_at > snapshot.built_at):
+            self._snapshot = shared
+            return shared
+
+        return await self.rebuild()
+
+    async def get(self) -> HomepageSnapshot:
+        """Return the current snapshot, rebuilding only once it exceeds the staleness bound"""
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.age <= self.max_age:
+            return snapshot
+        if snapshot is not None and single_flight.in_flight(HOMEPAGE_SNAPSHOT_FLIGHT):
+            # Another request is already refreshing; keep serving the expired snapshot until it lands
+            return snapshot
+
+        # Requests arriving before the first build all wait on the same one
+        return await single_flight.run(HOMEPAGE_SNAPSHOT_FLIGHT, self._refresh, stale=False)
+
+    async def invalidate(self):
+        """Rebuild after an article or homepage write; never fails the calling write"""
+        try:
+            await self.rebuild()
+        except Exception as e:
+            # Drop the local copy so the next read rebuilds it
+            self._snapshot = None
+            print(f"Homepage snapshot rebuild error: {str(e)}")
+
+# Global snapshot store
+homepage_snapshot = HomepageSnapshotStore()
+
+async def invalidate_homepage_snapshot():
+    await homepage_snapshot.invalidate()
@@ -0,0 +1,156 @@
+"""
+Just Urbane - Keyset Pagination
+Opaque cursor tokens over (sort key..., _id) so deep pages cost the same as the first one
+"""
+
+from fastapi import HTTPException
+from bson import json_util, Binary, Decimal128, Int64, ObjectId
+from datetime import datetime
+from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Tuple
+from pymongo import DESCENDING
+import base64
+import time
+import os
+
+# Listing sort orders; every one ends in _id so the order is total and stable,
+# and each has a matching (sort key, _id) index declared in db_indexes
+ARTICLE_LIST_SORT = [("featured", DESCENDING), ("published_at", DESCENDING), ("_id", DESCENDING)]
+ADMIN_ARTICLE_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+MEDIA_SORT = [("uploaded_at", DESCENDING), ("_id", DESCENDING)]
+USER_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+MAGAZINE_SORT = [("upload_date", DESCENDING), ("_id", DESCENDING)]
+ISSUE_SORT = [("published_at", DESCENDING), ("_id", DESCENDING)]
+
+# Cached totals for listing headers
+COUNT_CACHE_TTL = int(os.getenv("COUNT_CACHE_TTL", "30"))  # seconds
+# Every distinct filter (each admin search string) is an entry; least recently used ones go first
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "1000"))
+_count_cache: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+
+def encode_cursor(values: List[Any]) -> str:
+    """Pack the sort values of the last item into an opaque token"""
+    raw = json_util.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json_util.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+# BSON types a sort key may hold, in MongoDB's cross-type sort order (missing sorts as null;
+# internal types such as timestamps never appear in listing keys).
+# Comparison operators only match values of the same type, so "after" covers the other types explicitly:
+# some articles store published_at as an ISO string, others as a datetime.
+BSON_SORT_TYPES = ["null", "number", "string", "object", "binData", "objectId", "bool", "date"]
+
+def bson_sort_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, (bytes, Binary)):
+        return "binData"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _of_type(field: str, bson_type: str) -> Dict[str, Any]:
+    return {field: None} if bson_type == "null" else {field: {"$type": bson_type}}
+
+def _after(field: str, direction: int, value: Any) -> Optional[Dict[str, Any]]:
+    """Condition matching values of `field` that sort strictly after `value`"""
+    value_type = bson_sort_type(value)
+    rank = BSON_SORT_TYPES.index(value_type)
+    if direction == DESCENDING:
+        # Smaller values of the same type, then every type that sorts below it
+        later_types = BSON_SORT_TYPES[:rank]
+        same_type = {field: {"$lt": value}}
+    else:
+        later_types = BSON_SORT_TYPES[rank + 1:]
+        same_type = {field: {"$gt": value}}
+    branches = [] if value_type == "null" else [same_type]
+    branches.extend(_of_type(field, bson_type) for bson_type in later_types)
+    if not branches:
+        return None
+    return branches[0] if len(branches) == 1 else {"$or": branches}
+
+def keyset_filter(sort: List[Tuple[str, int]], values: List[Any]) -> Dict[str, Any]:
+    """Lexicographic 'after this row' filter for a compound sort"""
+    if len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    branches = []
+    for i, (field, direction) in enumerate(sort):
+        after = _after(field, direction, values[i])
+        if after is None:
+            continue
+        equal = [{prev_field: values[j]} for j, (prev_field, _) in enumerate(sort[:i])]
+        branches.append({"$and": equal + [after]} if equal else after)
+
+    return {"$or": branches} if branches else {"_id": {"$exists": False}}
+
+def sort_values(doc: dict, sort: List[Tuple[str, int]]) -> List[Any]:
+    return [doc.get(field) for field, _ in sort]
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    sort: List[Tuple[str, int]],
+    limit: int,
+    cursor: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+    skip: int = 0
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page after `cursor` (or at a legacy page offset); returns (items, next_cursor)"""
+    if cursor:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(cursor))]} if query else keyset_filter(sort, decode_cursor(cursor))
+
+    if projection is not None and any(value for key, value in projection.items() if key != "_id"):
+        # The cursor needs every sort key of the last row; exclusion projections already keep them
+        projection = {**projection, **{field: 1 for field, _ in sort}}
+
+    # One extra row tells us whether another page exists without counting
+    cursor_query = collection.find(query, projection).sort(sort)
+    if skip and not cursor:
+        cursor_query = cursor_query.skip(skip)
+    items = await cursor_query.limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(sort_values(items[-1], sort))
+
+    return items, next_cursor
+
+async def cached_count(collection, query: Dict[str, Any]) -> int:
+    """Total for a listing, served from a short-lived cache; unfiltered totals use collection metadata"""
+    if not query:
+        return await collection.estimated_document_count()
+
+    key = f"{collection.name}:{json_util.dumps(query, sort_keys=True)}"
+    now = time.time()
+    cached = _count_cache.get(key)
+    if cached and now - cached[0] < COUNT_CACHE_TTL:
+        _count_cache.move_to_end(key)
+        return cached[1]
+
+    # Only touched from the event loop, between awaits, so no lock is needed
+    count = await collection.count_documents(query)
+    _count_cache[key] = (now, count)
+    _count_cache.move_to_end(key)
+    while len(_count_cache) > COUNT_CACHE_MAX_ENTRIES:
+        _count_cache.popitem(last=False)
+    return count
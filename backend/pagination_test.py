@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Keyset Pagination Test
+Pages a scratch collection through paginate() and checks every row comes back once, in sort order
+
+Uses the database from MONGO_URL; the scratch collection is dropped afterwards.
+
+    python pagination_test.py
+"""
+
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import DESCENDING, ASCENDING
+from database import get_database
+from pagination import paginate, ARTICLE_LIST_SORT
+import asyncio
+import sys
+
+SCRATCH_COLLECTION = "keyset_pagination_test"
+
+def mixed_articles() -> list:
+    """published_at as datetimes (API-created), ISO strings (add_*_article scripts) and missing"""
+    articles = []
+    start = datetime(2025, 1, 1)
+    for i in range(30):
+        published_at = start + timedelta(days=i)
+        if i % 3 == 1:
+            published_at = published_at.isoformat()
+        elif i % 10 == 9:
+            published_at = None
+        article = {"_id": ObjectId(), "featured": i % 4 == 0, "title": f"Article {i}"}
+        if published_at is not None:
+            article["published_at"] = published_at
+        articles.append(article)
+    return articles
+
+async def page_through(collection, sort, limit: int) -> list:
+    seen, cursor = [], None
+    while True:
+        items, cursor = await paginate(collection, {}, sort, limit, cursor)
+        seen.extend(item["_id"] for item in items)
+        if cursor is None:
+            return seen
+
+async def run_tests() -> bool:
+    collection = get_database()[SCRATCH_COLLECTION]
+    await collection.drop()
+    await collection.insert_many(mixed_articles())
+    ok = True
+    try:
+        for label, sort in [
+            ("public article order", ARTICLE_LIST_SORT),
+            ("ascending mixed dates", [("published_at", ASCENDING), ("_id", ASCENDING)]),
+            ("descending mixed dates", [("published_at", DESCENDING), ("_id", DESCENDING)])
+        ]:
+            expected = [doc["_id"] async for doc in collection.find({}, {"_id": 1}).sort(sort)]
+            for limit in (1, 4, 7):
+                seen = await page_through(collection, sort, limit)
+                success = seen == expected
+                ok = ok and success
+                status = "✅ PASS" if success else "❌ FAIL"
+                print(f"{status} {label}, pages of {limit}: {len(seen)} of {len(expected)} rows in order")
+    finally:
+        await collection.drop()
+    return ok
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_tests()) else 1)
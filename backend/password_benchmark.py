@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Password Hashing Benchmark
+Login throughput and event-loop stalls with bcrypt inline versus in the worker pool
+(no database needed)
+
+    python password_benchmark.py [--logins 32] [--concurrency 8] [--workers 4] [--rounds 12]
+
+While the logins run, a ticker measures how late the event loop wakes it; that lag is what
+every other request on the worker waits in addition to its own work.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+async def ticker(lags, stop, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append((loop.time() - expected) * 1000)
+
+async def run(label, verify, logins, concurrency):
+    lags, stop = [], asyncio.Event()
+    tick = asyncio.create_task(ticker(lags, stop))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            assert await verify()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+    lags = lags or [0.0]
+    print(f"{label:>7}: {logins / elapsed:5.1f} logins/s, login p50 {percentile(latencies, 0.5):.0f} ms "
+          f"p99 {percentile(latencies, 0.99):.0f} ms, loop lag p99 {percentile(lags, 0.99):.0f} ms max {max(lags):.0f} ms")
+
+async def main():
+    parser = argparse.ArgumentParser(description="bcrypt login throughput benchmark")
+    parser.add_argument("--logins", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    args = parser.parse_args()
+
+    # The pool workers read the cost from the environment when they import the module
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    from password_hashing import PasswordHasher, create_context
+
+    context = create_context(args.rounds)
+    stored = context.hash("correct horse battery staple")
+    print(f"🔐 {args.logins} logins, {args.concurrency} concurrent, bcrypt cost {args.rounds}, "
+          f"{args.workers} {args.executor} workers, {os.cpu_count()} CPUs")
+
+    async def inline():
+        return context.verify("correct horse battery staple", stored)
+    await run("inline", inline, args.logins, args.concurrency)
+
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.logins, executor=args.executor)
+    await hasher.verify("warm up", stored)  # start the workers outside the timing
+
+    async def pooled():
+        valid, _ = await hasher.verify("correct horse battery staple", stored)
+        return valid
+    await run("pool", pooled, args.logins, args.concurrency)
+    hasher.shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,137 @@
+"""
+Just Urbane - Password Hashing
+bcrypt hashing and verification in a bounded process pool, off the event loop
+
+A bcrypt call at the default cost is a few hundred milliseconds of CPU; run inline it stalls
+every other request on the worker. Calls here go to PASSWORD_HASH_WORKERS processes, with at
+most PASSWORD_HASH_MAX_PENDING waiting; beyond that callers get PasswordHasherBusy (503).
+
+Hashes made with a cost other than BCRYPT_ROUNDS are re-hashed at the next successful login.
+"""
+
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException
+from passlib.context import CryptContext
+import asyncio
+import time
+import os
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Calls queued behind busy workers before new ones are turned away
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 16)))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process").lower()  # "process" or "thread"
+
+def create_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+# Module-level so pool workers build it once each
+_context = create_context()
+
+def _hash(password: str) -> str:
+    return _context.hash(password)
+
+def _verify(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    # New hash when the stored one was made with different cost parameters
+    return _context.verify_and_update(password, hashed_password)
+
+class PasswordHasherBusy(Exception):
+    """More password checks pending than the pool is allowed to queue"""
+
+class PasswordHasher:
+    """Bounded pool for bcrypt work; the event loop only waits on the result"""
+
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        executor: str = PASSWORD_HASH_EXECUTOR
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = executor
+        self._pool: Optional[Executor] = None
+        self.pending = 0
+        self.peak_pending = 0
+        self.calls = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.seconds = 0.0
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.executor == "thread":
+                # bcrypt releases the GIL, so threads also keep the loop responsive
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            else:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def _run(self, function, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PasswordHasherBusy(f"{self.pending} password operations already pending")
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), function, *args)
+        finally:
+            self.pending -= 1
+            self.calls += 1
+            self.seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """(password matches, replacement hash if the stored one should be upgraded)"""
+        if not hashed_password:
+            return False, None
+        valid, new_hash = await self._run(_verify, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+        return valid, new_hash
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.executor,
+            "workers": self.workers,
+            "rounds": BCRYPT_ROUNDS,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "max_pending": self.max_pending,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "rehashed": self.rehashed,
+            "avg_ms": round(self.seconds / self.calls * 1000, 3) if self.calls else 0.0
+        }
+
+# Global password hasher
+password_hasher = PasswordHasher()
+
+def _overloaded() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-ins in progress, please try again shortly",
+        headers={"Retry-After": "1"}
+    )
+
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise _overloaded()
+
+async def verify_password(password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """(password matches, replacement hash to store if the cost parameters changed)"""
+    try:
+        return await password_hasher.verify(password, hashed_password)
+    except PasswordHasherBusy:
+        raise _overloaded()
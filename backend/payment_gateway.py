@@ -0,0 +1,249 @@
+"""
+Just Urbane - Razorpay Gateway Client
+Non-blocking Razorpay REST calls over a pooled HTTP session, with timeouts, retries and a circuit breaker
+
+The razorpay SDK is synchronous; every call held the event loop for a full round-trip to the
+gateway. Calls here are awaited on one keep-alive aiohttp session. Failed calls are retried a
+bounded number of times with jittered backoff (POSTs only when the request never reached the
+gateway, so an order is never created twice), and after RAZORPAY_BREAKER_FAILURES consecutive
+failures calls fail fast for RAZORPAY_BREAKER_RESET seconds instead of queueing on a dead gateway.
+
+    RAZORPAY_API_URL=http://127.0.0.1:8010/v1    # the local stand-in (razorpay_standin.py)
+"""
+
+from typing import Any, Dict, Optional
+import aiohttp
+import asyncio
+import hashlib
+import random
+import hmac
+import time
+import os
+
+# RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET and RAZORPAY_API_URL are read when used, so keys in a
+# .env loaded after this module is imported still apply
+DEFAULT_RAZORPAY_API_URL = "https://api.razorpay.com/v1"
+
+# Seconds; the total bounds one attempt, not the retries
+RAZORPAY_CONNECT_TIMEOUT = float(os.getenv("RAZORPAY_CONNECT_TIMEOUT", "3"))
+RAZORPAY_TIMEOUT = float(os.getenv("RAZORPAY_TIMEOUT", "10"))
+RAZORPAY_MAX_RETRIES = int(os.getenv("RAZORPAY_MAX_RETRIES", "2"))
+RAZORPAY_RETRY_BACKOFF = float(os.getenv("RAZORPAY_RETRY_BACKOFF", "0.2"))
+RAZORPAY_POOL_SIZE = int(os.getenv("RAZORPAY_POOL_SIZE", "32"))
+RAZORPAY_BREAKER_FAILURES = int(os.getenv("RAZORPAY_BREAKER_FAILURES", "5"))
+RAZORPAY_BREAKER_RESET = float(os.getenv("RAZORPAY_BREAKER_RESET", "30"))
+
+# Gateway answers worth retrying: rate limited or temporarily down
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class GatewayError(Exception):
+    """The gateway refused or failed a call"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+class GatewayUnavailable(GatewayError):
+    """The gateway could not be reached in time, or the breaker is open"""
+
+    def __init__(self, message: str):
+        super().__init__(message, retryable=True)
+
+class CircuitBreaker:
+    """Closed until `threshold` consecutive failures, then open for `reset_after` seconds; one trial call half-opens it"""
+
+    def __init__(self, threshold: int = RAZORPAY_BREAKER_FAILURES, reset_after: float = RAZORPAY_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        # Reaching the threshold opens the breaker; a failed trial call re-opens it
+        if self._trial or (self.opened_at is None and self.failures >= self.threshold):
+            self.opened_at = time.monotonic()
+            self.trips += 1
+        self._trial = False
+
+    def release_trial(self):
+        """The trial call ended without a verdict (it was cancelled); the next call may try instead"""
+        self._trial = False
+
+class RazorpayGateway:
+    """Async Razorpay API client sharing one connection pool per worker"""
+
+    def __init__(
+        self,
+        key_id: Optional[str] = None,
+        key_secret: Optional[str] = None,
+        api_url: Optional[str] = None,
+        timeout: float = RAZORPAY_TIMEOUT,
+        max_retries: int = RAZORPAY_MAX_RETRIES,
+        pool_size: int = RAZORPAY_POOL_SIZE,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self._key_id = key_id
+        self._key_secret = key_secret
+        self._api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    @property
+    def key_id(self) -> Optional[str]:
+        return self._key_id or os.getenv("RAZORPAY_KEY_ID")
+
+    @property
+    def key_secret(self) -> Optional[str]:
+        return self._key_secret or os.getenv("RAZORPAY_KEY_SECRET")
+
+    @property
+    def api_url(self) -> str:
+        return (self._api_url or os.getenv("RAZORPAY_API_URL", DEFAULT_RAZORPAY_API_URL)).rstrip("/")
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.key_id and self.key_secret)
+
+    def _client(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                auth=aiohttp.BasicAuth(self.key_id, self.key_secret),
+                timeout=aiohttp.ClientTimeout(total=self.timeout, sock_connect=RAZORPAY_CONNECT_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+            )
+        return self._session
+
+    async def _attempt(self, method: str, path: str, payload: Optional[dict]) -> Dict[str, Any]:
+        try:
+            async with self._client().request(method, f"{self.api_url}{path}", json=payload) as response:
+                body = await response.json(content_type=None)
+                if response.status >= 400:
+                    error = (body or {}).get("error", {}) if isinstance(body, dict) else {}
+                    raise GatewayError(
+                        error.get("description") or f"Razorpay returned HTTP {response.status}",
+                        status=response.status,
+                        retryable=response.status in RETRYABLE_STATUSES
+                    )
+                return body
+        except aiohttp.ClientConnectorError as e:
+            # Never reached the gateway, so even a POST is safe to repeat
+            raise GatewayUnavailable(f"Razorpay unreachable: {str(e)}")
+        except asyncio.TimeoutError:
+            raise GatewayError(f"Razorpay did not answer within {self.timeout}s", retryable=True)
+        except aiohttp.ClientError as e:
+            raise GatewayError(f"Razorpay request failed: {str(e)}", retryable=True)
+
+    async def request(self, method: str, path: str, payload: Optional[dict] = None) -> Dict[str, Any]:
+        """One API call with retries; GETs retry on any transient failure, POSTs only when nothing was sent"""
+        if not self.configured:
+            raise GatewayError("Razorpay not configured")
+        trial = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise GatewayUnavailable("Razorpay is failing; not sending requests for now")
+
+        idempotent = method.upper() == "GET"
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    result = await self._attempt(method, path, payload)
+                except GatewayError as e:
+                    retry = e.retryable and (idempotent or isinstance(e, GatewayUnavailable))
+                    if not retry or attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    # Full jitter keeps retries from many workers from arriving together
+                    await asyncio.sleep(random.uniform(0, RAZORPAY_RETRY_BACKOFF * 2 ** attempt))
+                    continue
+                self.breaker.record_success()
+                return result
+        except GatewayError as e:
+            self.failures += 1
+            self.last_error = str(e)
+            if e.retryable:
+                # Client errors (4xx) say nothing about the gateway's health
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            # Not an Exception, so nothing above records it; a held trial flag would block every later call
+            if trial:
+                self.breaker.release_trial()
+            raise
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    async def create_order(self, order: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.request("POST", "/orders", order)
+
+    async def fetch_order(self, order_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/orders/{order_id}")
+
+    async def fetch_payment(self, payment_id: str) -> Dict[str, Any]:
+        return await self.request("GET", f"/payments/{payment_id}")
+
+    def payment_signature(self, order_id: str, payment_id: str) -> str:
+        """The signature Razorpay Checkout returns for a successful payment"""
+        return hmac.new(self.key_secret.encode(), f"{order_id}|{payment_id}".encode(), hashlib.sha256).hexdigest()
+
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        return hmac.compare_digest(self.payment_signature(order_id, payment_id), signature or "")
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def stats(self) -> dict:
+        return {
+            "configured": self.configured,
+            "api_url": self.api_url,
+            "breaker": self.breaker.state,
+            "breaker_trips": self.breaker.trips,
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "avg_ms": round(self.seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            "last_error": self.last_error
+        }
+
+# Global Razorpay client
+payment_gateway = RazorpayGateway()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Static Precompression
+Writes .br/.gz siblings for compressible static files so the /uploads mount serves them
+without compressing per request
+
+    python precompress_static.py [directory ...]    # defaults to /app/uploads
+
+Run after deploys and uploads; unchanged files are skipped and a variant that is not
+smaller than its source is removed again.
+"""
+
+from compression import COMPRESSION_MIN_SIZE, ENCODING_SUFFIXES, is_compressible, brotli
+from pathlib import Path
+from typing import Optional
+import mimetypes
+import argparse
+import gzip
+import os
+
+DEFAULT_DIRECTORIES = ["/app/uploads"]
+
+def encode(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output byte-identical between runs
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def precompress_file(path: Path, encoding: str, stats: dict):
+    variant = Path(f"{path}{ENCODING_SUFFIXES[encoding]}")
+    source_stat = path.stat()
+    if variant.exists() and variant.stat().st_mtime >= source_stat.st_mtime:
+        stats["fresh"] += 1
+        return
+
+    data = path.read_bytes()
+    compressed = encode(data, encoding)
+    if len(compressed) >= len(data):
+        if variant.exists():
+            variant.unlink()
+        stats["not_smaller"] += 1
+        return
+
+    variant.write_bytes(compressed)
+    # Same mtime as the source so the variant counts as fresh
+    os.utime(variant, (source_stat.st_atime, source_stat.st_mtime))
+    stats["written"] += 1
+    stats["bytes_in"] += len(data)
+    stats["bytes_out"] += len(compressed)
+
+def precompress_directory(directory: str, stats: dict, minimum_size: int = COMPRESSION_MIN_SIZE):
+    encodings = [encoding for encoding in ENCODING_SUFFIXES if encoding != "br" or brotli is not None]
+    suffixes = tuple(ENCODING_SUFFIXES.values())
+
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(suffixes):
+                continue
+            path = Path(root) / name
+            media_type: Optional[str] = mimetypes.guess_type(name)[0]
+            if not is_compressible(media_type) or path.stat().st_size < minimum_size:
+                continue
+            stats["files"] += 1
+            for encoding in encodings:
+                try:
+                    precompress_file(path, encoding, stats)
+                except Exception as e:
+                    stats["errors"] += 1
+                    print(f"❌ {path}{ENCODING_SUFFIXES[encoding]}: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Write .br/.gz siblings for compressible static files")
+    parser.add_argument("directories", nargs="*", default=DEFAULT_DIRECTORIES)
+    parser.add_argument("--min-size", type=int, default=COMPRESSION_MIN_SIZE)
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("⚠️ brotli not installed - writing .gz variants only")
+
+    stats = {"files": 0, "written": 0, "fresh": 0, "not_smaller": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0}
+    for directory in args.directories:
+        print(f"📁 {directory}")
+        precompress_directory(directory, stats, args.min_size)
+
+    saved = stats["bytes_in"] - stats["bytes_out"]
+    print(f"✅ {stats['files']} compressible files: {stats['written']} variants written, "
+          f"{stats['fresh']} up to date, {stats['not_smaller']} not smaller, {stats['errors']} errors")
+    print(f"📉 {stats['bytes_in']} -> {stats['bytes_out']} bytes ({saved} saved)")
+
+if __name__ == "__main__":
+    main()
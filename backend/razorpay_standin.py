@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Razorpay Stand-in
+A local imitation of the Razorpay orders and payments API for offline checkout testing
+
+    python razorpay_standin.py [--port 8010] [--latency-ms 150] [--jitter-ms 100] [--error-rate 0.02]
+    RAZORPAY_API_URL=http://127.0.0.1:8010/v1 RAZORPAY_KEY_ID=rzp_test_local RAZORPAY_KEY_SECRET=standin-secret uvicorn server:app
+
+Orders and payments live in memory. POST /v1/standin/orders/{id}/pay plays the part of the
+customer completing Checkout: it captures a payment and returns the razorpay_payment_id and
+razorpay_signature the frontend would post to /api/payments/razorpay/verify. Latency, jitter
+and error rate are adjustable so tail latency and the client's retries and breaker can be
+exercised.
+"""
+
+from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import JSONResponse
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from typing import Any, Dict
+import argparse
+import asyncio
+import hashlib
+import secrets
+import random
+import hmac
+import time
+import os
+
+STANDIN_KEY_ID = os.getenv("RAZORPAY_KEY_ID", "rzp_test_local")
+STANDIN_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET", "standin-secret")
+
+def razorpay_id(prefix: str) -> str:
+    return f"{prefix}_{secrets.token_hex(7)}"
+
+def error(status: int, code: str, description: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"code": code, "description": description}})
+
+def create_standin(latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0) -> FastAPI:
+    app = FastAPI(title="Razorpay stand-in")
+    basic = HTTPBasic()
+    orders: Dict[str, Dict[str, Any]] = {}
+    payments: Dict[str, Dict[str, Any]] = {}
+
+    def authenticate(credentials: HTTPBasicCredentials = Depends(basic)):
+        if not (hmac.compare_digest(credentials.username, STANDIN_KEY_ID) and hmac.compare_digest(credentials.password, STANDIN_KEY_SECRET)):
+            raise HTTPException(status_code=401, detail="The api key provided is invalid")
+
+    async def gateway_delay():
+        """Simulated network and processing time; a failure when the dice say so"""
+        delay = max(latency_ms + random.uniform(-jitter_ms, jitter_ms), 0) / 1000
+        if delay:
+            await asyncio.sleep(delay)
+        return random.random() < error_rate
+
+    @app.post("/v1/orders", dependencies=[Depends(authenticate)])
+    async def create_order(order: Dict[str, Any]):
+        if await gateway_delay():
+            return error(503, "SERVER_ERROR", "The server is temporarily unavailable")
+        if not isinstance(order.get("amount"), int) or order["amount"] < 100:
+            return error(400, "BAD_REQUEST_ERROR", "The amount must be atleast INR 1.00")
+        created = {
+            "id": razorpay_id("order"),
+            "entity": "order",
+            "amount": order["amount"],
+            "amount_paid": 0,
+            "amount_due": order["amount"],
+            "currency": order.get("currency", "INR"),
+            "receipt": order.get("receipt"),
+            "status": "created",
+            "attempts": 0,
+            "notes": order.get("notes", {}),
+            "created_at": int(time.time())
+        }
+        orders[created["id"]] = created
+        return created
+
+    @app.get("/v1/orders/{order_id}", dependencies=[Depends(authenticate)])
+    async def fetch_order(order_id: str):
+        if await gateway_delay():
+            return error(503, "SERVER_ERROR", "The server is temporarily unavailable")
+        if order_id not in orders:
+            return error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+        return orders[order_id]
+
+    @app.get("/v1/payments/{payment_id}", dependencies=[Depends(authenticate)])
+    async def fetch_payment(payment_id: str):
+        if await gateway_delay():
+            return error(503, "SERVER_ERROR", "The server is temporarily unavailable")
+        if payment_id not in payments:
+            return error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+        return payments[payment_id]
+
+    @app.post("/v1/standin/orders/{order_id}/pay")
+    async def pay_order(order_id: str):
+        """What Razorpay Checkout hands the browser after a successful payment"""
+        order = orders.get(order_id)
+        if order is None:
+            return error(400, "BAD_REQUEST_ERROR", "The id provided does not exist")
+        payment = {
+            "id": razorpay_id("pay"),
+            "entity": "payment",
+            "amount": order["amount"],
+            "currency": order["currency"],
+            "status": "captured",
+            "order_id": order_id,
+            "method": "card",
+            "captured": True,
+            "email": order["notes"].get("user_email"),
+            "created_at": int(time.time())
+        }
+        payments[payment["id"]] = payment
+        order.update({"status": "paid", "amount_paid": order["amount"], "amount_due": 0, "attempts": order["attempts"] + 1})
+        signature = hmac.new(STANDIN_KEY_SECRET.encode(), f"{order_id}|{payment['id']}".encode(), hashlib.sha256).hexdigest()
+        return {"razorpay_order_id": order_id, "razorpay_payment_id": payment["id"], "razorpay_signature": signature}
+
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Razorpay stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    print(f"💳 Razorpay stand-in on http://{args.host}:{args.port}/v1 (key {STANDIN_KEY_ID})")
+    uvicorn.run(create_standin(args.latency_ms, args.jitter_ms, args.error_rate), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
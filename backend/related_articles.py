@@ -0,0 +1,438 @@
+"""
+Just Urbane - Related Articles
+Precomputed TF-IDF nearest neighbours of every published article, kept in the related_articles collection
+
+A build vectorizes title, summary, body and tags into a sparse matrix, finds each article's top
+RELATED_TOP_K cosine neighbours block by block and writes the lists out. After that a changed
+article costs one pass over the matrix: its own list is recomputed, lists it now beats the weakest
+entry of take it in, and lists that held its old version are recomputed. Document frequencies stay
+fixed between builds; a build runs again once replaced rows pile up.
+"""
+
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from pymongo import ReplaceOne
+from scipy import sparse
+from database import get_database
+from content_versions import content_versions
+from section_queries import CARD_FIELDS
+from pagination import ARTICLE_LIST_SORT
+from search_index import plain_text, tokenize, identifier_query
+import numpy as np
+import asyncio
+import math
+import time
+import os
+
+RELATED_TOP_K = int(os.getenv("RELATED_TOP_K", "10"))
+# Term count multipliers; a title word says more about the subject than a body word
+RELATED_FIELD_WEIGHTS: Dict[str, float] = {
+    "title": 3.0,
+    "tags": 2.0,
+    "summary": 1.5,
+    "body": 1.0,
+}
+# Terms in more than this share of articles carry no signal and make the build product dense
+RELATED_MAX_DF = float(os.getenv("RELATED_MAX_DF", "0.5"))
+RELATED_MAX_DF_MIN_ARTICLES = 100
+RELATED_MIN_SCORE = float(os.getenv("RELATED_MIN_SCORE", "0.02"))
+# Dense cells per build block (block rows x articles, and x terms for the block itself)
+RELATED_BLOCK_CELLS = 4_000_000
+# Rebuild once this share of rows belongs to removed or replaced articles
+RELATED_REBUILD_RATIO = float(os.getenv("RELATED_REBUILD_RATIO", "0.2"))
+RELATED_REBUILD_MIN_DEAD = 200
+RELATED_WRITE_BATCH = 500
+
+RELATED_SOURCE_FIELDS = ["_id", "id", "slug", "status"] + list(RELATED_FIELD_WEIGHTS)
+
+def term_weights(article: dict) -> Counter:
+    """Field-weighted term counts of an article"""
+    counts: Counter = Counter()
+    for field, weight in RELATED_FIELD_WEIGHTS.items():
+        for token, count in Counter(tokenize(plain_text(article.get(field)))).items():
+            counts[token] += weight * count
+    return counts
+
+class RelatedModel:
+    """Row-normalized TF-IDF matrix of published articles and each row's nearest neighbours"""
+
+    def __init__(self, top_k: int = RELATED_TOP_K):
+        self.top_k = top_k
+        self._columns: Dict[str, int] = {}
+        self._idf: List[float] = []
+        self._ignored: Set[str] = set()  # over RELATED_MAX_DF at build time
+        self._documents = 0
+        # Rows never move: built rows sit in _base, rows added since in _delta
+        self._base = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._delta_rows: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._delta = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._keys: List[Any] = []
+        self._rows: Dict[str, int] = {}
+        self._aliases: Dict[str, str] = {}  # public id / slug -> str(_id)
+        self._alive = np.zeros(0, dtype=bool)
+        self._neighbours = np.full((0, top_k), -1, dtype=np.int32)
+        self._scores = np.zeros((0, top_k), dtype=np.float32)
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def needs_rebuild(self) -> bool:
+        return self._dead >= max(RELATED_REBUILD_MIN_DEAD, RELATED_REBUILD_RATIO * len(self._keys))
+
+    @classmethod
+    def build(cls, articles: List[dict], top_k: int = RELATED_TOP_K) -> "RelatedModel":
+        model = cls(top_k)
+        articles = [article for article in articles if article.get("status") == "published"]
+        counts = [term_weights(article) for article in articles]
+        frequencies: Counter = Counter()
+        for weights in counts:
+            frequencies.update(weights.keys())
+
+        model._documents = len(articles)
+        max_df = RELATED_MAX_DF * len(articles) if len(articles) >= RELATED_MAX_DF_MIN_ARTICLES else len(articles)
+        for term, frequency in frequencies.items():
+            if frequency > max_df:
+                model._ignored.add(term)
+            else:
+                model._columns[term] = len(model._idf)
+                model._idf.append(model._smooth_idf(frequency))
+
+        indptr, indices, data = [0], [], []
+        for article, weights in zip(articles, counts):
+            columns, values = model._vector(weights)
+            indices.append(columns)
+            data.append(values)
+            indptr.append(indptr[-1] + len(columns))
+            model._register(article, len(model._keys))
+        model._base = sparse.csr_matrix(
+            (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+             np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+             np.array(indptr, dtype=np.int64)),
+            shape=(len(articles), len(model._idf)), dtype=np.float32
+        )
+        model._grow(len(articles))
+        model._alive[:len(articles)] = True
+
+        # Sparse matrix times a dense block of rows: a single pass over the matrix per block
+        block = max(1, RELATED_BLOCK_CELLS // max(1, len(articles), len(model._idf)))
+        for start in range(0, len(articles), block):
+            stop = min(start + block, len(articles))
+            similarities = model._base @ model._base[start:stop].T.toarray()
+            similarities[np.arange(start, stop), np.arange(stop - start)] = 0
+            for offset, row in enumerate(range(start, stop)):
+                model._set(row, *model._top(similarities[:, offset]))
+        return model
+
+    def _smooth_idf(self, frequency: int) -> float:
+        return math.log((1 + self._documents) / (1 + frequency)) + 1
+
+    def _vector(self, weights: Counter) -> Tuple[np.ndarray, np.ndarray]:
+        """Sorted column ids and L2-normalized sublinear TF-IDF values"""
+        terms = [term for term in weights if term not in self._ignored]
+        for term in terms:
+            if term not in self._columns:
+                # Unseen at build time: treat as appearing in this article only
+                self._columns[term] = len(self._idf)
+                self._idf.append(self._smooth_idf(1))
+        columns = np.array([self._columns[term] for term in terms], dtype=np.int32)
+        idf = np.array([self._idf[column] for column in columns], dtype=np.float32)
+        values = (1 + np.log(np.array([weights[term] for term in terms], dtype=np.float32))) * idf
+        order = np.argsort(columns)
+        columns, values = columns[order], values[order]
+        norm = np.linalg.norm(values)
+        return columns, values / norm if norm else values
+
+    def _register(self, article: dict, row: int):
+        key = str(article["_id"])
+        self._keys.append(article["_id"])
+        self._rows[key] = row
+        for alias in (article.get("id"), article.get("slug")):
+            if alias:
+                self._aliases[str(alias)] = key
+
+    def _grow(self, size: int):
+        if size <= len(self._alive):
+            return
+        capacity = max(size, 2 * len(self._alive), 64)
+        extra = capacity - len(self._alive)
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._neighbours = np.vstack([self._neighbours, np.full((extra, self.top_k), -1, dtype=np.int32)])
+        self._scores = np.vstack([self._scores, np.zeros((extra, self.top_k), dtype=np.float32)])
+
+    def _top(self, similarities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Best rows of one similarity column (own row already zeroed), best first"""
+        k = min(self.top_k, len(similarities))
+        if k == 0:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+        best = np.argpartition(-similarities, k - 1)[:k] if len(similarities) > k else np.arange(len(similarities))
+        best = best[np.argsort(-similarities[best], kind="stable")]
+        best = best[similarities[best] > RELATED_MIN_SCORE]
+        return best.astype(np.int32), similarities[best].astype(np.float32)
+
+    def _set(self, row: int, rows: np.ndarray, scores: np.ndarray):
+        self._neighbours[row] = -1
+        self._scores[row] = 0
+        self._neighbours[row, :len(rows)] = rows
+        self._scores[row, :len(scores)] = scores
+
+    def _row_vector(self, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        if row < self._base.shape[0]:
+            start, end = self._base.indptr[row], self._base.indptr[row + 1]
+            return self._base.indices[start:end], self._base.data[start:end]
+        return self._delta_rows[row - self._base.shape[0]]
+
+    def _matrix(self, vectors: List[Tuple[np.ndarray, np.ndarray]]) -> sparse.csr_matrix:
+        indptr = np.cumsum([0] + [len(columns) for columns, _ in vectors])
+        return sparse.csr_matrix(
+            (np.concatenate([values for _, values in vectors]),
+             np.concatenate([columns for columns, _ in vectors]),
+             indptr),
+            shape=(len(vectors), len(self._idf)), dtype=np.float32
+        )
+
+    def _similarities(self, rows: List[int]) -> np.ndarray:
+        """Cosine similarity of every row (removed ones score 0) to each given row: rows x len(rows)"""
+        queries = self._matrix([self._row_vector(row) for row in rows]).T.toarray()
+        parts = []
+        for matrix in (self._base, self._delta):
+            if matrix.shape[0]:
+                # Columns added after a matrix was built cannot match any of its rows
+                parts.append(matrix @ queries[:matrix.shape[1]])
+        return np.vstack(parts)
+
+    def _kill(self, row: int):
+        if row < self._base.shape[0]:
+            self._base.data[self._base.indptr[row]:self._base.indptr[row + 1]] = 0
+        else:
+            columns, values = self._delta_rows[row - self._base.shape[0]]
+            self._delta_rows[row - self._base.shape[0]] = (columns, np.zeros_like(values))
+            self._delta = self._matrix(self._delta_rows)
+        self._alive[row] = False
+        self._set(row, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32))
+        self._dead += 1
+
+    def lookup(self, identifier: Any) -> Optional[Any]:
+        """_id of an indexed article by _id, public id or slug"""
+        key = str(identifier)
+        row = self._rows.get(key if key in self._rows else self._aliases.get(key))
+        return self._keys[row] if row is not None else None
+
+    def update(self, key: Any, article: Optional[dict]) -> Tuple[Set[int], bool]:
+        """Apply one article write (None when deleted): rows whose lists changed, and whether the article left"""
+        old = self._rows.pop(str(key), None)
+        if old is not None:
+            self._kill(old)
+        new = None
+        if article is not None and article.get("status") == "published":
+            new = len(self._keys)
+            self._delta_rows.append(self._vector(term_weights(article)))
+            self._delta = self._matrix(self._delta_rows)
+            self._register(article, new)
+            self._grow(new + 1)
+            self._alive[new] = True
+
+        size = len(self._keys)
+        # Lists that held the old version lose an entry and must be recomputed in full
+        stale: Set[int] = set()
+        if old is not None:
+            stale.update(np.flatnonzero((self._neighbours[:size] == old).any(axis=1)).tolist())
+        changed = set(stale)
+        if new is not None:
+            similarities = self._similarities([new])[:, 0]
+            similarities[new] = 0
+            self._set(new, *self._top(similarities))
+            changed.add(new)
+            # Lists the new version beats the weakest entry of only need it inserted
+            floors = np.maximum(self._scores[:size, -1], RELATED_MIN_SCORE)
+            for row in np.flatnonzero(self._alive[:size] & (similarities > floors)).tolist():
+                if row in stale:
+                    continue
+                rows = np.append(self._neighbours[row][self._neighbours[row] >= 0], new)
+                scores = np.append(self._scores[row][:len(rows) - 1], similarities[row])
+                order = np.argsort(-scores, kind="stable")[:self.top_k]
+                self._set(row, rows[order], scores[order])
+                changed.add(row)
+
+        stale = sorted(row for row in stale if self._alive[row])
+        if stale:
+            similarities = self._similarities(stale)
+            for column, row in enumerate(stale):
+                similarities[row, column] = 0
+                self._set(row, *self._top(similarities[:, column]))
+        return {row for row in changed if self._alive[row]}, old is not None and new is None
+
+    def update_many(self, updates: List[Tuple[Any, Optional[dict]]]) -> Tuple[Set[int], List[Any]]:
+        """Apply several writes: rows whose lists changed, and the articles that left"""
+        changed, removed = set(), []
+        for key, article in updates:
+            rows, gone = self.update(key, article)
+            changed |= rows
+            if gone:
+                removed.append(key)
+        # A row replaced by a later write in the same batch is gone again
+        return {row for row in changed if self._alive[row]}, removed
+
+    def neighbours(self, row: int) -> List[Tuple[Any, float]]:
+        rows = self._neighbours[row]
+        return [(self._keys[int(other)], round(float(score), 4))
+                for other, score in zip(rows, self._scores[row]) if other >= 0]
+
+    def key(self, row: int) -> Any:
+        return self._keys[row]
+
+    def rows(self) -> List[int]:
+        return list(self._rows.values())
+
+    def stats(self) -> dict:
+        return {
+            "articles": len(self._rows),
+            "terms": len(self._idf),
+            "ignored_terms": len(self._ignored),
+            "nonzeros": int(self._base.nnz + self._delta.nnz),
+            "replaced_rows": self._dead
+        }
+
+class RelatedArticles:
+    """The process-wide related-articles model and the related_articles collection it fills"""
+
+    def __init__(self):
+        self.model: Optional[RelatedModel] = None
+        self.version: Optional[int] = None
+        self.generation: Optional[datetime] = None
+        self.build_seconds: Optional[float] = None
+        self.updates = 0
+        self.update_seconds = 0.0
+        self._build_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    async def rebuild(self) -> RelatedModel:
+        """Recompute every list from scratch and replace the collection's contents"""
+        started = time.time()
+        version = (await content_versions.current("articles"))[0]
+        projection = {field: 1 for field in RELATED_SOURCE_FIELDS}
+        articles = await get_database().articles.find({"status": "published"}, projection).to_list(length=None)
+        # Pure NumPy/SciPy work on a private copy of the data, so it can leave the event loop
+        model = await asyncio.to_thread(RelatedModel.build, articles)
+
+        generation = datetime.utcnow()
+        async with self._lock:
+            # Held while writing so a sync on the old model cannot overwrite the new lists
+            await self._write(model, model.rows(), generation)
+            await get_database().related_articles.delete_many({"generation": {"$ne": generation}})
+            self.model = model
+            self.version = version
+            self.generation = generation
+            self.build_seconds = round(time.time() - started, 3)
+        print(f"🧭 Related articles built: {len(model)} articles in {self.build_seconds}s")
+        # Writes that landed during the build
+        await self._sync([], compare=True)
+        return model
+
+    def start(self):
+        """Build in the background on the running event loop"""
+        if self._build_task is None or self._build_task.done():
+            self._build_task = asyncio.get_running_loop().create_task(self._run_rebuild())
+
+    async def _run_rebuild(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            print(f"Related articles build error: {str(e)}")
+
+    async def _write(self, model: RelatedModel, rows: Iterable[int], generation: datetime):
+        now = datetime.utcnow()
+        operations = [
+            ReplaceOne({"_id": model.key(row)}, {
+                "neighbours": [{"_id": key, "score": score} for key, score in model.neighbours(row)],
+                "generation": generation,
+                "computed_at": now
+            }, upsert=True)
+            for row in rows
+        ]
+        for start in range(0, len(operations), RELATED_WRITE_BATCH):
+            await get_database().related_articles.bulk_write(operations[start:start + RELATED_WRITE_BATCH], ordered=False)
+
+    async def _apply(self, updates: List[Tuple[Any, Optional[dict]]]):
+        """Run model updates off the event loop and write the lists they changed"""
+        started = time.perf_counter()
+        changed, removed = await asyncio.to_thread(self.model.update_many, updates)
+        await self._write(self.model, changed, self.generation)
+        if removed:
+            await get_database().related_articles.delete_many({"_id": {"$in": removed}})
+        self.updates += len(updates)
+        self.update_seconds += time.perf_counter() - started
+
+    async def sync_articles(self, identifiers: Iterable[Any]):
+        """Recompute the lists affected by article writes; never fails the write"""
+        await self._sync(list(identifiers))
+
+    async def _sync(self, identifiers: List[Any], compare: bool = False):
+        if not self.ready:
+            return
+        try:
+            async with self._lock:
+                version = (await content_versions.current("articles"))[0]
+                updates: List[Tuple[Any, Optional[dict]]] = []
+                if compare or version != self.version:
+                    # Re-read what the change log names: this write and any from other workers
+                    version, changed = await content_versions.changes("articles", self.version)
+                    if changed is None:
+                        self.start()  # the log cannot say, so rebuild
+                        return
+                    identifiers = list(dict.fromkeys(changed + identifiers))
+                projection = {field: 1 for field in RELATED_SOURCE_FIELDS}
+                for identifier in identifiers:
+                    article = await get_database().articles.find_one(identifier_query(identifier), projection)
+                    key = article["_id"] if article is not None else self.model.lookup(identifier)
+                    if key is not None:
+                        updates.append((key, article))
+                if updates:
+                    await self._apply(updates)
+                self.version = version
+            if self.model.needs_rebuild:
+                self.start()
+        except Exception as e:
+            print(f"Related articles sync error for {identifiers}: {str(e)}")
+
+    async def related_cards(self, article: dict, limit: int = RELATED_TOP_K) -> List[dict]:
+        """Card fields of an article's neighbours, nearest first; newest in its category until built"""
+        db = get_database()
+        projection = {field: 1 for field in CARD_FIELDS}
+        stored = await db.related_articles.find_one({"_id": article["_id"]})
+        keys = [neighbour["_id"] for neighbour in (stored or {}).get("neighbours", [])][:limit]
+        if keys:
+            cards = await db.articles.find({"_id": {"$in": keys}, "status": "published"}, projection).to_list(length=None)
+            order = {str(key): position for position, key in enumerate(keys)}
+            return sorted(cards, key=lambda card: order[str(card["_id"])])
+        if stored is not None:
+            return []  # built, and nothing is similar enough
+        cursor = db.articles.find(
+            {"status": "published", "category": article.get("category"), "_id": {"$ne": article["_id"]}}, projection
+        ).sort(ARTICLE_LIST_SORT).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    def stats(self) -> dict:
+        stats = self.model.stats() if self.model is not None else {}
+        stats.update({
+            "ready": self.ready,
+            "version": self.version,
+            "built_at": self.generation.isoformat() if self.generation else None,
+            "build_seconds": self.build_seconds,
+            "updates": self.updates,
+            "avg_update_ms": round(self.update_seconds / self.updates * 1000, 3) if self.updates else 0.0
+        })
+        return stats
+
+# Global related-articles engine
+related_articles = RelatedArticles()
+
+async def sync_related_articles(*identifiers: Any):
+    """Call after creating, updating or deleting articles"""
+    await related_articles.sync_articles(identifiers)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Related Articles Benchmark
+Builds the TF-IDF neighbour model over a synthetic corpus and times incremental updates
+(no database needed)
+
+    python related_benchmark.py [--articles 10000] [--body-words 300] [--updates 50]
+
+Uses the same Zipf-like corpus as search_benchmark.py. Natural text shares fewer mid-frequency
+words between articles, so real builds are faster than this.
+"""
+
+import argparse
+import resource
+import time
+
+from related_articles import RelatedModel
+from search_benchmark import synthetic_articles, percentile
+
+def published(articles):
+    for article in articles:
+        article["status"] = "published"
+        yield article
+
+def main():
+    parser = argparse.ArgumentParser(description="Related articles build and update benchmark")
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--updates", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"📊 {args.articles} articles x {args.body_words} body words, vocabulary {args.vocabulary}")
+    articles = list(published(synthetic_articles(args.articles, args.body_words, args.vocabulary)))
+    started = time.perf_counter()
+    model = RelatedModel.build(articles)
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"🏗️  built in {time.perf_counter() - started:.1f}s: {model.stats()}, peak RSS {rss_mb:.0f} MB")
+
+    # Same _ids as the corpus, so edits replace existing articles
+    edits = list(published(synthetic_articles(args.updates, args.body_words, args.vocabulary, seed=11)))
+    for label, updates in (
+        ("edit", [(article["_id"], article) for article in edits]),
+        ("unpublish", [(key, None) for key in range(args.updates, 2 * args.updates)]),
+    ):
+        samples, changed = [], 0
+        for key, article in updates:
+            started = time.perf_counter()
+            rows, _ = model.update(key, article)
+            samples.append((time.perf_counter() - started) * 1000)
+            changed += len(rows)
+        print(f"✏️  {label}: p50 {percentile(samples, 0.5):.1f} ms, p99 {percentile(samples, 0.99):.1f} ms, "
+              f"{changed / len(samples):.1f} lists changed per update")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Just Urbane - Read-through Response Cache
+Encoded response bodies for rarely changing reference data, in an in-process LRU with TTL
+and optionally a cache shared by all workers
+
+Entries are keyed by the response's ETag, which already covers the route, the normalized
+query string and the content versions read. A bump by any process therefore stops old
+entries from matching, and a bump in this process also drops them (content_versions.on_bump).
+
+    RESPONSE_CACHE_SHARED=mongo    # also share entries through the response_cache collection
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+from bson import Binary
+from database import get_database
+from content_versions import content_versions
+import time
+import os
+
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_SHARED = os.getenv("RESPONSE_CACHE_SHARED", "").lower()  # "" or "mongo"
+
+class MemoryCacheBackend:
+    """Least-recently-used entries with a time to live"""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, Tuple[str, ...], float]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set(self, key: str, body: bytes, tags: Tuple[str, ...], ttl: int):
+        self._entries[key] = (body, tags, time.time() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def invalidate(self, *tags: str) -> int:
+        stale = [key for key, (_, entry_tags, _) in self._entries.items() if set(entry_tags) & set(tags)]
+        for key in stale:
+            del self._entries[key]
+        return len(stale)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "bytes": sum(len(body) for body, _, _ in self._entries.values()),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions
+        }
+
+class MongoCacheBackend:
+    """Entries in a Mongo collection, so a miss in one worker can be filled by another"""
+
+    def __init__(self, collection: str = "response_cache"):
+        self.collection = collection
+
+    async def get(self, key: str) -> Optional[bytes]:
+        doc = await get_database()[self.collection].find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return bytes(doc["body"]) if doc else None
+
+    async def set(self, key: str, body: bytes, tags: Tuple[str, ...], ttl: int):
+        await get_database()[self.collection].replace_one(
+            {"_id": key},
+            {"body": Binary(body), "tags": list(tags), "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+            upsert=True
+        )
+
+    async def invalidate(self, *tags: str) -> int:
+        result = await get_database()[self.collection].delete_many({"tags": {"$in": list(tags)}})
+        return result.deleted_count
+
+    def stats(self) -> dict:
+        return {"backend": "mongo", "collection": self.collection}
+
+class ReadThroughCache:
+    """Local backend in front of an optional shared one, filled from a loader on a miss"""
+
+    def __init__(self, local: MemoryCacheBackend, shared: Optional[MongoCacheBackend] = None, ttl: int = RESPONSE_CACHE_TTL):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.shared_errors = 0
+        self.load_seconds = 0.0
+
+    async def get_or_load(self, key: str, tags: Iterable[str], loader: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Cached body for `key`, or `await loader()` stored under it"""
+        tags = tuple(tags)
+        body = await self.local.get(key)
+        if body is not None:
+            self.hits += 1
+            return body
+
+        if self.shared is not None:
+            try:
+                body = await self.shared.get(key)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Response cache shared read error: {str(e)}")
+            if body is not None:
+                self.shared_hits += 1
+                await self.local.set(key, body, tags, self.ttl)
+                return body
+
+        self.misses += 1
+        started = time.perf_counter()
+        body = await loader()
+        self.load_seconds += time.perf_counter() - started
+        await self.local.set(key, body, tags, self.ttl)
+        if self.shared is not None:
+            try:
+                await self.shared.set(key, body, tags, self.ttl)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Response cache shared write error: {str(e)}")
+        return body
+
+    async def invalidate(self, *tags: str):
+        """Drop every entry built from these collections"""
+        self.invalidations += 1
+        await self.local.invalidate(*tags)
+        if self.shared is not None:
+            try:
+                await self.shared.invalidate(*tags)
+            except Exception as e:
+                self.shared_errors += 1
+                print(f"Response cache shared invalidation error: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            "avg_load_ms": round(self.load_seconds / self.misses * 1000, 3) if self.misses else 0.0,
+            "invalidations": self.invalidations,
+            "shared_errors": self.shared_errors,
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None
+        }
+
+def create_response_cache() -> ReadThroughCache:
+    shared = MongoCacheBackend() if RESPONSE_CACHE_SHARED == "mongo" else None
+    return ReadThroughCache(MemoryCacheBackend(), shared)
+
+# Global response cache; writes through the API drop affected entries as they bump versions
+response_cache = create_response_cache()
+content_versions.on_bump(response_cache.invalidate)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Revenue Rollups
+Successful payments summed per (day, package, currency), so revenue analytics read a few rows
+
+Payment verification adds each transaction to its row with one $inc, guarded by the payment ids
+the row already holds so a retry never counts a payment twice. The transaction is marked
+revenue_pending in the same update that marks it successful, and the mark is cleared once the row
+has it; startup records any payment left pending by a crash in between.
+
+Transactions recorded before rollups existed are folded in by a backfill, run automatically on
+startup while the collection is empty, or by hand (it recomputes every row from transactions).
+Rows a payment lands in while the backfill reads are recomputed again rather than overwritten:
+
+    python revenue_rollups.py backfill
+"""
+
+from datetime import datetime
+from typing import Dict, List
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from database import get_database
+import asyncio
+import time
+import sys
+
+# Passes over rows that keep taking payments mid-backfill before it gives up
+REVENUE_BACKFILL_ATTEMPTS = 5
+
+ROLLUP_PIPELINE = [
+    {"$match": {"status": "success", "created_at": {"$type": "date"}}},
+    {"$group": {
+        "_id": {
+            "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+            "package_id": {"$ifNull": ["$package_id", "unknown"]},
+            "currency": {"$ifNull": ["$currency", "INR"]}
+        },
+        "amount": {"$sum": "$amount"},
+        "transactions": {"$sum": 1},
+        "payments": {"$push": {"$ifNull": ["$razorpay_payment_id", "$id"]}}
+    }}
+]
+
+def rollup_id(created_at: datetime, package_id: str, currency: str) -> dict:
+    return {"day": created_at.strftime("%Y-%m-%d"), "package_id": package_id, "currency": currency}
+
+async def record_revenue(transaction: dict) -> bool:
+    """Add one successful transaction to its day's row unless the row holds it already; True if added"""
+    db = get_database()
+    payment_id = transaction.get("razorpay_payment_id") or transaction["id"]
+    key = rollup_id(transaction["created_at"], transaction.get("package_id") or "unknown", transaction.get("currency") or "INR")
+    try:
+        await db.revenue_rollups.update_one(
+            {"_id": key, "payments": {"$ne": payment_id}},
+            {
+                "$inc": {"amount": transaction.get("amount", 0), "transactions": 1},
+                "$push": {"payments": payment_id},
+                "$set": {"updated_at": datetime.utcnow()},
+                "$setOnInsert": key
+            },
+            upsert=True
+        )
+        added = True
+    except DuplicateKeyError:
+        added = False  # the row exists and already counts this payment
+    await db.transactions.update_one({"razorpay_payment_id": payment_id, "revenue_pending": True}, {"$unset": {"revenue_pending": ""}})
+    return added
+
+async def record_pending() -> int:
+    """Record payments whose verification stopped between the status update and its rollup"""
+    recorded = 0
+    async for transaction in get_database().transactions.find({"revenue_pending": True, "status": "success"}):
+        recorded += await record_revenue(transaction)
+    return recorded
+
+async def rollup_rows() -> List[dict]:
+    return await get_database().revenue_rollups.find({}, {"payments": 0}).to_list(length=None)
+
+async def _replace(rows: List[dict], started: datetime) -> List[dict]:
+    """Write recomputed rows unless a payment has landed in them since `started`; the keys that had"""
+    untouched = {"$not": {"$gte": started}}
+    operations = [
+        ReplaceOne({"_id": row["_id"], "updated_at": untouched}, {**row, **row["_id"], "updated_at": started}, upsert=True)
+        for row in rows
+    ]
+    if not operations:
+        return []
+    try:
+        await get_database().revenue_rollups.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        # The filter missed an existing row, so the upsert collided with its _id
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        return [rows[error["index"]]["_id"] for error in errors]
+    return []
+
+async def backfill() -> int:
+    """Recompute every row from successful transactions; the number of rows written"""
+    db = get_database()
+    keys, written = None, 0
+    for _ in range(REVENUE_BACKFILL_ATTEMPTS):
+        started = datetime.utcnow()
+        rows = await db.transactions.aggregate(ROLLUP_PIPELINE).to_list(length=None)
+        if keys is None:
+            written = len(rows)
+            # Rows whose transactions no longer count (deleted or no longer successful)
+            await db.revenue_rollups.delete_many({
+                "_id": {"$nin": [row["_id"] for row in rows]},
+                "updated_at": {"$not": {"$gte": started}}
+            })
+        else:
+            rows = [row for row in rows if row["_id"] in keys]
+        keys = await _replace(rows, started)
+        if not keys:
+            return written
+    raise RuntimeError(f"{len(keys)} revenue rollup rows kept changing during the backfill")
+
+async def ensure_backfilled():
+    """Backfill once when rollups are empty but payments exist, then record pending payments; never fails startup"""
+    db = get_database()
+    try:
+        if (await db.revenue_rollups.find_one({}, {"_id": 1}) is None
+                and await db.transactions.find_one({"status": "success"}, {"_id": 1}) is not None):
+            started = time.perf_counter()
+            rows = await backfill()
+            print(f"💰 Revenue rollups backfilled: {rows} rows in {time.perf_counter() - started:.3f}s")
+        recorded = await record_pending()
+        if recorded:
+            print(f"💰 Revenue rollups: {recorded} interrupted payments recorded")
+    except Exception as e:
+        print(f"Revenue rollup backfill error: {str(e)}")
+
+def summarize(rows: List[dict]) -> dict:
+    """Monthly revenue, package popularity and totals (amounts in paise) from rollup rows"""
+    monthly: Dict[str, int] = {}
+    packages: Dict[str, int] = {}
+    for row in rows:
+        month = row["day"][:7]
+        monthly[month] = monthly.get(month, 0) + row["amount"]
+        packages[row["package_id"]] = packages.get(row["package_id"], 0) + row["transactions"]
+    return {
+        "monthly_revenue": monthly,
+        "package_popularity": packages,
+        "total_transactions": sum(row["transactions"] for row in rows),
+        "total_revenue": sum(row["amount"] for row in rows)
+    }
+
+async def main(command):
+    if command == "backfill":
+        print(f"Revenue rollups rebuilt: {await backfill()} rows")
+    else:
+        print("Usage: python revenue_rollups.py backfill")
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else ""))
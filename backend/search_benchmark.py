@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Search Index Benchmark
+Builds the BM25 and suggestion indexes over a synthetic corpus and times queries against them
+(no database needed)
+
+    python search_benchmark.py [--articles 100000] [--body-words 300] [--queries 200]
+
+Words are drawn from a Zipf-like vocabulary, so the first few query terms match most of the
+corpus (the worst case for ranking) and the later ones only a handful of articles.
+"""
+
+from typing import List
+import itertools
+import argparse
+import resource
+import random
+import time
+
+from search_index import SearchIndex
+from suggest_index import SuggestIndex
+
+CATEGORIES = ["fashion", "travel", "food", "people", "luxury", "technology", "business", "culture", "entertainment"]
+
+QUERIES = [
+    "w0",                # in nearly every article
+    "w1 w2",             # two very common terms
+    "w5 w40 w300",       # mixed
+    "w2000",             # rare
+    "w15000 w9000",      # very rare
+    "w3 w7 w11 w19 w23", # long query of common terms
+]
+
+PREFIXES = ["w", "w1", "w12", "w123", "w1234", "author 1", "w5 w"]
+
+def cumulative_weights(size: int) -> List[float]:
+    return list(itertools.accumulate(1.0 / (rank + 1) for rank in range(size)))
+
+def synthetic_articles(count: int, body_words: int, vocabulary: int, seed: int = 7):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = cumulative_weights(vocabulary)
+    for i in range(count):
+        body = rng.choices(words, cum_weights=weights, k=body_words)
+        yield {
+            "_id": i,
+            "id": f"article-{i}",
+            "slug": f"article-{i}",
+            "status": "published" if i % 10 else "draft",
+            "title": " ".join(rng.choices(words, cum_weights=weights, k=8)),
+            "summary": " ".join(rng.choices(words, cum_weights=weights, k=25)),
+            "body": " ".join(body),
+            "tags": rng.sample(words[:500], 3),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "author_name": f"Author {i % 250}",
+            "views": rng.randrange(10000),
+        }
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Search index build and query benchmark")
+    parser.add_argument("--articles", type=int, default=100000)
+    parser.add_argument("--body-words", type=int, default=300)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"📊 {args.articles} articles x {args.body_words} body words, vocabulary {args.vocabulary}")
+    index = SearchIndex()
+    suggestions = SuggestIndex(bulk=True)
+    index_seconds = suggest_seconds = 0.0
+    for article in synthetic_articles(args.articles, args.body_words, args.vocabulary):
+        started = time.perf_counter()
+        index.add(article)
+        index_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        suggestions.add(article)
+        suggest_seconds += time.perf_counter() - started
+    started = time.perf_counter()
+    suggestions.finish()
+    suggest_seconds += time.perf_counter() - started
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"🏗️  search index built in {index_seconds:.1f}s: {index.stats()}")
+    print(f"🏗️  suggestions built in {suggest_seconds:.1f}s: {suggestions.stats()}, peak RSS {rss_mb:.0f} MB")
+
+    print(f"{'query':<22} {'filter':<9} {'matches':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for query in QUERIES:
+        for category in (None, "travel"):
+            _, total = index.search(query, status="published", category=category, limit=10)
+            samples = []
+            for i in range(args.queries):
+                started = time.perf_counter()
+                index.search(query, status="published", category=category, offset=(i % 5) * 10, limit=10)
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f"{query:<22} {category or '-':<9} {total:>8} "
+                  f"{percentile(samples, 0.5):>8.2f} {percentile(samples, 0.95):>8.2f} {percentile(samples, 0.99):>8.2f}")
+
+    started = time.perf_counter()
+    wide = suggestions.wide_prefixes()
+    for prefix in wide:
+        suggestions.cache_prefix(prefix)
+    print(f"\n🔥 warmed {len(wide)} wide prefixes in {(time.perf_counter() - started) * 1000:.0f} ms")
+    time_prefixes(suggestions, args.queries)
+
+    samples = []
+    for article in synthetic_articles(args.queries, args.body_words, args.vocabulary, seed=11):
+        started = time.perf_counter()
+        suggestions.add(article)  # same _ids as the corpus, so these are updates
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"✏️  incremental suggestion update: p50 {percentile(samples, 0.5):.3f} ms, p99 {percentile(samples, 0.99):.3f} ms")
+    # Cached top lists are adjusted in place, so the first call after the updates stays fast
+    time_prefixes(suggestions, args.queries)
+
+def time_prefixes(suggestions: SuggestIndex, queries: int):
+    print(f"{'prefix':<22} {'first ms':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for prefix in PREFIXES:
+        # The first call of an uncached wide prefix ranks its whole range and caches the top list
+        started = time.perf_counter()
+        suggestions.suggest(prefix)
+        first_ms = (time.perf_counter() - started) * 1000
+        samples = []
+        for _ in range(queries):
+            started = time.perf_counter()
+            suggestions.suggest(prefix)
+            samples.append((time.perf_counter() - started) * 1000)
+        print(f"{prefix:<22} {first_ms:>9.3f} {percentile(samples, 0.5):>8.3f} {percentile(samples, 0.99):>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,546 @@
+"""
+Just Urbane - Full-text Article Search
+In-memory inverted index with BM25F ranking, kept current on article writes
+
+The same article stream feeds the suggestion prefix index (suggest_index.py).
+Each worker holds its own indexes. Writes made through the API update it directly; writes
+made by other workers are re-read from the content version change log; a bump that names no
+articles (a script) rebuilds the index.
+"""
+
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from bson import ObjectId
+from database import get_database
+from content_versions import content_versions
+from section_queries import CARD_FIELDS
+from suggest_index import SuggestIndex, SUGGEST_LIMIT, SUGGEST_POPULARITY_REFRESH
+import numpy as np
+import unicodedata
+import asyncio
+import html
+import math
+import time
+import re
+import os
+
+# Field boosts for BM25F; a title hit counts three times a body hit
+SEARCH_FIELD_BOOSTS: Dict[str, float] = {
+    "title": 3.0,
+    "tags": 2.5,
+    "category": 2.0,
+    "author_name": 2.0,
+    "summary": 1.5,
+    "body": 1.0,
+}
+SEARCH_K1 = float(os.getenv("SEARCH_K1", "1.2"))
+SEARCH_B = float(os.getenv("SEARCH_B", "0.75"))
+# Rebuild once this share of indexed postings belongs to removed or replaced articles
+SEARCH_COMPACT_RATIO = float(os.getenv("SEARCH_COMPACT_RATIO", "0.2"))
+SEARCH_COMPACT_MIN_DEAD = 500
+SEARCH_SNIPPET_CHARS = int(os.getenv("SEARCH_SNIPPET_CHARS", "180"))
+SEARCH_BUILD_BATCH = 500
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in is it its of on or "
+    "our she that the their them they this to was we were with you your".split()
+)
+
+SEARCH_SOURCE_FIELDS = ["_id", "id", "slug", "status", "views", "subcategory"] + list(SEARCH_FIELD_BOOSTS)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_TAG_RE = re.compile(r"<[^>]+>")
+
+def plain_text(value: Any) -> str:
+    """Field value as plain text: lists joined, HTML tags and entities removed"""
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        value = " ".join(str(item) for item in value if item)
+    return html.unescape(_TAG_RE.sub(" ", str(value)))
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, accent-folded word tokens without stopwords"""
+    folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()
+    return [token for token in _TOKEN_RE.findall(folded) if token not in STOPWORDS]
+
+def highlight(text: str, terms: Set[str], width: int = SEARCH_SNIPPET_CHARS) -> str:
+    """HTML-escaped excerpt around the densest run of query terms, matches wrapped in <mark>"""
+    text = " ".join(plain_text(text).split())
+    if not text:
+        return ""
+
+    words = list(re.finditer(r"\S+", text))
+    hits = [i for i, word in enumerate(words) if set(tokenize(word.group())) & terms]
+
+    start = 0
+    if hits:
+        # Window start with the most hits inside `width` characters
+        best = 0
+        for i in hits:
+            limit = words[i].start() + width
+            count = sum(1 for j in hits if j >= i and words[j].end() <= limit)
+            if count > best:
+                best, start = count, max(0, i - 2)
+        start = words[start].start()
+    end = min(len(text), start + width)
+    if end < len(text) and text.rfind(" ", start, end) > start:
+        end = text.rfind(" ", start, end)  # do not cut the last word
+
+    parts = []
+    for word in re.finditer(r"\S+", text[start:end]):
+        escaped = html.escape(word.group())
+        parts.append(f"<mark>{escaped}</mark>" if set(tokenize(word.group())) & terms else escaped)
+    return ("… " if start > 0 else "") + " ".join(parts) + (" …" if end < len(text) else "")
+
+class IndexedArticle:
+    """What the index keeps per article besides its postings and filter codes"""
+
+    __slots__ = ("key", "public_id", "slug", "status", "category", "lengths")
+
+    def __init__(self, key: Any, public_id: Optional[str], slug: Optional[str], status: Optional[str],
+                 category: Optional[str], lengths: Dict[str, int]):
+        self.key = key
+        self.public_id = public_id
+        self.slug = slug
+        self.status = status
+        self.category = category
+        self.lengths = lengths
+
+class SearchIndex:
+    """Inverted index of term -> (doc numbers, BM25F impacts) in append-only typed arrays
+
+    Impacts fold field boosts, length normalization and tf saturation in at index time, using
+    the average field lengths of that moment; a rebuild renormalizes everything. Queries score
+    every posting of every query term at once with NumPy over zero-copy views of the arrays,
+    so ranking and match counts are exact however common the terms are.
+
+    Re-indexed and deleted articles leave their old postings behind as tombstones (status code
+    0); the owner rebuilds once needs_compaction says enough have piled up.
+    """
+
+    def __init__(self, boosts: Dict[str, float] = SEARCH_FIELD_BOOSTS, k1: float = SEARCH_K1, b: float = SEARCH_B):
+        self.boosts = boosts
+        self.k1 = k1
+        self.b = b
+        self._term_docs: Dict[str, array] = {}
+        self._term_impacts: Dict[str, array] = {}
+        self._docs: Dict[int, IndexedArticle] = {}
+        self._numbers: Dict[str, int] = {}  # str(_id), id and slug -> doc number
+        # Per doc number filter codes; code 0 is a removed article
+        self._status_codes = array("B")
+        self._category_codes = array("H")
+        self._status_ids: Dict[Optional[str], int] = {}
+        self._category_ids: Dict[Optional[str], int] = {None: 0}
+        self._field_totals: Dict[str, int] = {field: 0 for field in boosts}
+        self._dead = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self._dead > max(SEARCH_COMPACT_MIN_DEAD, len(self._docs) * SEARCH_COMPACT_RATIO)
+
+    def lookup(self, identifier: Any) -> Optional[int]:
+        return self._numbers.get(str(identifier))
+
+    def document(self, number: int) -> IndexedArticle:
+        return self._docs[number]
+
+    def _avg_length(self, field: str) -> float:
+        return self._field_totals[field] / len(self._docs) if self._docs else 0.0
+
+    def _code(self, codes: Dict[Optional[str], int], value: Optional[str]) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes) + 1
+        return code
+
+    def add(self, article: dict):
+        """Index an article document, replacing any earlier version of it"""
+        key = article["_id"]
+        self.remove(key)
+
+        field_terms = {field: tokenize(plain_text(article.get(field))) for field in self.boosts}
+        if article.get("subcategory"):
+            field_terms["category"] += tokenize(plain_text(article["subcategory"]))
+
+        number = len(self._status_codes)
+        for field, terms in field_terms.items():
+            self._field_totals[field] += len(terms)
+
+        # BM25F: boost and length-normalize term frequency per field, then saturate once
+        weighted: Dict[str, float] = defaultdict(float)
+        for field, terms in field_terms.items():
+            if not terms:
+                continue
+            # Totals already include this article, which is not in _docs yet
+            average = self._field_totals[field] / (len(self._docs) + 1) or 1.0
+            scale = self.boosts[field] / (1 - self.b + self.b * len(terms) / average)
+            for term, frequency in Counter(terms).items():
+                weighted[term] += frequency * scale
+
+        k1 = self.k1
+        term_docs, term_impacts = self._term_docs, self._term_impacts
+        for term, tf in weighted.items():
+            docs = term_docs.get(term)
+            if docs is None:
+                docs = term_docs[term] = array("I")
+                term_impacts[term] = array("f")
+            docs.append(number)
+            term_impacts[term].append(tf * (k1 + 1) / (tf + k1))
+
+        category = (article.get("category") or "").lower() or None
+        status = article.get("status")
+        self._status_codes.append(self._code(self._status_ids, status))
+        self._category_codes.append(self._code(self._category_ids, category) if category else 0)
+        self._docs[number] = IndexedArticle(
+            key, article.get("id"), article.get("slug"), status, category,
+            {field: len(terms) for field, terms in field_terms.items()}
+        )
+        for identifier in (key, article.get("id"), article.get("slug")):
+            if identifier:
+                self._numbers[str(identifier)] = number
+
+    def remove(self, identifier: Any) -> bool:
+        """Drop an article; its postings stay behind as tombstones"""
+        number = self.lookup(identifier)
+        if number is None:
+            return False
+        doc = self._docs.pop(number)
+        self._status_codes[number] = 0
+        self._category_codes[number] = 0
+        self._dead += 1
+        for field, length in doc.lengths.items():
+            self._field_totals[field] -= length
+        for identifier in (doc.key, doc.public_id, doc.slug):
+            if identifier and self._numbers.get(str(identifier)) == number:
+                del self._numbers[str(identifier)]
+        return True
+
+    def idf(self, term: str) -> float:
+        # Document frequency counts tombstones until the next rebuild
+        df = len(self._term_docs.get(term, ()))
+        total = len(self._status_codes)
+        return math.log(1 + (total - df + 0.5) / (df + 0.5))
+
+    def search(
+        self,
+        query: str,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 10
+    ) -> Tuple[List[Tuple[int, float]], int]:
+        """(doc number, score) pairs for one page, best first, and the total number of matches"""
+        terms = [term for term in dict.fromkeys(tokenize(query)) if term in self._term_docs]
+        if not terms:
+            return [], 0
+
+        status_codes = np.frombuffer(self._status_codes, dtype=np.uint8)
+        if status is not None:
+            if status not in self._status_ids:
+                return [], 0
+            allowed = status_codes == self._status_ids[status]
+        else:
+            allowed = status_codes != 0
+        if category is not None:
+            code = self._category_ids.get(category.lower())
+            if code is None:
+                return [], 0
+            allowed &= np.frombuffer(self._category_codes, dtype=np.uint16) == code
+
+        docs = np.concatenate([np.frombuffer(self._term_docs[term], dtype=np.uint32) for term in terms])
+        weights = np.concatenate([
+            np.frombuffer(self._term_impacts[term], dtype=np.float32) * np.float32(self.idf(term))
+            for term in terms
+        ])
+        scores = np.bincount(docs, weights=weights, minlength=len(status_codes))
+        scores[~allowed] = 0.0
+
+        matched = np.flatnonzero(scores)
+        total = len(matched)
+        k = min(offset + limit, total)
+        if k <= offset:
+            return [], total
+
+        # Partition only the matches; selecting among mostly-zero scores is much slower
+        top = matched[np.argpartition(scores[matched], total - k)[total - k:]]
+        # Best score first, ties in indexing order
+        top = top[np.lexsort((top, -scores[top]))]
+        return [(int(number), float(scores[number])) for number in top[offset:]], total
+
+    def stats(self) -> dict:
+        return {
+            "articles": len(self._docs),
+            "terms": len(self._term_docs),
+            "postings": sum(len(docs) for docs in self._term_docs.values()),
+            "tombstones": self._dead,
+            "avg_body_length": round(self._avg_length("body"), 1)
+        }
+
+def identifier_query(identifier: Any) -> dict:
+    candidates: List[dict] = [{"id": identifier}, {"_id": identifier}]
+    if isinstance(identifier, str) and ObjectId.is_valid(identifier):
+        candidates.append({"_id": ObjectId(identifier)})
+    return {"$or": candidates}
+
+class SearchResult:
+    """One page of hits as (article _id, score), best first"""
+
+    def __init__(self, hits: List[Tuple[Any, float]], total: int, took_ms: float):
+        self.hits = hits
+        self.total = total
+        self.took_ms = took_ms
+
+class ArticleSearch:
+    """The process-wide article and suggestion indexes and the Mongo plumbing around them"""
+
+    def __init__(self):
+        self.index = SearchIndex()
+        self.suggestions = SuggestIndex()
+        self.popularity_at = 0.0
+        self.version: Optional[int] = None
+        self.built_at: Optional[float] = None
+        self.build_seconds: Optional[float] = None
+        self.queries = 0
+        self.query_seconds = 0.0
+        self._build_task: Optional[asyncio.Task] = None
+        self._catch_up_task: Optional[asyncio.Task] = None
+        self._popularity_task: Optional[asyncio.Task] = None
+        self._warm_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.built_at is not None
+
+    async def rebuild(self) -> SearchIndex:
+        """Index every article from scratch and swap the new index in"""
+        started = time.time()
+        version = (await content_versions.current("articles"))[0]
+        index = SearchIndex()
+        suggestions = SuggestIndex(bulk=True)
+        projection = {field: 1 for field in SEARCH_SOURCE_FIELDS}
+        count = 0
+        async for article in get_database().articles.find({}, projection):
+            index.add(article)
+            suggestions.add(article)
+            count += 1
+            if count % SEARCH_BUILD_BATCH == 0:
+                await asyncio.sleep(0)  # keep serving requests during a large build
+        suggestions.finish()
+
+        async with self._lock:
+            self.index = index
+            self.suggestions = suggestions
+            self.popularity_at = started
+            self.version = version
+            self.built_at = time.time()
+            self.build_seconds = round(self.built_at - started, 3)
+        print(f"🔎 Search index built: {len(index)} articles in {self.build_seconds}s")
+        self._warm_task = asyncio.get_running_loop().create_task(self.warm_suggestions())
+        return index
+
+    def _add(self, article: dict):
+        self.index.add(article)
+        self.suggestions.add(article)
+
+    def _remove(self, identifier: Any):
+        number = self.index.lookup(identifier)
+        if number is not None:
+            self.suggestions.remove(self.index.document(number).key)
+            self.index.remove(identifier)
+
+    def start(self):
+        """Build the index in the background on the running event loop"""
+        if self._build_task is None:
+            self._build_task = asyncio.get_running_loop().create_task(self.rebuild())
+
+    async def ensure_ready(self):
+        if self.ready:
+            return
+        if self._build_task is None:
+            self.start()
+        await asyncio.shield(self._build_task)
+
+    async def sync_article(self, identifier: Any):
+        """Re-read one article after a write (or drop it if it is gone); never fails the write"""
+        if not self.ready:
+            return
+        try:
+            projection = {field: 1 for field in SEARCH_SOURCE_FIELDS}
+            article = await get_database().articles.find_one(identifier_query(identifier), projection)
+            async with self._lock:
+                if article is not None:
+                    self._add(article)
+                else:
+                    self._remove(identifier)
+        except Exception as e:
+            print(f"Search index sync error for {identifier}: {str(e)}")
+        self._compact_if_needed()
+
+    async def sync_articles(self, identifiers: Iterable[Any]):
+        for identifier in identifiers:
+            await self.sync_article(identifier)
+        # Exactly one bump since the index was last in step is the caller's own write,
+        # already applied above, so no catch-up scan is needed for it
+        version = (await content_versions.current("articles"))[0]
+        if self.version is not None and version == self.version + 1:
+            self.version = version
+
+    async def catch_up(self):
+        """Apply writes made by other workers: re-read the articles they logged, or rebuild"""
+        version, changed = await content_versions.changes("articles", self.version)
+        if changed is None:
+            # A script bumped the version, or more writes landed than the log keeps
+            await self.rebuild()
+            return
+        for identifier in dict.fromkeys(changed):
+            await self.sync_article(identifier)
+        async with self._lock:
+            self.version = max(version, self.version or 0)
+
+    def _compact_if_needed(self):
+        """Rebuild in the background once tombstones pile up; writes during it are caught up after"""
+        if self.index.needs_compaction and (self._build_task is None or self._build_task.done()):
+            self._build_task = asyncio.get_running_loop().create_task(self.rebuild())
+
+    async def _check_version(self):
+        """Start a background catch-up when another worker has changed articles"""
+        version = (await content_versions.current("articles"))[0]
+        if version == self.version or (self._catch_up_task is not None and not self._catch_up_task.done()):
+            return
+        self._catch_up_task = asyncio.get_running_loop().create_task(self._run_catch_up())
+
+    async def _run_catch_up(self):
+        try:
+            await self.catch_up()
+        except Exception as e:
+            print(f"Search index catch-up error: {str(e)}")
+
+    async def refresh_popularity(self):
+        """Re-read view counts so suggestions follow traffic, not just article edits"""
+        self.popularity_at = time.time()
+        views = {}
+        async for article in get_database().articles.find({"status": "published"}, {"_id": 1, "views": 1}):
+            views[str(article["_id"])] = int(article.get("views") or 0)
+        async with self._lock:
+            changed = self.suggestions.reweight(views)
+        if changed:
+            await self.warm_suggestions()
+
+    async def warm_suggestions(self):
+        """Rank the wide one- and two-letter prefixes ahead of the first keystroke"""
+        suggestions = self.suggestions
+        for prefix in suggestions.wide_prefixes():
+            if suggestions is not self.suggestions:
+                return  # replaced by a rebuild, which warms its own
+            suggestions.cache_prefix(prefix)
+            await asyncio.sleep(0)
+
+    async def _run_refresh_popularity(self):
+        try:
+            await self.refresh_popularity()
+        except Exception as e:
+            print(f"Suggestion popularity refresh error: {str(e)}")
+
+    async def suggest(self, prefix: str, limit: int = SUGGEST_LIMIT) -> dict:
+        """Titles, tags, authors and categories starting with the prefix, most viewed first"""
+        await self.ensure_ready()
+        await self._check_version()
+        if time.time() - self.popularity_at > SUGGEST_POPULARITY_REFRESH and (
+            self._popularity_task is None or self._popularity_task.done()
+        ):
+            self._popularity_task = asyncio.get_running_loop().create_task(self._run_refresh_popularity())
+
+        started = time.perf_counter()
+        suggestions = [suggestion.to_dict() for suggestion in self.suggestions.suggest(prefix, limit)]
+        took_ms = round((time.perf_counter() - started) * 1000, 3)
+        return {"prefix": prefix, "suggestions": suggestions, "took_ms": took_ms}
+
+    async def search(
+        self,
+        query: str,
+        status: Optional[str] = "published",
+        category: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 10
+    ) -> SearchResult:
+        """One page of ranked article _ids; status=None searches every status"""
+        await self.ensure_ready()
+        await self._check_version()
+
+        started = time.perf_counter()
+        hits, total = self.index.search(query, status=status, category=category, offset=offset, limit=limit)
+        elapsed = time.perf_counter() - started
+        self.queries += 1
+        self.query_seconds += elapsed
+        return SearchResult(
+            [(self.index.document(number).key, score) for number, score in hits],
+            total, round(elapsed * 1000, 3)
+        )
+
+    async def load_results(self, hits: List[Tuple[Any, float]], fields: Optional[List[str]] = None) -> List[dict]:
+        """Fetch the articles for a page of hits in rank order, with their scores"""
+        if not hits:
+            return []
+        projection = {field: 1 for field in fields} if fields else None
+        keys = [key for key, _ in hits]
+        articles = {
+            article["_id"]: article
+            async for article in get_database().articles.find({"_id": {"$in": keys}}, projection)
+        }
+        results = []
+        for key, score in hits:
+            article = articles.get(key)
+            if article is not None:
+                article["score"] = round(score, 4)
+                results.append(article)
+        return results
+
+    async def search_page(self, query: str, category: Optional[str] = None, page: int = 1, limit: int = 10) -> dict:
+        """Public search results with highlighted title and body snippet"""
+        result = await self.search(query, category=category, offset=(page - 1) * limit, limit=limit)
+        articles = await self.load_results(result.hits, CARD_FIELDS + ["body"])
+
+        terms = set(tokenize(query))
+        for article in articles:
+            body = article.pop("body", None)
+            article["highlights"] = {
+                "title": highlight(article.get("title", ""), terms, width=len(article.get("title") or "") or 1),
+                "snippet": highlight(body or article.get("summary", ""), terms)
+            }
+
+        return {
+            "query": query,
+            "results": articles,
+            "total": result.total,
+            "page": page,
+            "limit": limit,
+            "total_pages": (result.total + limit - 1) // limit,
+            "took_ms": result.took_ms
+        }
+
+    def stats(self) -> dict:
+        stats = self.index.stats()
+        stats.update({
+            "ready": self.ready,
+            "version": self.version,
+            "built_at": datetime.utcfromtimestamp(self.built_at).isoformat() if self.built_at else None,
+            "build_seconds": self.build_seconds,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0.0,
+            "suggestions": self.suggestions.stats()
+        })
+        return stats
+
+# Global article search
+article_search = ArticleSearch()
+
+async def sync_search_index(*identifiers: Any):
+    """Call after creating, updating or deleting articles"""
+    await article_search.sync_articles(identifiers)
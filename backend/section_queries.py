@@ -0,0 +1,149 @@
+"""
+Just Urbane - Section Query Engine
+Runs every article section of a page as one $facet aggregation with card-only projections
+"""
+
+from typing import Callable, List, Optional, Dict, Any, Tuple
+from pymongo import DESCENDING
+from bson import ObjectId
+from database import get_database
+import os
+
+# Fields an article card needs - never the body
+CARD_FIELDS = [
+    "id", "title", "summary", "dek", "hero_image", "author_name", "category", "subcategory",
+    "tags", "featured", "trending", "premium", "is_premium", "views", "reading_time",
+    "slug", "published_at", "created_at"
+]
+
+# Sort orders used by page builders; each one is backed by an index declared in db_indexes
+HOMEPAGE_SORT = [("featured", DESCENDING), ("published_at", DESCENDING)]
+POPULAR_SORT = [("views", DESCENDING)]
+
+# Most articles one batch lookup resolves
+ARTICLE_BATCH_LIMIT = int(os.getenv("ARTICLE_BATCH_LIMIT", "50"))
+
+class SectionSpec:
+    """One named section of a page: an extra filter, an optional re-sort, a limit and a projection"""
+
+    def __init__(
+        self,
+        name: str,
+        match: Optional[Dict[str, Any]] = None,
+        sort: Optional[List[Tuple[str, int]]] = None,
+        limit: int = 4,
+        fields: Optional[List[str]] = None
+    ):
+        self.name = name
+        self.match = match or {}
+        self.sort = sort  # None keeps the order of the base sort, which is index-backed; a re-sort runs in memory
+        self.limit = limit
+        self.fields = fields or CARD_FIELDS
+
+    def pipeline(self) -> List[Dict[str, Any]]:
+        stages = []
+        if self.match:
+            stages.append({"$match": self.match})
+        if self.sort:
+            stages.append({"$sort": dict(self.sort)})
+        stages.append({"$limit": self.limit})
+        stages.append({"$project": {field: 1 for field in self.fields}})
+        return stages
+
+def build_sections_pipeline(
+    specs: List[SectionSpec],
+    base_match: Optional[Dict[str, Any]] = None,
+    base_sort: Optional[List[Tuple[str, int]]] = None,
+    with_total: bool = False
+) -> List[Dict[str, Any]]:
+    """Build a single aggregation that fills every section in one round-trip"""
+    pipeline = []
+    if base_match:
+        pipeline.append({"$match": base_match})
+    if base_sort:
+        pipeline.append({"$sort": dict(base_sort)})
+
+    # Narrow documents to what any section reads before fanning out, so bodies never enter $facet
+    needed = set()
+    for spec in specs:
+        needed.update(spec.fields)
+        needed.update(spec.match.keys())
+        needed.update(field for field, _ in (spec.sort or []))
+    pipeline.append({"$project": {field: 1 for field in sorted(needed)}})
+
+    facets = {spec.name: spec.pipeline() for spec in specs}
+    if with_total:
+        facets["_total"] = [{"$count": "count"}]
+    pipeline.append({"$facet": facets})
+
+    return pipeline
+
+def normalize_card(article: dict) -> dict:
+    """Expose the public id and drop the Mongo _id"""
+    if "_id" in article:
+        _id = article.pop("_id")
+        if not article.get("id"):
+            article["id"] = str(_id)
+    return article
+
+def public_card(article: dict) -> dict:
+    """The public id rule (as on the homepage and in prepare_document): id is the Mongo _id"""
+    if "_id" in article:
+        article["id"] = str(article.pop("_id"))
+    return article
+
+async def run_sections(
+    specs: List[SectionSpec],
+    base_match: Optional[Dict[str, Any]] = None,
+    base_sort: Optional[List[Tuple[str, int]]] = None,
+    with_total: bool = False,
+    collection: str = "articles",
+    normalize: Callable[[dict], dict] = normalize_card
+) -> Dict[str, Any]:
+    """Run all sections as one $facet aggregation and return {section name: [cards]}"""
+    pipeline = build_sections_pipeline(specs, base_match, base_sort, with_total)
+    results = await get_database()[collection].aggregate(pipeline).to_list(length=1)
+    result = results[0] if results else {}
+
+    sections = {}
+    for spec in specs:
+        sections[spec.name] = [normalize(doc) for doc in result.get(spec.name, [])]
+
+    if with_total:
+        total = result.get("_total", [])
+        sections["_total"] = total[0]["count"] if total else 0
+
+    return sections
+
+async def fetch_articles(
+    refs: List[str],
+    match: Optional[Dict[str, Any]] = None,
+    projection: Optional[Dict[str, int]] = None,
+    collection: str = "articles"
+) -> List[Optional[Dict[str, Any]]]:
+    """Resolve ids, _ids or slugs with one $in query; results follow `refs`, None where nothing matched"""
+    refs = [str(ref) for ref in refs]
+    unique = list(dict.fromkeys(refs))
+    if not unique:
+        return []
+    keys: List[Any] = unique + [ObjectId(ref) for ref in unique if ObjectId.is_valid(ref)]
+    query: Dict[str, Any] = {"$or": [{"id": {"$in": unique}}, {"_id": {"$in": keys}}, {"slug": {"$in": unique}}]}
+    if match:
+        query = {"$and": [query, match]}
+    # Slugs are needed to match results up; dropped again below if the caller did not ask for them
+    strip_slug = bool(projection) and "slug" not in projection
+    if projection:
+        projection = {**projection, "id": 1, "slug": 1}
+
+    by_id: Dict[str, Dict[str, Any]] = {}
+    by_key: Dict[str, Dict[str, Any]] = {}
+    by_slug: Dict[str, Dict[str, Any]] = {}
+    async for doc in get_database()[collection].find(query, projection):
+        by_key[str(doc["_id"])] = doc
+        if doc.get("id") is not None:
+            by_id[str(doc["id"])] = doc
+        slug = doc.pop("slug", None) if strip_slug else doc.get("slug")
+        if slug is not None:
+            by_slug[str(slug)] = doc
+    # Same precedence as the single-article endpoint: id, then _id, then slug
+    return [by_id.get(ref) or by_key.get(ref) or by_slug.get(ref) for ref in refs]
@@ -0,0 +1,44 @@
+"""
+Just Urbane - Fast JSON Serialization
+Encodes Mongo documents straight to JSON bytes with orjson, without rebuilding them first
+"""
+
+from fastapi.responses import Response
+from bson import ObjectId, Decimal128
+from typing import Any, Iterable, List
+import orjson
+
+def _default(value: Any):
+    """BSON types orjson does not know natively"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+def dumps(content: Any, sort_keys: bool = False) -> bytes:
+    """JSON bytes for documents containing ObjectId, datetime and other BSON values"""
+    # Non-string keys never come out of Mongo, but homepage section maps and the like may use them
+    option = orjson.OPT_NON_STR_KEYS
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(content, default=_default, option=option)
+
+def prepare_document(document: dict) -> dict:
+    """Expose _id as id; nested ObjectId/datetime values are left for the encoder"""
+    if document is not None and "_id" in document:
+        document["id"] = document.pop("_id")
+    return document
+
+def prepare_documents(documents: Iterable[dict]) -> List[dict]:
+    return [prepare_document(document) for document in documents]
+
+class BSONJSONResponse(Response):
+    """JSON response for trusted database output; skips response_model validation and jsonable_encoder"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Serialization Micro-benchmark
+Per-item cost of turning a 100-article list from Mongo into response bytes
+
+    python serialization_benchmark.py [--items 100] [--rounds 200]
+
+legacy: prepare_list_response (convert_objectid_to_str) -> response_model=List[Article]
+        validation -> jsonable_encoder -> json.dumps, as GET /api/articles used to do
+fast:   prepare_documents -> BSONJSONResponse (orjson with a BSON default)
+"""
+
+from bson import ObjectId
+from datetime import datetime, timedelta
+from typing import List
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from server import Article, prepare_item_response
+from serialization import BSONJSONResponse, prepare_documents
+
+def sample_articles(count: int) -> List[dict]:
+    """Documents shaped like the articles collection, bodies included"""
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "id": f"article-{i}",
+            "title": f"The Art of Slow Travel, Part {i}",
+            "body": "<p>" + "Luxury is in each detail. " * 200 + "</p>",
+            "summary": "A considered guide to travelling well.",
+            "hero_image": f"https://images.example.com/hero-{i}.jpg",
+            "author_name": "Just Urbane Editorial",
+            "category": "travel",
+            "subcategory": "adventure",
+            "tags": ["travel", "luxury", "slow-travel"],
+            "featured": i % 10 == 0,
+            "trending": i % 7 == 0,
+            "premium": False,
+            "is_premium": False,
+            "views": i * 13,
+            "published_at": now - timedelta(days=i),
+            "created_at": now - timedelta(days=i, hours=1),
+            "reading_time": 6,
+            "slug": f"the-art-of-slow-travel-{i}",
+            "status": "published"
+        }
+        for i in range(count)
+    ]
+
+async def legacy(documents: List[dict], field) -> bytes:
+    content = [prepare_item_response(dict(document)) for document in documents]
+    encoded = await serialize_response(field=field, response_content=content)
+    return json.dumps(encoded, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+async def fast(documents: List[dict], field) -> bytes:
+    return BSONJSONResponse(prepare_documents([dict(document) for document in documents])).body
+
+def measure(name: str, encoder, documents: List[dict], rounds: int) -> float:
+    field = create_response_field(name="Response_get_articles", type_=List[Article])
+    loop = asyncio.new_event_loop()
+    try:
+        body = loop.run_until_complete(encoder(documents, field))
+        started = time.perf_counter()
+        for _ in range(rounds):
+            loop.run_until_complete(encoder(documents, field))
+        elapsed = time.perf_counter() - started
+    finally:
+        loop.close()
+
+    per_list_ms = elapsed / rounds * 1000
+    per_item_us = per_list_ms * 1000 / len(documents)
+    print(f"{name:<8} {per_list_ms:8.3f} ms/list  {per_item_us:8.2f} µs/item  {len(body):>8} bytes")
+    return per_list_ms
+
+def main():
+    parser = argparse.ArgumentParser(description="Article list serialization benchmark")
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    documents = sample_articles(args.items)
+    print(f"📊 {args.items} articles x {args.rounds} rounds")
+    legacy_ms = measure("legacy", legacy, documents, args.rounds)
+    fast_ms = measure("fast", fast, documents, args.rounds)
+    print(f"⚡ {legacy_ms / fast_ms:.1f}x faster")
+
+if __name__ == "__main__":
+    main()
@@ -3,23 +3,22 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import get_database, database_provider
 from bson import ObjectId
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Awaitable, Callable, Tuple
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 from dotenv import load_dotenv
 import uuid
-import json
 from pathlib import Path
 import shutil
 import aiohttp
-import razorpay
-import hmac
-import hashlib
+import asyncio
 
 # Import admin functionality
 from admin_routes import admin_router
@@ -29,6 +28,25 @@ from admin_article_routes import article_router
 from admin_media_routes import media_router
 from image_optimizer import advanced_image_optimizer
 from image_optimization_api import optimization_api
+from homepage_snapshot import homepage_snapshot, invalidate_homepage_snapshot
+from section_queries import CARD_FIELDS, ARTICLE_BATCH_LIMIT, fetch_articles
+from pagination import paginate, ARTICLE_LIST_SORT
+from db_indexes import reconcile_indexes, print_report, index_present, PAYMENT_ID_INDEX
+from content_versions import conditional_get, cache_headers, is_not_modified, bump_content_version, request_target
+from view_counter import view_counter
+from trending import trending_ranking
+from response_cache import response_cache
+from single_flight import single_flight, SingleFlightTimeout
+from auth_cache import auth_cache, invalidate_user_principal, USER_REALM
+from password_hashing import password_hasher, hash_password, verify_password
+from payment_gateway import payment_gateway, GatewayError, GatewayUnavailable
+from revenue_rollups import record_revenue, ensure_backfilled as backfill_revenue_rollups
+from dashboard_counters import dashboard_counters
+from webhook_inbox import webhook_inbox, verify_signature as verify_webhook_signature, webhook_secret
+from serialization import BSONJSONResponse, prepare_documents, prepare_document, dumps
+from compression import CompressionMiddleware, PrecompressedStaticFiles
+from search_index import article_search, sync_search_index
+from related_articles import related_articles, sync_related_articles, RELATED_TOP_K
 
 load_dotenv()
 
@@ -46,7 +64,8 @@ app.include_router(optimization_api)
 from pathlib import Path
 UPLOAD_DIR = Path("/app/uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
-app.mount("/uploads", StaticFiles(directory="/app/uploads"), name="uploads")
+# Text assets are served from .br/.gz siblings written by precompress_static.py
+app.mount("/uploads", PrecompressedStaticFiles(directory="/app/uploads"), name="uploads")
 
 # Mount optimized images directory
 OPTIMIZED_DIR = Path("/app/uploads/media/images/optimized")
@@ -58,6 +77,9 @@ WEBP_DIR = Path("/app/uploads/media/images/webp")
 WEBP_DIR.mkdir(parents=True, exist_ok=True)
 app.mount("/api/media/webp", StaticFiles(directory=str(WEBP_DIR)), name="webp-media")
 
+# Negotiated gzip/brotli for JSON and other text responses above COMPRESSION_MIN_SIZE
+app.add_middleware(CompressionMiddleware)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -65,16 +87,71 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Database connection
-mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017/just_urbane")
-client = MongoClient(mongo_url)
-db = client.just_urbane
+@app.on_event("startup")
+async def create_indexes():
+    print_report(await reconcile_indexes())
+
+@app.on_event("startup")
+async def start_view_counter():
+    view_counter.start()
+
+@app.on_event("startup")
+async def start_search_index():
+    article_search.start()
+
+@app.on_event("startup")
+async def start_related_articles():
+    related_articles.start()
+
+@app.on_event("startup")
+async def start_trending():
+    trending_ranking.start()
+
+@app.on_event("startup")
+async def start_revenue_rollups():
+    await backfill_revenue_rollups()
+
+@app.on_event("startup")
+async def start_webhook_inbox():
+    webhook_inbox.start()
+
+@app.on_event("startup")
+async def start_dashboard_counters():
+    dashboard_counters.start()
+
+@app.on_event("shutdown")
+async def flush_view_counter():
+    await view_counter.stop()
+
+@app.on_event("shutdown")
+async def stop_trending():
+    await trending_ranking.stop()
+
+@app.on_event("shutdown")
+async def stop_webhook_inbox():
+    await webhook_inbox.stop()
+
+@app.on_event("shutdown")
+async def stop_dashboard_counters():
+    await dashboard_counters.stop()
+
+@app.on_event("shutdown")
+async def close_payment_gateway():
+    await payment_gateway.close()
+
+@app.on_event("shutdown")
+def stop_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+def close_database():
+    database_provider.close()
 
 # Security
 security = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -83,10 +160,10 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 RAZORPAY_KEY_ID = os.getenv("RAZORPAY_KEY_ID")
 RAZORPAY_KEY_SECRET = os.getenv("RAZORPAY_KEY_SECRET")
 
-# Initialize Razorpay client
-razorpay_client = None
-if RAZORPAY_KEY_ID and RAZORPAY_KEY_SECRET:
-    razorpay_client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+# Razorpay API calls go through the async client in payment_gateway
+
+# A verification claim still "processing" after this long was left by a worker that stopped mid-activation
+PAYMENT_CLAIM_TIMEOUT_SECONDS = int(os.getenv("PAYMENT_CLAIM_TIMEOUT_SECONDS", "60"))
 
 # Subscription packages
 subscription_packages = {
@@ -247,6 +324,11 @@ class ArticleCreate(BaseModel):
     premium: bool = False
     is_premium: bool = False
 
+class ArticleBatchRequest(BaseModel):
+    ids: List[str]  # ids, _ids or slugs, in the order results should come back
+    view: str = "card"
+    fields: Optional[str] = None  # Comma-separated field names
+
 class Category(BaseModel):
     id: Optional[str] = None
     name: str
@@ -314,13 +396,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# bcrypt runs in the password_hashing pool; these raise 503 when too many are queued
+async def get_password_hash(password):
+    return await hash_password(password)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: AsyncIOMotorDatabase = Depends(get_database)):
+    # A token verified earlier skips both the signature check and the user lookup
+    cached = auth_cache.get(USER_REALM, credentials.credentials)
+    if cached is not None:
+        return dict(cached.principal)
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -334,10 +419,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except JWTError:
         raise credentials_exception
     
-    user = db.users.find_one({"email": email})
+    user = await db.users.find_one({"email": email})
     if user is None:
         raise credentials_exception
-    return user
+    auth_cache.put(USER_REALM, credentials.credentials, email, payload, user)
+    return dict(user)
 
 def convert_objectid_to_str(item):
     if isinstance(item, dict):
@@ -364,49 +450,30 @@ def prepare_item_response(item):
     
     return item
 
-def prepare_list_response(items):
-    return [prepare_item_response(item) for item in items]
+def get_article_projection(view: str = "full", fields: Optional[str] = None) -> Optional[Dict[str, int]]:
+    """Mongo projection for a sparse article listing, or None for full documents"""
+    if fields:
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        # Card fields (dek) are stored on articles but not part of the Article model
+        unknown = [field for field in requested if field not in Article.__fields__ and field not in CARD_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown article fields: {', '.join(unknown)}")
+        return {field: 1 for field in ["id", *requested]}
+    if view == "card":
+        return {field: 1 for field in CARD_FIELDS}
+    return None
 
 # Health check
 @app.get("/api/homepage/content")
-async def get_public_homepage_content():
+async def get_public_homepage_content(request: Request):
     """Get homepage content for public display"""
     try:
-        # Get only published articles, sorted by featured first, then by published date
-        all_articles_raw = list(db.articles.find(
-            {"status": "published"}
-        ).sort([("featured", -1), ("published_at", -1)]))
-        
-        # Convert ObjectIds and organize
-        all_articles = []
-        for article in all_articles_raw:
-            article["id"] = str(article.get("_id", article.get("id", "")))
-            if "_id" in article:
-                del article["_id"]
-            all_articles.append(article)
-        
-        # Hero article should be the first featured article or first published article
-        hero_article = all_articles[0] if all_articles else None
-        
-        return {
-            "hero_article": hero_article,
-            "sections": {
-                "featured": all_articles[:4],
-                "trending": all_articles[:6], 
-                "latest": all_articles[:8],
-                "food": [a for a in all_articles if a.get("category") == "food"][:4],
-                "travel": [a for a in all_articles if a.get("category") == "travel"][:4],
-                "fashion": [a for a in all_articles if a.get("category") == "fashion"][:4],
-                "people": [a for a in all_articles if a.get("category") == "people"][:4],
-                "luxury": [a for a in all_articles if a.get("category") == "luxury"][:4],
-                "technology": [a for a in all_articles if a.get("category") == "technology"][:4],
-                "business": [a for a in all_articles if a.get("category") == "business"][:4],
-                "culture": [a for a in all_articles if a.get("category") == "culture"][:4],
-                "entertainment": [a for a in all_articles if a.get("category") == "entertainment"][:4]
-            },
-            "total_articles": len(all_articles),
-            "last_updated": datetime.utcnow().isoformat()
-        }
+        # Served from the materialized snapshot; rebuilt on admin writes or once it goes stale
+        snapshot = await homepage_snapshot.get()
+        headers = cache_headers(snapshot.etag, snapshot.last_modified)
+        if is_not_modified(request, snapshot.etag, snapshot.last_modified):
+            return Response(status_code=304, headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
         
     except Exception as e:
         print(f"Homepage content error: {str(e)}")
@@ -418,15 +485,15 @@ async def health_check():
 
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=Token)
-async def register(user: UserCreate):
+async def register(user: UserCreate, db: AsyncIOMotorDatabase = Depends(get_database)):
     # Check if user exists
-    existing_user = db.users.find_one({"email": user.email})
+    existing_user = await db.users.find_one({"email": user.email})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     # Create new user
     user_dict = user.dict()
-    user_dict["hashed_password"] = get_password_hash(user.password)
+    user_dict["hashed_password"] = await get_password_hash(user.password)
     user_dict["id"] = str(uuid.uuid4())
     user_dict["is_premium"] = False
     user_dict["subscription_type"] = None
@@ -435,7 +502,8 @@ async def register(user: UserCreate):
     user_dict["created_at"] = datetime.utcnow()
     del user_dict["password"]
     
-    db.users.insert_one(user_dict)
+    await db.users.insert_one(user_dict)
+    await dashboard_counters.user_registered()
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -453,11 +521,15 @@ async def register(user: UserCreate):
     }
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(user: UserLogin):
+async def login(user: UserLogin, db: AsyncIOMotorDatabase = Depends(get_database)):
     # Find user
-    db_user = db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user["hashed_password"]):
+    db_user = await db.users.find_one({"email": user.email})
+    valid, new_hash = await verify_password(user.password, db_user.get("hashed_password")) if db_user else (False, None)
+    if not valid:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
+    if new_hash:
+        # Stored with old cost parameters; upgrade while the plain password is at hand
+        await db.users.update_one({"_id": db_user["_id"]}, {"$set": {"hashed_password": new_hash}})
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -494,11 +566,12 @@ async def get_payment_packages():
 
 @app.post("/api/payments/razorpay/create-order")
 async def create_razorpay_order(
-    order_request: RazorpayOrderRequest
+    order_request: RazorpayOrderRequest,
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Create Razorpay order for subscription with customer details - Guest checkout allowed"""
     
-    if not razorpay_client:
+    if not payment_gateway.configured:
         raise HTTPException(status_code=500, detail="Razorpay not configured")
     
     # Get package details
@@ -521,7 +594,7 @@ async def create_razorpay_order(
         # Create Razorpay order
         amount_in_paise = int(package["price"] * 100)
         receipt_id = f"ord_{order_request.package_id[:8]}_{order_request.customer_details.email[:8]}_{int(datetime.utcnow().timestamp())}"[:40]
-        razorpay_order = razorpay_client.order.create({
+        razorpay_order = await payment_gateway.create_order({
             "amount": amount_in_paise,
             "currency": package["currency"],
             "receipt": receipt_id,
@@ -546,7 +619,7 @@ async def create_razorpay_order(
             "created_at": datetime.utcnow()
         }
         
-        db.orders.insert_one(order_doc)
+        await db.orders.insert_one(order_doc)
         
         return {
             "order_id": razorpay_order["id"],
@@ -558,223 +631,357 @@ async def create_razorpay_order(
             "customer_details": order_request.customer_details.dict()
         }
         
+    except GatewayUnavailable as e:
+        raise HTTPException(status_code=503, detail=f"Payment gateway unavailable, please retry: {str(e)}", headers={"Retry-After": "5"})
+    except GatewayError as e:
+        raise HTTPException(status_code=502, detail=f"Failed to create order: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create order: {str(e)}")
 
 @app.post("/api/payments/razorpay/verify")
 async def verify_razorpay_payment(
-    payment_data: RazorpayPaymentVerification
+    payment_data: RazorpayPaymentVerification,
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
     """Verify Razorpay payment signature and create/update subscription - Guest checkout supported"""
     
-    if not razorpay_client:
+    if not payment_gateway.configured:
         raise HTTPException(status_code=500, detail="Razorpay not configured")
     
-    try:
-        # Verify payment signature
-        signature = payment_data.razorpay_signature
-        order_id = payment_data.razorpay_order_id
-        payment_id = payment_data.razorpay_payment_id
-        
-        # Create signature string
-        generated_signature = hmac.new(
-            RAZORPAY_KEY_SECRET.encode(),
-            f"{order_id}|{payment_id}".encode(),
-            hashlib.sha256
-        ).hexdigest()
-        
-        if signature != generated_signature:
-            raise HTTPException(status_code=400, detail="Invalid payment signature")
-        
-        # Get package details
-        package = subscription_packages.get(payment_data.package_id)
-        if not package:
-            raise HTTPException(status_code=404, detail="Package not found")
-        
-        # Update order status
-        db.orders.update_one(
-            {"razorpay_order_id": order_id},
-            {
-                "$set": {
-                    "status": "completed",
-                    "razorpay_payment_id": payment_id,
-                    "razorpay_signature": signature,
-                    "completed_at": datetime.utcnow()
-                }
-            }
-        )
-        
-        # Check if user exists, if not create a new user
-        customer_email = payment_data.customer_details.email
-        existing_user = db.users.find_one({"email": customer_email})
-        
-        # Determine if user gets digital magazine access based on subscription type
-        has_digital_access = payment_data.package_id in ["digital_annual", "combined_annual"]
-        
-        if not existing_user:
-            # Create new user from customer details
-            user_doc = {
-                "id": str(uuid.uuid4()),
-                "email": customer_email,
-                "full_name": payment_data.customer_details.full_name,
-                "hashed_password": get_password_hash(payment_data.customer_details.password),  # Hash the password
-                "is_premium": has_digital_access,  # Only digital and combined get premium access
-                "subscription_type": payment_data.package_id,
-                "subscription_status": "active",  # Set active status for magazine access
-                "subscription_expires_at": datetime.utcnow() + timedelta(days=365),
-                "created_at": datetime.utcnow()
-            }
-            db.users.insert_one(user_doc)
-            user_id = user_doc["id"]
-        else:
-            # Update existing user subscription and password
-            subscription_expires_at = datetime.utcnow() + timedelta(days=365)  # 1 year
-            db.users.update_one(
-                {"email": customer_email},
+    # Verify payment signature
+    signature = payment_data.razorpay_signature
+    order_id = payment_data.razorpay_order_id
+    payment_id = payment_data.razorpay_payment_id
+    if not payment_gateway.verify_payment_signature(order_id, payment_id, signature):
+        raise HTTPException(status_code=400, detail="Invalid payment signature")
+    
+    # Get package details
+    package = subscription_packages.get(payment_data.package_id)
+    if not package:
+        raise HTTPException(status_code=404, detail="Package not found")
+    
+    customer_email = payment_data.customer_details.email
+    now = datetime.utcnow()
+    
+    # Idempotency rests on the unique index; without it two requests could both activate
+    if not await index_present(PAYMENT_ID_INDEX):
+        print(f"Payment verification refused for {payment_id}: unique index on transactions.razorpay_payment_id is missing")
+        raise HTTPException(status_code=503, detail="Payment verification is temporarily unavailable", headers={"Retry-After": "30"})
+    
+    claim_id = str(uuid.uuid4())
+    for attempt in range(2):
+        try:
+            # Claim the payment: the unique razorpay_payment_id makes a retry or a racing request fail here.
+            # The order update only applies once, so it can go out alongside the claim.
+            claim = db.transactions.insert_one({
+                "id": claim_id,
+                "user_id": None,
+                "customer_details": payment_data.customer_details.dict(exclude={"password"}),
+                "razorpay_order_id": order_id,
+                "razorpay_payment_id": payment_id,
+                "package_id": payment_data.package_id,
+                "amount": package["price"],
+                "currency": package["currency"],
+                "status": "processing",
+                "payment_method": "razorpay",
+                "created_at": now,
+                "claimed_at": datetime.utcnow()
+            })
+            complete_order = db.orders.update_one(
+                {"razorpay_order_id": order_id, "status": {"$ne": "completed"}},
                 {
                     "$set": {
-                        "hashed_password": get_password_hash(payment_data.customer_details.password),  # Update password
-                        "is_premium": has_digital_access,  # Only digital and combined get premium access
-                        "subscription_type": payment_data.package_id,
-                        "subscription_status": "active",  # Set active status for magazine access
-                        "subscription_expires_at": subscription_expires_at
+                        "status": "completed",
+                        "razorpay_payment_id": payment_id,
+                        "razorpay_signature": signature,
+                        "completed_at": now
                     }
                 }
             )
-            user_id = existing_user["id"]
+            claimed, order_updated = await asyncio.gather(claim, complete_order, return_exceptions=True)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Payment verification failed: {str(e)}")
+        if not isinstance(claimed, DuplicateKeyError):
+            break
+        # Someone holds the claim; take it over only if its worker has evidently died
+        if attempt or not await release_stale_claim(db, payment_id):
+            return await replay_payment_verification(db, payment_id, customer_email)
+    if isinstance(claimed, Exception):
+        raise HTTPException(status_code=500, detail=f"Payment verification failed: {str(claimed)}")
+    
+    try:
+        if isinstance(order_updated, Exception):
+            raise order_updated
+        
+        # Determine if user gets digital magazine access based on subscription type
+        has_digital_access = payment_data.package_id in ["digital_annual", "combined_annual"]
+        expires_at = now + timedelta(days=365)  # 1 year
         
-        # Store transaction record
-        transaction_doc = {
+        # Create the user or renew their subscription (and password) in one round-trip. The
+        # document before the update tells the dashboard counters whether premium status flipped.
+        subscription = {
+            "is_premium": has_digital_access,  # Only digital and combined get premium access
+            "subscription_type": payment_data.package_id,
+            "subscription_status": "active",  # Set active status for magazine access
+            "subscription_expires_at": expires_at
+        }
+        new_user = {
+            "_id": ObjectId(),
             "id": str(uuid.uuid4()),
-            "user_id": user_id,
-            "customer_details": payment_data.customer_details.dict(),
-            "razorpay_order_id": order_id,
-            "razorpay_payment_id": payment_id,
-            "package_id": payment_data.package_id,
-            "amount": package["price"],
-            "currency": package["currency"],
-            "status": "success",
-            "payment_method": "razorpay",
-            "created_at": datetime.utcnow()
+            "full_name": payment_data.customer_details.full_name,
+            "created_at": now
         }
-        
-        db.transactions.insert_one(transaction_doc)
-        
-        # Generate access token for the user (auto-login after payment)
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": customer_email}, expires_delta=access_token_expires
+        previous_user = await db.users.find_one_and_update(
+            {"email": customer_email},
+            {
+                "$set": {"hashed_password": await get_password_hash(payment_data.customer_details.password), **subscription},
+                "$setOnInsert": new_user
+            },
+            projection={"hashed_password": 0},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
         )
+        user_created = previous_user is None
+        user_data = {**(new_user if user_created else previous_user), "email": customer_email, **subscription}
+        was_premium = not user_created and bool(previous_user.get("is_premium"))
+        if not user_created:
+            invalidate_user_principal(customer_email)
         
-        # Get full user data for response
-        user_data = db.users.find_one({"email": customer_email})
-        user_response = {k: v for k, v in user_data.items() if k != "hashed_password"}
-        user_response = prepare_item_response(user_response)
-        
-        return {
+        # Kept on the transaction so a replay can answer without touching the user again
+        result = {
             "status": "success",
             "message": "Payment verified and subscription activated",
             "subscription_type": payment_data.package_id,
             "has_digital_access": has_digital_access,
-            "expires_at": (datetime.utcnow() + timedelta(days=365)).isoformat(),
-            "user_created": existing_user is None,
-            "access_token": access_token,
-            "token_type": "bearer",
-            "user": user_response
+            "expires_at": expires_at.isoformat(),
+            "user_created": user_created,
+            "user": prepare_item_response(user_data)
         }
-        
-    except HTTPException:
-        raise
+        # revenue_pending until the rollup has it, so a crash before record_revenue is recovered on startup
+        finished = await db.transactions.update_one(
+            {"razorpay_payment_id": payment_id, "id": claim_id, "status": "processing"},
+            {"$set": {"user_id": user_data["id"], "status": "success", "result": result, "revenue_pending": True}}
+        )
     except Exception as e:
+        # Release the claim so the client's retry can complete the activation
+        await db.transactions.delete_one({"razorpay_payment_id": payment_id, "id": claim_id, "status": "processing"})
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Payment verification failed: {str(e)}")
+    
+    if finished.matched_count == 0:
+        # This request stalled past the claim timeout and another took the payment over; it counts the revenue
+        return await replay_payment_verification(db, payment_id, customer_email)
+    
+    try:
+        # Counted once: the rollup row keeps the payment ids it holds
+        await record_revenue({
+            "razorpay_payment_id": payment_id, "created_at": now, "package_id": payment_data.package_id,
+            "currency": package["currency"], "amount": package["price"]
+        })
+    except Exception as e:
+        # The payment stands and stays revenue_pending; startup records it
+        print(f"Revenue rollup error for {payment_id}: {str(e)}")
+    await dashboard_counters.payment_completed(
+        {"created_at": now, "package_id": payment_data.package_id, "amount": package["price"], "status": "success"},
+        user_created,
+        int(has_digital_access) - int(was_premium)
+    )
+    
+    return payment_verification_response(result, customer_email)
+
+def payment_verification_response(result: dict, customer_email: str) -> dict:
+    """The stored verification result plus a fresh access token (auto-login after payment)"""
+    access_token = create_access_token(
+        data={"sub": customer_email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {**result, "access_token": access_token, "token_type": "bearer"}
+
+async def release_stale_claim(db: AsyncIOMotorDatabase, payment_id: str) -> bool:
+    """Delete a "processing" claim older than PAYMENT_CLAIM_TIMEOUT_SECONDS; True if one was deleted"""
+    cutoff = datetime.utcnow() - timedelta(seconds=PAYMENT_CLAIM_TIMEOUT_SECONDS)
+    result = await db.transactions.delete_one({
+        "razorpay_payment_id": payment_id,
+        "status": "processing",
+        # Claims made before claimed_at was recorded fall back to created_at
+        "$or": [{"claimed_at": {"$lte": cutoff}}, {"claimed_at": {"$exists": False}, "created_at": {"$lte": cutoff}}]
+    })
+    return result.deleted_count == 1
+
+async def replay_payment_verification(db: AsyncIOMotorDatabase, payment_id: str, customer_email: str) -> dict:
+    """Answer a repeated verification with the first one's result"""
+    transaction = await db.transactions.find_one({"razorpay_payment_id": payment_id}, {"result": 1, "status": 1, "customer_details": 1})
+    if transaction is None or transaction.get("status") == "processing":
+        # The first request is still activating the subscription (or just gave up); retry shortly.
+        # If it never finishes, a retry after PAYMENT_CLAIM_TIMEOUT_SECONDS takes the claim over.
+        raise HTTPException(status_code=409, detail="Payment is already being verified", headers={"Retry-After": "1"})
+    if transaction.get("result") is None or transaction["customer_details"].get("email") != customer_email:
+        # Recorded before results were kept, or claimed by someone else's checkout
+        raise HTTPException(status_code=409, detail="Payment has already been processed")
+    return payment_verification_response(transaction["result"], customer_email)
 
 @app.post("/api/payments/razorpay/webhook")
 async def razorpay_webhook(request: Request):
-    """Handle Razorpay webhooks"""
+    """Handle Razorpay webhooks: verify, store and acknowledge; webhook_inbox applies them in the background"""
+    body = await request.body()
+    signature = request.headers.get("X-Razorpay-Signature")
+    
+    if not signature:
+        raise HTTPException(status_code=400, detail="Missing signature")
+    secret = webhook_secret()
+    if not secret:
+        # Not acknowledged, so Razorpay keeps redelivering until a secret is configured
+        raise HTTPException(status_code=503, detail="Webhook secret not configured")
+    if not verify_webhook_signature(body, signature, secret):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+    
     try:
-        body = await request.body()
-        signature = request.headers.get("X-Razorpay-Signature")
-        
-        if not signature:
-            raise HTTPException(status_code=400, detail="Missing signature")
-        
-        # Verify webhook signature (optional - for production)
-        # webhook_secret = os.getenv("RAZORPAY_WEBHOOK_SECRET")
-        # if webhook_secret:
-        #     expected_signature = hmac.new(
-        #         webhook_secret.encode(),
-        #         body,
-        #         hashlib.sha256
-        #     ).hexdigest()
-        #     if signature != expected_signature:
-        #         raise HTTPException(status_code=400, detail="Invalid webhook signature")
-        
-        webhook_data = json.loads(body)
-        event = webhook_data.get("event")
-        
-        if event == "payment.captured":
-            payment_entity = webhook_data.get("payload", {}).get("payment", {}).get("entity", {})
-            order_id = payment_entity.get("order_id")
-            
-            if order_id:
-                # Update order status
-                db.orders.update_one(
-                    {"razorpay_order_id": order_id},
-                    {"$set": {"webhook_received": True, "webhook_at": datetime.utcnow()}}
-                )
-        
-        return {"status": "success"}
-        
+        received = await webhook_inbox.receive(body, request.headers.get("X-Razorpay-Event-Id"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid webhook body")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Webhook processing failed: {str(e)}")
+    
+    return {"status": "success", "duplicate": not received}
+
+# Concurrent identical public reads share one query and encode
+async def coalesced(request: Request, version: str, load: Callable[[], Awaitable[Any]]) -> Any:
+    """Result of `load` shared by concurrent requests for the same path and query (see single_flight.py)"""
+    try:
+        return await single_flight.run(request_target(request), load, version=version)
+    except SingleFlightTimeout:
+        raise HTTPException(status_code=503, detail="Content is temporarily unavailable, please retry")
+
+async def coalesced_response(request: Request, cache: Dict[str, str], load: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]) -> Response:
+    """A JSON body and its headers from `load`; a coalesced caller may get a recent earlier version with that version's headers"""
+    body, headers = await coalesced(request, cache["ETag"], load)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 # Content endpoints (keeping existing functionality)
 @app.get("/api/articles", response_model=List[Article])
 async def get_articles(
+    request: Request,
     category: Optional[str] = Query(None),
     subcategory: Optional[str] = Query(None),
     featured: Optional[bool] = Query(None),
     trending: Optional[bool] = Query(None),
-    limit: int = Query(20, le=100)
+    limit: int = Query(20, le=100),
+    view: str = Query("full", regex="^(card|full)$"),
+    fields: Optional[str] = Query(None),  # Comma-separated field names
+    cursor: Optional[str] = Query(None),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
+    # The trending list also changes when the ranking is recomputed
+    not_modified, cache = await conditional_get(request, *(["articles", "trending"] if trending else ["articles"]))
+    if not_modified:
+        return not_modified
+    
     filter_dict = {}
     # Only show published articles on public API
     filter_dict["status"] = "published"
     
-    if category:
-        filter_dict["category"] = category
     if subcategory:
         filter_dict["subcategory"] = subcategory
     if featured is not None:
         filter_dict["featured"] = featured
-    if trending is not None:
-        filter_dict["trending"] = trending
 
-    articles = list(db.articles.find(filter_dict).sort([("featured", -1), ("published_at", -1)]).limit(limit))
-    return prepare_list_response(articles)
+    projection = get_article_projection(view, fields)
+    
+    async def load() -> Tuple[bytes, Dict[str, str]]:
+        if trending:
+            # Precomputed decayed-views ranking; the manual flag only until views have been recorded
+            ranked = await trending_ranking.articles(filter_dict, projection, category=category, limit=limit)
+            if ranked is not None:
+                return dumps(prepare_documents(ranked)), cache
+
+        if category:
+            filter_dict["category"] = category
+        if trending is not None:
+            filter_dict["trending"] = trending
+
+        articles, next_cursor = await paginate(db.articles, filter_dict, ARTICLE_LIST_SORT, limit, cursor, projection)
+        
+        # The list body stays a plain array; the next page token travels in a header
+        headers = {**cache, "X-Next-Cursor": next_cursor} if next_cursor else cache
+        
+        # Documents come straight from Mongo; encode them once instead of re-validating against Article
+        return dumps(prepare_documents(articles)), headers
+    
+    return await coalesced_response(request, cache, load)
+
+@app.post("/api/articles/batch")
+async def get_articles_batch(batch: ArticleBatchRequest):
+    """Many published articles by id or slug in one round-trip, in request order with a status per id"""
+    if not batch.ids:
+        raise HTTPException(status_code=400, detail="No article ids given")
+    if len(batch.ids) > ARTICLE_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {ARTICLE_BATCH_LIMIT} articles per batch")
+    if batch.view not in ("card", "full"):
+        raise HTTPException(status_code=400, detail="view must be 'card' or 'full'")
+    
+    articles = await fetch_articles(batch.ids, {"status": "published"}, get_article_projection(batch.view, batch.fields))
+    results = [
+        {"id": ref, "found": True, "article": prepare_document(article)} if article else {"id": ref, "found": False, "article": None}
+        for ref, article in zip(batch.ids, articles)
+    ]
+    return BSONJSONResponse({"results": results, "missing": [result["id"] for result in results if not result["found"]]})
 
 @app.get("/api/articles/{article_id}")
-async def get_article(article_id: str):
-    # Try to find by ID first, then by slug - only published articles
-    article = db.articles.find_one({
-        "$and": [
-            {"$or": [{"id": article_id}, {"_id": article_id}, {"slug": article_id}]},
-            {"status": "published"}
-        ]
-    })
-    if not article:
-        raise HTTPException(status_code=404, detail="Article not found")
+async def get_article(article_id: str, request: Request, db: AsyncIOMotorDatabase = Depends(get_database)):
+    not_modified, cache = await conditional_get(request, "articles")
+    if not_modified:
+        await view_counter.record_alias(article_id)
+        return not_modified
     
-    # Increment view count
-    db.articles.update_one(
-        {"_id": article["_id"]},
-        {"$inc": {"views": 1}}
-    )
+    async def load() -> Tuple[Any, bytes, Dict[str, str]]:
+        # Try to find by ID first, then by slug - only published articles
+        article = await db.articles.find_one({
+            "$and": [
+                {"$or": [{"id": article_id}, {"_id": article_id}, {"slug": article_id}]},
+                {"status": "published"}
+            ]
+        })
+        if not article:
+            raise HTTPException(status_code=404, detail="Article not found")
+        return article["_id"], dumps(prepare_document(article)), cache
+    
+    key, body, headers = await coalesced(request, cache["ETag"], load)
+    
+    # Increment view count for every reader, coalesced or not; buffered and flushed off the request path
+    view_counter.remember(article_id, key)
+    await view_counter.record(key)
     
-    return prepare_item_response(article)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/articles/{article_id}/related")
+async def get_related_articles(
+    article_id: str,
+    request: Request,
+    limit: int = Query(6, ge=1, le=RELATED_TOP_K),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Most similar published articles by content, from the precomputed neighbour lists"""
+    not_modified, cache = await conditional_get(request, "articles")
+    if not_modified:
+        return not_modified
+    
+    async def load() -> Tuple[bytes, Dict[str, str]]:
+        article = await db.articles.find_one({
+            "$and": [
+                {"$or": [{"id": article_id}, {"_id": article_id}, {"slug": article_id}]},
+                {"status": "published"}
+            ]
+        }, {"_id": 1, "category": 1})
+        if not article:
+            raise HTTPException(status_code=404, detail="Article not found")
+        
+        related = await related_articles.related_cards(article, limit)
+        return dumps(prepare_documents(related)), cache
+    
+    return await coalesced_response(request, cache, load)
 
 @app.post("/api/articles", response_model=Article)
-async def create_article(article: ArticleCreate, current_user: dict = Depends(get_current_user)):
+async def create_article(article: ArticleCreate, current_user: dict = Depends(get_current_user), db: AsyncIOMotorDatabase = Depends(get_database)):
     article_dict = article.dict()
     article_dict["id"] = str(uuid.uuid4())
     article_dict["views"] = 0
@@ -785,33 +992,75 @@ async def create_article(article: ArticleCreate, current_user: dict = Depends(ge
     if not article_dict.get("slug"):
         article_dict["slug"] = article_dict["title"].lower().replace(" ", "-").replace(",", "")
     
-    db.articles.insert_one(article_dict)
+    await db.articles.insert_one(article_dict)
+    await bump_content_version("articles", changed=[article_dict["_id"]])
+    await invalidate_homepage_snapshot()
+    await sync_search_index(article_dict["_id"])
+    await sync_related_articles(article_dict["_id"])
+    await dashboard_counters.article_created(article_dict)
     return prepare_item_response(article_dict)
 
+@app.get("/api/search")
+async def search_articles(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = Query(None),
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=50)
+):
+    """Full-text search over published articles, ranked by BM25 with highlighted snippets"""
+    not_modified, cache = await conditional_get(request, "articles")
+    if not_modified:
+        return not_modified
+    
+    async def load() -> Tuple[bytes, Dict[str, str]]:
+        return dumps(await article_search.search_page(q, category=category, page=page, limit=limit)), cache
+    
+    return await coalesced_response(request, cache, load)
+
+@app.get("/api/search/suggest")
+async def suggest_search(
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(8, ge=1, le=20)
+):
+    """Search-as-you-type suggestions: article titles, tags, authors and categories by popularity"""
+    suggestions = await article_search.suggest(prefix, limit=limit)
+    # Popularity moves without a content version bump, so this is cached briefly instead of validated
+    return BSONJSONResponse(suggestions, headers={"Cache-Control": "public, max-age=30"})
+
+# Reference data: changes a few times a day, so bodies are encoded once and cached
+async def reference_response(request: Request, collection: str) -> Response:
+    """A whole reference collection, validated by its content version and read through the response cache"""
+    not_modified, cache = await conditional_get(request, collection)
+    if not_modified:
+        return not_modified
+    
+    async def load() -> bytes:
+        return dumps(prepare_documents(await get_database()[collection].find().to_list(length=None)))
+    
+    # The ETag already covers route, query string and content version; concurrent misses load once
+    body = await coalesced(request, cache["ETag"], lambda: response_cache.get_or_load(cache["ETag"], [collection], load))
+    return Response(content=body, media_type="application/json", headers=cache)
+
 @app.get("/api/categories", response_model=List[Category])
-async def get_categories():
-    categories = list(db.categories.find())
-    return prepare_list_response(categories)
+async def get_categories(request: Request):
+    return await reference_response(request, "categories")
 
 @app.get("/api/reviews", response_model=List[Review])
-async def get_reviews():
-    reviews = list(db.reviews.find())
-    return prepare_list_response(reviews)
+async def get_reviews(request: Request):
+    return await reference_response(request, "reviews")
 
 @app.get("/api/issues", response_model=List[Issue])
-async def get_issues():
-    issues = list(db.issues.find())
-    return prepare_list_response(issues)
+async def get_issues(request: Request):
+    return await reference_response(request, "issues")
 
 @app.get("/api/destinations", response_model=List[Destination])
-async def get_destinations():
-    destinations = list(db.destinations.find())
-    return prepare_list_response(destinations)
+async def get_destinations(request: Request):
+    return await reference_response(request, "destinations")
 
 @app.get("/api/authors", response_model=List[Author])
-async def get_authors():
-    authors = list(db.authors.find())
-    return prepare_list_response(authors)
+async def get_authors(request: Request):
+    return await reference_response(request, "authors")
 
 if __name__ == "__main__":
     import uvicorn
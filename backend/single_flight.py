@@ -0,0 +1,134 @@
+"""
+Just Urbane - Request Coalescing
+Single-flight execution of expensive public reads: concurrent identical requests share one load
+
+The first request for a key starts the load; requests for the same key that arrive while it
+runs wait for that result instead of querying Mongo again. When a result for the key was
+produced within SINGLE_FLIGHT_STALE_SECONDS, those followers get it immediately instead of
+waiting, so a herd after a publish or a cache expiry costs one query and no queueing.
+
+Waiters give up after SINGLE_FLIGHT_TIMEOUT seconds (with the stale result if there is one);
+the load itself keeps running for whoever is still waiting, and the next request starts afresh.
+"""
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+import asyncio
+import time
+import os
+
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "10"))  # seconds
+SINGLE_FLIGHT_STALE_SECONDS = float(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "30"))
+# Last results kept per key for stale serving
+SINGLE_FLIGHT_MAX_RESULTS = int(os.getenv("SINGLE_FLIGHT_MAX_RESULTS", "1024"))
+
+class SingleFlightTimeout(Exception):
+    """No result within the timeout and nothing recent enough to serve instead"""
+
+class _Flight:
+    __slots__ = ("task", "started")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.started = time.monotonic()
+
+class SingleFlight:
+    """In-flight loads by key, plus the last result per key for stale serving"""
+
+    def __init__(
+        self,
+        timeout: float = SINGLE_FLIGHT_TIMEOUT,
+        stale_seconds: float = SINGLE_FLIGHT_STALE_SECONDS,
+        max_results: int = SINGLE_FLIGHT_MAX_RESULTS
+    ):
+        self.timeout = timeout
+        self.stale_seconds = stale_seconds
+        self.max_results = max_results
+        self._flights: Dict[Tuple[Hashable, Hashable], _Flight] = {}
+        self._results: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        self.loads = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _stale(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        result = self._results.get(key)
+        if result is None or time.monotonic() - result[1] > self.stale_seconds:
+            return None
+        return result
+
+    def _finished(self, key: Hashable, flight_key: Tuple[Hashable, Hashable], task: asyncio.Task):
+        if self._flights.get(flight_key) is not None and self._flights[flight_key].task is task:
+            del self._flights[flight_key]
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            # Retrieved here so an abandoned load does not log "exception was never retrieved"
+            self.errors += 1
+            return
+        self._results[key] = (task.result(), time.monotonic())
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def in_flight(self, key: Hashable, version: Hashable = None) -> bool:
+        return (key, version) in self._flights
+
+    async def run(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        version: Hashable = None,
+        timeout: Optional[float] = None,
+        stale: bool = True
+    ) -> Any:
+        """`await loader()`, shared with every concurrent caller passing the same key and version
+
+        `version` separates loads of different content under one key (an older version's result
+        is still eligible as stale data). Exceptions from the loader reach every waiter.
+        """
+        flight_key = (key, version)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            self.loads += 1
+            flight = self._flights[flight_key] = _Flight(asyncio.get_running_loop().create_task(loader()))
+            flight.task.add_done_callback(lambda task: self._finished(key, flight_key, task))
+        else:
+            self.coalesced += 1
+            recent = self._stale(key) if stale else None
+            if recent is not None:
+                self.stale_served += 1
+                return recent[0]
+
+        timeout = self.timeout if timeout is None else timeout
+        remaining = max(timeout - (time.monotonic() - flight.started), 0)
+        try:
+            # Shielded: a waiter timing out or disconnecting must not cancel the shared load
+            return await asyncio.wait_for(asyncio.shield(flight.task), remaining)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if self._flights.get(flight_key) is flight:
+                # Later requests start a new load rather than queue behind a stuck one
+                del self._flights[flight_key]
+            recent = self._stale(key) if stale else None
+            if recent is not None:
+                self.stale_served += 1
+                return recent[0]
+            raise SingleFlightTimeout(f"No result for {key!r} within {timeout}s")
+
+    def stats(self) -> dict:
+        return {
+            "timeout": self.timeout,
+            "stale_seconds": self.stale_seconds,
+            "in_flight": len(self._flights),
+            "results": len(self._results),
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served,
+            "timeouts": self.timeouts,
+            "errors": self.errors
+        }
+
+# Global single-flight group for public reads
+single_flight = SingleFlight()
@@ -0,0 +1,257 @@
+"""
+Just Urbane - Search Suggestions
+Sorted-array prefix index over article titles, tags, authors and categories, ranked by views
+
+Every word position of a phrase is a key ("sunseeker yacht review", "yacht review", "review"),
+so typing any word of a title finds it. Keys live in one sorted list; a prefix is a bisect range.
+Wide ranges (one- or two-letter prefixes) are answered from a per-prefix top list, ranked once
+(on first use, or warmed after a build) and then adjusted in place as entries under it change.
+"""
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+import unicodedata
+import heapq
+import re
+import os
+
+SUGGEST_LIMIT = 8
+# Ranges wider than this are ranked once and cached per prefix
+SUGGEST_SCAN_LIMIT = int(os.getenv("SUGGEST_SCAN_LIMIT", "256"))
+SUGGEST_CACHE_TOP = 20
+# Views are re-read this often (seconds) so popularity tracks traffic between article edits
+SUGGEST_POPULARITY_REFRESH = int(os.getenv("SUGGEST_POPULARITY_REFRESH", "300"))
+
+SUGGEST_KINDS = ("article", "tag", "author", "category", "subcategory")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+def normalize(text: str) -> str:
+    """Lowercased, accent-folded words separated by single spaces"""
+    folded = unicodedata.normalize("NFKD", str(text).lower()).encode("ascii", "ignore").decode()
+    return " ".join(_WORD_RE.findall(folded))
+
+def phrase_keys(phrase: str) -> List[str]:
+    """The phrase from each word onwards"""
+    words = phrase.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+EntryId = Tuple[str, str]  # (kind, normalized text) or ("article", str(_id))
+
+class Suggestion:
+    """One suggestable phrase and the popularity of the articles behind it"""
+
+    __slots__ = ("kind", "text", "slug", "phrase", "weight", "articles")
+
+    def __init__(self, kind: str, text: str, phrase: str, slug: Optional[str] = None):
+        self.kind = kind
+        self.text = text
+        self.slug = slug
+        self.phrase = phrase
+        self.weight = 0
+        self.articles = 0
+
+    @property
+    def rank(self) -> Tuple[int, int, int]:
+        # Most viewed first, then the most articles, then the shortest phrase
+        return (self.weight, self.articles, -len(self.phrase))
+
+    def to_dict(self) -> dict:
+        suggestion = {"text": self.text, "type": self.kind, "articles": self.articles, "views": self.weight}
+        if self.slug:
+            suggestion["slug"] = self.slug
+        return suggestion
+
+def _rank(entry: Suggestion) -> Tuple[int, int, int]:
+    return entry.rank
+
+class _TopList:
+    """Exact best entries of one prefix range; everything left out ranks at or below floor"""
+
+    __slots__ = ("entries", "floor")
+
+    def __init__(self, entries: List[Suggestion], floor: Optional[Tuple[int, int, int]]):
+        self.entries = entries
+        self.floor = floor  # None: nothing was left out
+
+    def covers(self, limit: int) -> bool:
+        return self.floor is None or len(self.entries) >= limit
+
+    def place(self, entry: Suggestion, rank: Tuple[int, int, int], removed: bool):
+        present = entry in self.entries
+        if present:
+            self.entries.remove(entry)
+        if removed or (self.floor is not None and rank <= self.floor):
+            # Dropping out leaves the rest exact; the list only gets shorter
+            return
+        self.entries.append(entry)
+        self.entries.sort(key=_rank, reverse=True)
+        if len(self.entries) > SUGGEST_CACHE_TOP:
+            dropped = self.entries.pop().rank
+            self.floor = dropped if self.floor is None else max(self.floor, dropped)
+
+class SuggestIndex:
+    """Prefix index of published articles' titles, tags, authors and categories"""
+
+    def __init__(self, bulk: bool = False):
+        self._entries: Dict[EntryId, Suggestion] = {}
+        self._keys: List[Tuple[str, EntryId]] = []
+        # A bulk load appends keys unsorted and sorts once in finish()
+        self._bulk = bulk
+        # What each article contributed, so it can be taken back: (views, entry ids)
+        self._contributions: Dict[str, Tuple[int, List[EntryId]]] = {}
+        self._top: Dict[str, _TopList] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def article_entries(article: dict) -> List[Tuple[EntryId, str, str, str, Optional[str]]]:
+        """(entry id, kind, display text, phrase, slug) for every phrase an article contributes"""
+        entries = []
+        title = article.get("title")
+        if title and normalize(title):
+            entries.append((("article", str(article["_id"])), "article", title, normalize(title), article.get("slug")))
+        for kind, values in (
+            ("tag", article.get("tags") or []),
+            ("author", [article.get("author_name")]),
+            ("category", [article.get("category")]),
+            ("subcategory", [article.get("subcategory")]),
+        ):
+            for value in values if isinstance(values, list) else [values]:
+                phrase = normalize(value) if value else ""
+                if phrase:
+                    entries.append(((kind, phrase), kind, str(value), phrase, None))
+        return entries
+
+    def _touch(self, entry: Suggestion, removed: bool = False):
+        """Re-place an entry whose rank changed in the cached top list of every prefix it falls under"""
+        if not self._top:
+            return
+        rank = entry.rank
+        for key in phrase_keys(entry.phrase):
+            for length in range(1, len(key) + 1):
+                cached = self._top.get(key[:length])
+                if cached is not None:
+                    cached.place(entry, rank, removed)
+
+    def add(self, article: dict):
+        """Count a published article (any other status only withdraws its earlier contribution)"""
+        self.remove(article["_id"])
+        if article.get("status") != "published":
+            return
+
+        views = int(article.get("views") or 0)
+        entry_ids = []
+        for entry_id, kind, text, phrase, slug in self.article_entries(article):
+            if entry_id in entry_ids:
+                continue
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                entry = self._entries[entry_id] = Suggestion(kind, text, phrase, slug)
+                for key in phrase_keys(phrase):
+                    if self._bulk:
+                        self._keys.append((key, entry_id))
+                    else:
+                        insort(self._keys, (key, entry_id))
+            entry.weight += views
+            entry.articles += 1
+            entry_ids.append(entry_id)
+            self._touch(entry)
+        self._contributions[str(article["_id"])] = (views, entry_ids)
+
+    def finish(self):
+        """End a bulk load"""
+        self._keys.sort()
+        self._bulk = False
+
+    def remove(self, key: Any) -> bool:
+        contribution = self._contributions.pop(str(key), None)
+        if contribution is None:
+            return False
+        views, entry_ids = contribution
+        for entry_id in entry_ids:
+            entry = self._entries[entry_id]
+            entry.weight -= views
+            entry.articles -= 1
+            if entry.articles > 0:
+                self._touch(entry)
+                continue
+            self._touch(entry, removed=True)
+            del self._entries[entry_id]
+            for phrase_key in phrase_keys(entry.phrase):
+                position = bisect_left(self._keys, (phrase_key, entry_id))
+                if position < len(self._keys) and self._keys[position] == (phrase_key, entry_id):
+                    del self._keys[position]
+        return True
+
+    def reweight(self, views: Dict[str, int]) -> int:
+        """Apply new view counts (str(_id) -> views) in bulk; cached top lists are dropped"""
+        changed = 0
+        for key, count in views.items():
+            contribution = self._contributions.get(key)
+            if contribution is None or contribution[0] == count:
+                continue
+            old_views, entry_ids = contribution
+            for entry_id in entry_ids:
+                self._entries[entry_id].weight += count - old_views
+            self._contributions[key] = (count, entry_ids)
+            changed += 1
+        if changed:
+            self._top.clear()
+        return changed
+
+    def views(self) -> Dict[str, int]:
+        return {key: views for key, (views, _) in self._contributions.items()}
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        low = bisect_left(self._keys, (prefix,))
+        # Every key starting with the prefix sorts before prefix + the highest character
+        return low, bisect_left(self._keys, (prefix + "\uffff",), low)
+
+    def _rank_range(self, low: int, high: int, limit: int) -> List[Suggestion]:
+        candidates = {entry_id for _, entry_id in self._keys[low:high]}
+        return heapq.nlargest(limit, (self._entries[entry_id] for entry_id in candidates), key=_rank)
+
+    def cache_prefix(self, prefix: str) -> _TopList:
+        """Rank a prefix's whole range once; later changes adjust the list in place"""
+        ranked = self._rank_range(*self._range(prefix), SUGGEST_CACHE_TOP + 1)
+        floor = ranked.pop().rank if len(ranked) > SUGGEST_CACHE_TOP else None
+        cached = self._top[prefix] = _TopList(ranked, floor)
+        return cached
+
+    def wide_prefixes(self, max_length: int = 2) -> List[str]:
+        """Uncached prefixes up to max_length characters whose range is too wide to scan per request"""
+        prefixes = []
+        for length in range(1, max_length + 1):
+            low = 0
+            while low < len(self._keys):
+                prefix = self._keys[low][0][:length]
+                if len(prefix) < length:
+                    low += 1
+                    continue
+                high = bisect_left(self._keys, (prefix + "\uffff",), low)
+                if high - low > SUGGEST_SCAN_LIMIT and prefix not in self._top:
+                    prefixes.append(prefix)
+                low = high
+        return prefixes
+
+    def suggest(self, prefix: str, limit: int = SUGGEST_LIMIT) -> List[Suggestion]:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        cached = self._top.get(prefix)
+        if cached is not None and cached.covers(limit):
+            return cached.entries[:limit]
+
+        low, high = self._range(prefix)
+        if high - low <= SUGGEST_SCAN_LIMIT or limit > SUGGEST_CACHE_TOP:
+            return self._rank_range(low, high, limit)
+        return self.cache_prefix(prefix).entries[:limit]
+
+    def stats(self) -> dict:
+        counts = {kind: 0 for kind in SUGGEST_KINDS}
+        for entry in self._entries.values():
+            counts[entry.kind] += 1
+        return {"entries": len(self._entries), "keys": len(self._keys), "cached_prefixes": len(self._top), **counts}
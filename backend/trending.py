@@ -0,0 +1,226 @@
+"""
+Just Urbane - Trending Articles
+Hourly view buckets and an exponentially decayed trending ranking, materialized for reads
+
+The view counter adds every flush to the current hour's bucket (view_buckets). Every
+TRENDING_REFRESH_SECONDS one worker scores articles over the window as
+sum(views x 0.5 ^ (age / half-life)) and writes the top TRENDING_TOP_N, overall and per
+category, to a single trending_rankings document. Reads take the ranking from memory and
+fetch only those articles.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+from content_versions import content_versions, bump_content_version
+import asyncio
+import math
+import time
+import os
+
+TRENDING_BUCKET_SECONDS = 3600
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+# Buckets older than this are ignored and deleted; seven half-lives leave under 1% weight
+TRENDING_WINDOW_HOURS = int(os.getenv("TRENDING_WINDOW_HOURS", "168"))
+TRENDING_TOP_N = int(os.getenv("TRENDING_TOP_N", "50"))
+TRENDING_REFRESH_SECONDS = int(os.getenv("TRENDING_REFRESH_SECONDS", "300"))
+
+TRENDING_RANKING_ID = "current"
+TRENDING_LEASE_ID = "refresh_lease"
+
+def bucket_start(timestamp: float) -> datetime:
+    return datetime.utcfromtimestamp(timestamp - timestamp % TRENDING_BUCKET_SECONDS)
+
+async def record_view_buckets(counts: Dict[Any, int], timestamp: Optional[float] = None):
+    """Add view increments (article _id -> views) to the current hourly bucket"""
+    bucket = bucket_start(timestamp or time.time())
+    operations = [
+        UpdateOne(
+            {"_id": {"article": article_key, "bucket": bucket}},
+            {"$inc": {"views": count}, "$setOnInsert": {"article": article_key, "bucket": bucket}},
+            upsert=True
+        )
+        for article_key, count in counts.items()
+    ]
+    if operations:
+        await get_database().view_buckets.bulk_write(operations, ordered=False)
+
+def ranking_order(ranking: Optional[dict]) -> Dict[str, List[str]]:
+    """Ranked keys per list, to tell whether a refresh changed anything readers see"""
+    if not ranking:
+        return {}
+    order = {"": [str(entry["_id"]) for entry in ranking.get("overall", [])]}
+    for category, entries in ranking.get("categories", {}).items():
+        order[category] = [str(entry["_id"]) for entry in entries]
+    return order
+
+class TrendingStore:
+    """Computes the trending ranking on one worker and serves it from memory on all of them"""
+
+    def __init__(
+        self,
+        half_life_hours: float = TRENDING_HALF_LIFE_HOURS,
+        window_hours: int = TRENDING_WINDOW_HOURS,
+        top_n: int = TRENDING_TOP_N,
+        refresh_seconds: int = TRENDING_REFRESH_SECONDS
+    ):
+        self.half_life_hours = half_life_hours
+        self.window_hours = window_hours
+        self.top_n = top_n
+        self.refresh_seconds = refresh_seconds
+        self._ranking: Optional[dict] = None
+        self._version: Optional[int] = None
+        self._loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_seconds: Optional[float] = None
+
+    async def _claim(self, now: datetime) -> bool:
+        """Take the refresh lease so only one worker computes per interval"""
+        try:
+            await get_database().trending_rankings.update_one(
+                {"_id": TRENDING_LEASE_ID, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=self.refresh_seconds * 0.9)}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # the lease exists and has not expired
+        return True
+
+    async def scores(self, now: datetime) -> Dict[Any, float]:
+        """Decayed score per article over the window, computed in one aggregation"""
+        decay_per_ms = math.log(2) / (self.half_life_hours * 3600 * 1000)
+        pipeline = [
+            {"$match": {"bucket": {"$gte": now - timedelta(hours=self.window_hours)}}},
+            {"$group": {
+                "_id": "$article",
+                "score": {"$sum": {"$multiply": [
+                    "$views",
+                    {"$exp": {"$multiply": [-decay_per_ms, {"$subtract": [now, "$bucket"]}]}}
+                ]}}
+            }}
+        ]
+        return {doc["_id"]: doc["score"] async for doc in get_database().view_buckets.aggregate(pipeline)}
+
+    async def compute(self, now: Optional[datetime] = None) -> dict:
+        """Rank published articles by decayed views, overall and per category"""
+        now = now or datetime.utcnow()
+        scores = await self.scores(now)
+        categories: Dict[Any, Optional[str]] = {}
+        keys = list(scores)
+        for start in range(0, len(keys), 1000):
+            cursor = get_database().articles.find(
+                {"_id": {"$in": keys[start:start + 1000]}, "status": "published"}, {"category": 1}
+            )
+            async for article in cursor:
+                categories[article["_id"]] = article.get("category")
+
+        ranked = sorted(categories, key=lambda key: scores[key], reverse=True)
+        overall = [{"_id": key, "score": round(scores[key], 3)} for key in ranked[:self.top_n]]
+        by_category: Dict[str, List[dict]] = {}
+        for key in ranked:
+            category = categories[key]
+            if category and len(by_category.setdefault(category, [])) < self.top_n:
+                by_category[category].append({"_id": key, "score": round(scores[key], 3)})
+        return {"overall": overall, "categories": by_category, "computed_at": now, "scored_articles": len(scores)}
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Recompute and publish the ranking if this worker holds the lease; True if readers see a change"""
+        now = datetime.utcnow()
+        if not force and not await self._claim(now):
+            return False
+
+        started = time.perf_counter()
+        db = get_database()
+        ranking = await self.compute(now)
+        previous = await db.trending_rankings.find_one({"_id": TRENDING_RANKING_ID})
+        await db.trending_rankings.replace_one({"_id": TRENDING_RANKING_ID}, ranking, upsert=True)
+        await db.view_buckets.delete_many({"bucket": {"$lt": now - timedelta(hours=self.window_hours)}})
+
+        changed = ranking_order(ranking) != ranking_order(previous)
+        if changed:
+            # Trending reads are validated against this version, not the articles one
+            await bump_content_version("trending")
+        self.refreshes += 1
+        self.last_refresh_seconds = round(time.perf_counter() - started, 3)
+        return changed
+
+    async def ranking(self) -> Optional[dict]:
+        """The published ranking, re-read only when the trending version moves"""
+        version = (await content_versions.current("trending"))[0]
+        if not self._loaded or version != self._version:
+            self._ranking = await get_database().trending_rankings.find_one({"_id": TRENDING_RANKING_ID})
+            self._version = version
+            self._loaded = True
+        return self._ranking
+
+    async def top(self, category: Optional[str] = None) -> List[Any]:
+        """Ranked article _ids, overall or for one category; empty until the first refresh"""
+        ranking = await self.ranking()
+        if not ranking:
+            return []
+        entries = ranking["categories"].get(category, []) if category else ranking["overall"]
+        return [entry["_id"] for entry in entries]
+
+    async def articles(
+        self,
+        match: Dict[str, Any],
+        projection: Optional[Dict[str, Any]] = None,
+        category: Optional[str] = None,
+        limit: int = 20
+    ) -> Optional[List[dict]]:
+        """Trending articles matching `match`, best first; None when nothing is ranked yet"""
+        keys = await self.top(category)
+        if not keys:
+            return None
+        query = {**match, "_id": {"$in": keys}}
+        if category:
+            query["category"] = category
+        articles = await get_database().articles.find(query, projection).to_list(length=None)
+        order = {str(key): position for position, key in enumerate(keys)}
+        return sorted(articles, key=lambda article: order[str(article["_id"])])[:limit]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.refresh_failures += 1
+                print(f"Trending refresh error: {str(e)}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self):
+        """Start the periodic refresh on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        ranking = self._ranking or {}
+        computed_at = ranking.get("computed_at")
+        return {
+            "half_life_hours": self.half_life_hours,
+            "window_hours": self.window_hours,
+            "refresh_seconds": self.refresh_seconds,
+            "ranked_articles": len(ranking.get("overall", [])),
+            "ranked_categories": len(ranking.get("categories", {})),
+            "scored_articles": ranking.get("scored_articles", 0),
+            "computed_at": computed_at.isoformat() if computed_at else None,
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh_seconds": self.last_refresh_seconds
+        }
+
+# Global trending ranking
+trending_ranking = TrendingStore()
@@ -0,0 +1,152 @@
+"""
+Just Urbane - Write-behind Article View Counter
+Aggregates view increments in memory and flushes them with one unordered bulk_write
+
+Each flush also lands in the hourly view buckets the trending ranking is computed from.
+"""
+
+from typing import Dict, Any, Optional
+from pymongo import UpdateOne
+from database import get_database
+from trending import record_view_buckets
+import threading
+import asyncio
+import time
+import os
+
+# "buffered" flushes every VIEW_FLUSH_INTERVAL_MS; "sync" writes each view on the request path
+VIEW_COUNTER_MODE = os.getenv("VIEW_COUNTER_MODE", "buffered").lower()
+VIEW_FLUSH_INTERVAL_MS = int(os.getenv("VIEW_FLUSH_INTERVAL_MS", "1000"))
+# Flush early once this many distinct articles are pending, bounding what a crash can lose
+VIEW_FLUSH_MAX_PENDING = int(os.getenv("VIEW_FLUSH_MAX_PENDING", "1000"))
+# Identifiers (id or slug) remembered so revalidated (304) reads are still counted
+VIEW_ALIAS_LIMIT = 10000
+
+class ViewCounterBuffer:
+    """Per-article view increments waiting to be written"""
+
+    def __init__(
+        self,
+        mode: str = VIEW_COUNTER_MODE,
+        flush_interval_ms: int = VIEW_FLUSH_INTERVAL_MS,
+        max_pending: int = VIEW_FLUSH_MAX_PENDING
+    ):
+        self.mode = mode
+        self.flush_interval_ms = flush_interval_ms
+        self.max_pending = max_pending
+        self._pending: Dict[Any, int] = {}
+        self._aliases: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.flushed_views = 0
+        self.flush_count = 0
+        self.flush_failures = 0
+        self.bucket_failures = 0
+        self.last_flush_at: Optional[float] = None
+
+    def remember(self, identifier: str, article_key: Any):
+        """Map a public id or slug to the article's _id"""
+        if len(self._aliases) >= VIEW_ALIAS_LIMIT:
+            self._aliases.clear()
+        self._aliases[identifier] = article_key
+
+    async def record(self, article_key: Any, count: int = 1):
+        """Count a view of the article with this _id"""
+        if self.mode == "sync":
+            await get_database().articles.update_one({"_id": article_key}, {"$inc": {"views": count}})
+            await self._record_buckets({article_key: count})
+            return
+
+        with self._lock:
+            self._pending[article_key] = self._pending.get(article_key, 0) + count
+            overflow = len(self._pending) >= self.max_pending
+        if overflow:
+            await self.flush()
+
+    async def record_alias(self, identifier: str) -> bool:
+        """Count a view known only by id/slug (e.g. a 304 revalidation); False if never seen"""
+        article_key = self._aliases.get(identifier)
+        if article_key is None:
+            return False
+        await self.record(article_key)
+        return True
+
+    async def flush(self) -> int:
+        """Write all pending increments; failed batches are merged back for the next flush"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        operations = [
+            UpdateOne({"_id": article_key}, {"$inc": {"views": count}})
+            for article_key, count in pending.items()
+        ]
+        try:
+            await get_database().articles.bulk_write(operations, ordered=False)
+        except Exception as e:
+            self.flush_failures += 1
+            print(f"View counter flush error: {str(e)}")
+            with self._lock:
+                for article_key, count in pending.items():
+                    self._pending[article_key] = self._pending.get(article_key, 0) + count
+            return 0
+
+        await self._record_buckets(pending)
+
+        views = sum(pending.values())
+        self.flushed_views += views
+        self.flush_count += 1
+        self.last_flush_at = time.time()
+        return views
+
+    async def _record_buckets(self, counts: Dict[Any, int]):
+        # Lifetime views are already written; a lost bucket only makes trending slightly stale
+        try:
+            await record_view_buckets(counts)
+        except Exception as e:
+            self.bucket_failures += 1
+            print(f"View bucket write error: {str(e)}")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"View counter loop error: {str(e)}")
+
+    def start(self):
+        """Start the periodic flusher on the running event loop"""
+        if self.mode != "sync" and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending_articles = len(self._pending)
+            pending_views = sum(self._pending.values())
+        return {
+            "mode": self.mode,
+            "flush_interval_ms": self.flush_interval_ms,
+            "pending_articles": pending_articles,
+            "pending_views": pending_views,
+            "flushed_views": self.flushed_views,
+            "flush_count": self.flush_count,
+            "flush_failures": self.flush_failures,
+            "bucket_failures": self.bucket_failures,
+            "last_flush_at": self.last_flush_at
+        }
+
+# Global view counter
+view_counter = ViewCounterBuffer()
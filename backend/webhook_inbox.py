@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - Webhook Inbox
+Razorpay webhooks verified, stored and acknowledged on receipt, then applied in batches off the request path
+
+The webhook handler only checks the HMAC and inserts the raw event into webhook_events, keyed by
+Razorpay's event id so redeliveries collapse into one document. A consumer on every worker claims
+due events in batches (a claim is a lease: next_attempt_at moves WEBHOOK_LEASE_SECONDS ahead, so
+events held by a worker that dies are picked up again), applies them per event type, and either
+marks them processed or schedules a retry with jittered exponential backoff. After
+WEBHOOK_MAX_ATTEMPTS failures an event is parked as "dead" until retried by hand (processed events
+expire after WEBHOOK_RETENTION_DAYS):
+
+    python webhook_inbox.py retry-dead
+"""
+
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from database import get_database
+import asyncio
+import hashlib
+import random
+import uuid
+import hmac
+import json
+import sys
+import os
+
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "50"))
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "2"))
+WEBHOOK_LEASE_SECONDS = int(os.getenv("WEBHOOK_LEASE_SECONDS", "60"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+WEBHOOK_RETRY_MAX_SECONDS = float(os.getenv("WEBHOOK_RETRY_MAX_SECONDS", "3600"))
+# Processed and ignored events are kept this long (a TTL index on expires_at removes them), long
+# enough to absorb Razorpay's redeliveries; dead events are kept until retried
+WEBHOOK_RETENTION_DAYS = int(os.getenv("WEBHOOK_RETENTION_DAYS", "7"))
+
+def webhook_secret() -> Optional[str]:
+    # Read per request so a secret from a .env loaded after import still applies
+    return os.getenv("RAZORPAY_WEBHOOK_SECRET")
+
+def verify_signature(body: bytes, signature: Optional[str], secret: Optional[str] = None) -> bool:
+    secret = secret or webhook_secret()
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+def retry_delay(attempts: int) -> float:
+    """Full-jitter exponential backoff for the given number of failed attempts"""
+    return random.uniform(0, min(WEBHOOK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), WEBHOOK_RETRY_MAX_SECONDS))
+
+def payment_entity(event: dict) -> dict:
+    return event.get("payload", {}).get("payment", {}).get("entity", {})
+
+async def apply_payment_captured(events: List[dict]):
+    """Flag the orders Razorpay confirmed as captured"""
+    operations = []
+    for event in events:
+        order_id = payment_entity(event["payload"]).get("order_id")
+        if order_id:
+            operations.append(UpdateOne(
+                {"razorpay_order_id": order_id},
+                {"$set": {"webhook_received": True, "webhook_at": event["received_at"]}}
+            ))
+    if operations:
+        await get_database().orders.bulk_write(operations, ordered=False)
+
+# Event type -> batch handler; events of other types are stored and marked ignored
+WEBHOOK_HANDLERS: Dict[str, Callable[[List[dict]], Awaitable[None]]] = {
+    "payment.captured": apply_payment_captured,
+}
+
+class WebhookInbox:
+    """Durable queue of received webhook events and the consumer that drains it"""
+
+    def __init__(
+        self,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        poll_seconds: float = WEBHOOK_POLL_SECONDS,
+        lease_seconds: int = WEBHOOK_LEASE_SECONDS,
+        max_attempts: int = WEBHOOK_MAX_ATTEMPTS
+    ):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self.received = 0
+        self.duplicates = 0
+        self.processed = 0
+        self.ignored = 0
+        self.retried = 0
+        self.dead = 0
+        self.batches = 0
+        self.consumer_errors = 0
+
+    async def receive(self, body: bytes, event_id: Optional[str] = None) -> bool:
+        """Store a verified webhook body; False if this event was already received"""
+        event = json.loads(body)
+        now = datetime.utcnow()
+        doc = {
+            # Razorpay sends X-Razorpay-Event-Id; identical bodies stand in for it when absent
+            "_id": event_id or hashlib.sha256(body).hexdigest(),
+            "event": event.get("event"),
+            "payload": event,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "received_at": now
+        }
+        try:
+            await get_database().webhook_events.insert_one(doc)
+        except DuplicateKeyError:
+            self.duplicates += 1
+            return False
+        self.received += 1
+        self._wake.set()
+        return True
+
+    async def claim(self) -> List[dict]:
+        """Lease up to batch_size due events: pending ones, and processing ones whose lease ran out"""
+        db = get_database()
+        now = datetime.utcnow()
+        due = {"status": {"$in": ["pending", "processing"]}, "next_attempt_at": {"$lte": now}}
+        candidates = await db.webhook_events.find(due, {"_id": 1}).sort("next_attempt_at", 1).limit(self.batch_size).to_list(length=None)
+        if not candidates:
+            return []
+        token = str(uuid.uuid4())
+        # Re-checking `due` makes the claim atomic per event when several workers race for it
+        await db.webhook_events.update_many(
+            {**due, "_id": {"$in": [doc["_id"] for doc in candidates]}},
+            {
+                "$set": {"status": "processing", "claim": token, "next_attempt_at": now + timedelta(seconds=self.lease_seconds)},
+                "$inc": {"attempts": 1}
+            }
+        )
+        # By _id, so the re-read uses the primary key rather than scanning for the token
+        return await db.webhook_events.find({"_id": {"$in": [doc["_id"] for doc in candidates]}, "claim": token}).to_list(length=None)
+
+    async def process(self, events: List[dict]):
+        """Apply a claimed batch, one handler call per event type, and record each event's outcome"""
+        now = datetime.utcnow()
+        expires_at = now + timedelta(days=WEBHOOK_RETENTION_DAYS)
+        groups: Dict[Optional[str], List[dict]] = {}
+        for event in events:
+            groups.setdefault(event.get("event"), []).append(event)
+
+        operations = []
+        for name, group in groups.items():
+            handler = WEBHOOK_HANDLERS.get(name)
+            if handler is None:
+                update = {"status": "ignored", "processed_at": now, "expires_at": expires_at}
+                self.ignored += len(group)
+            else:
+                try:
+                    await handler(group)
+                except Exception as e:
+                    print(f"Webhook {name} handler error: {str(e)}")
+                    operations.extend(self._failed(event, str(e), now) for event in group)
+                    continue
+                update = {"status": "processed", "processed_at": now, "expires_at": expires_at}
+                self.processed += len(group)
+            for event in group:
+                operations.append(UpdateOne(
+                    {"_id": event["_id"], "claim": event["claim"]},
+                    {"$set": update, "$unset": {"claim": "", "last_error": ""}}
+                ))
+        if operations:
+            await get_database().webhook_events.bulk_write(operations, ordered=False)
+        self.batches += 1
+
+    def _failed(self, event: dict, error: str, now: datetime) -> UpdateOne:
+        if event["attempts"] >= self.max_attempts:
+            self.dead += 1
+            update = {"status": "dead", "last_error": error, "failed_at": now}
+        else:
+            self.retried += 1
+            update = {"status": "pending", "last_error": error, "next_attempt_at": now + timedelta(seconds=retry_delay(event["attempts"]))}
+        return UpdateOne({"_id": event["_id"], "claim": event["claim"]}, {"$set": update, "$unset": {"claim": ""}})
+
+    async def drain(self) -> int:
+        """Process due events until none are left; the number handled"""
+        handled = 0
+        while True:
+            events = await self.claim()
+            if not events:
+                return handled
+            await self.process(events)
+            handled += len(events)
+            # Let page requests run between batches of a burst
+            await asyncio.sleep(0)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                self.consumer_errors += 1
+                print(f"Webhook consumer error: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        """Start the consumer on the running event loop"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        # A batch cut off here keeps its lease and is picked up again once it expires
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def retry_dead(self) -> int:
+        result = await get_database().webhook_events.update_many(
+            {"status": "dead"},
+            {"$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()}}
+        )
+        return result.modified_count
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "batch_size": self.batch_size,
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "processed": self.processed,
+            "ignored": self.ignored,
+            "retried": self.retried,
+            "dead": self.dead,
+            "batches": self.batches,
+            "consumer_errors": self.consumer_errors
+        }
+
+# Global webhook inbox
+webhook_inbox = WebhookInbox()
+
+async def main(command):
+    if command == "retry-dead":
+        print(f"Requeued {await webhook_inbox.retry_dead()} dead webhook events")
+    else:
+        print("Usage: python webhook_inbox.py retry-dead")
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else ""))
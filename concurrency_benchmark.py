@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Just Urbane - API Concurrency Benchmark
+Measures throughput and latency of the public and admin read endpoints as concurrency grows.
+
+Run it once against a build on blocking pymongo and once against the Motor build, on the same
+machine and database, then compare the two labels:
+
+    python concurrency_benchmark.py --label before
+    python concurrency_benchmark.py --label after
+    python concurrency_benchmark.py --compare
+
+Use a single uvicorn worker for both runs so the numbers show what one event loop can overlap.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import datetime
+
+import aiohttp
+
+DEFAULT_BASE_URL = os.getenv("BENCHMARK_BASE_URL", "http://localhost:8001")
+DEFAULT_REPORT = "concurrency_benchmark_report.json"
+
+class ConcurrencyBenchmark:
+    def __init__(self, base_url: str, requests_per_level: int, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.requests_per_level = requests_per_level
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.admin_headers = {}
+
+    async def discover_article(self, session: aiohttp.ClientSession) -> str:
+        """Slug (or id) of a published article for the single-article endpoint"""
+        async with session.get(f"{self.base_url}/api/articles?limit=1&view=card") as response:
+            articles = await response.json()
+        if not articles:
+            raise RuntimeError("No published articles - seed the database before benchmarking")
+        return articles[0].get("slug") or articles[0]["id"]
+
+    async def admin_login(self, session: aiohttp.ClientSession, username: str, password: str):
+        async with session.post(
+            f"{self.base_url}/api/admin/login",
+            json={"username": username, "password": password}
+        ) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Admin login failed: HTTP {response.status}")
+            token = (await response.json())["access_token"]
+        self.admin_headers = {"Authorization": f"Bearer {token}"}
+
+    async def run_level(self, session: aiohttp.ClientSession, path: str, concurrency: int, headers: dict) -> dict:
+        """Send requests_per_level requests to `path` with at most `concurrency` in flight"""
+        latencies = []
+        errors = 0
+        remaining = self.requests_per_level
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    async with session.get(f"{self.base_url}{path}", headers=headers) as response:
+                        await response.read()
+                        if response.status != 200:
+                            errors += 1
+                            continue
+                except Exception:
+                    errors += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+
+        return {
+            "concurrency": concurrency,
+            "requests": self.requests_per_level,
+            "errors": errors,
+            "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+            "mean_ms": round(statistics.mean(latencies), 2) if latencies else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99)
+        }
+
+    async def run(self, levels, admin_credentials=None) -> dict:
+        # Plain connector without a per-host cap so the client never becomes the bottleneck
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector, timeout=self.timeout) as session:
+            article = await self.discover_article(session)
+            endpoints = {
+                "article list": ("/api/articles?limit=20", {}),
+                "article cards": ("/api/articles?limit=20&view=card", {}),
+                "single article": (f"/api/articles/{article}", {}),
+                "categories": ("/api/categories", {}),
+            }
+            if admin_credentials:
+                await self.admin_login(session, *admin_credentials)
+                endpoints["admin dashboard"] = ("/api/admin/dashboard/stats", self.admin_headers)
+                endpoints["admin articles"] = ("/api/admin/articles/?limit=20", self.admin_headers)
+
+            results = {}
+            for name, (path, headers) in endpoints.items():
+                print(f"\n📊 {name} ({path})")
+                # Warm up connections and server-side caches before measuring
+                await self.run_level(session, path, 4, headers)
+                results[name] = []
+                for concurrency in levels:
+                    level = await self.run_level(session, path, concurrency, headers)
+                    results[name].append(level)
+                    print(f"   c={concurrency:<4} {level['requests_per_second']} req/s  "
+                          f"p50 {level['p50_ms']}ms  p95 {level['p95_ms']}ms  p99 {level['p99_ms']}ms  "
+                          f"errors {level['errors']}")
+            return results
+
+def compare(report: dict, before: str, after: str):
+    if before not in report or after not in report:
+        print(f"❌ Report needs both '{before}' and '{after}' runs")
+        return
+    print(f"\n📈 {before} → {after}")
+    print("=" * 60)
+    for name, after_levels in report[after]["results"].items():
+        before_levels = {level["concurrency"]: level for level in report[before]["results"].get(name, [])}
+        print(f"\n{name}")
+        for level in after_levels:
+            previous = before_levels.get(level["concurrency"])
+            if not previous or not previous["requests_per_second"] or not level["requests_per_second"]:
+                continue
+            speedup = level["requests_per_second"] / previous["requests_per_second"]
+            print(f"   c={level['concurrency']:<4} {previous['requests_per_second']:>8} → {level['requests_per_second']:>8} req/s "
+                  f"({speedup:.2f}x)  p95 {previous['p95_ms']} → {level['p95_ms']}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Just Urbane API concurrency benchmark")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    parser.add_argument("--label", default="run", help="Name stored in the report, e.g. before / after")
+    parser.add_argument("--levels", default="1,10,50,100,200", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per concurrency level")
+    parser.add_argument("--admin-user", default=None, help="Also benchmark admin endpoints as this user")
+    parser.add_argument("--admin-password", default=None)
+    parser.add_argument("--report", default=DEFAULT_REPORT)
+    parser.add_argument("--compare", action="store_true", help="Print before/after from the report and exit")
+    parser.add_argument("--before", default="before")
+    parser.add_argument("--after", default="after")
+    args = parser.parse_args()
+
+    report = {}
+    if os.path.exists(args.report):
+        with open(args.report) as f:
+            report = json.load(f)
+
+    if args.compare:
+        compare(report, args.before, args.after)
+        return
+
+    levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    admin_credentials = (args.admin_user, args.admin_password) if args.admin_user else None
+
+    print(f"🚀 Benchmarking {args.base_url} as '{args.label}'")
+    benchmark = ConcurrencyBenchmark(args.base_url, args.requests)
+    results = asyncio.run(benchmark.run(levels, admin_credentials))
+
+    report[args.label] = {
+        "base_url": args.base_url,
+        "timestamp": datetime.now().isoformat(),
+        "requests_per_level": args.requests,
+        "results": results
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Saved to {args.report}")
+
+    if args.before in report and args.after in report:
+        compare(report, args.before, args.after)
+
+if __name__ == "__main__":
+    main()
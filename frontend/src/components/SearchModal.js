@@ -1,8 +1,8 @@
-import React, { useState, useEffect, useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { Search, X, TrendingUp, Clock, ArrowUpRight, User, Calendar } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { useArticles } from '../hooks/useArticles';
+import { useSearch, useSuggestions } from '../hooks/useSearch';
 import { formatDateShort } from '../utils/formatters';
 
 const SearchModal = ({ isOpen, onClose }) => {
@@ -10,24 +10,20 @@ const SearchModal = ({ isOpen, onClose }) => {
   const [recentSearches, setRecentSearches] = useState([]);
   const navigate = useNavigate();
 
-  // Fetch articles for real-time search
-  const { data: articles = [], isLoading } = useArticles({ limit: 50 });
+  const [debouncedQuery, setDebouncedQuery] = useState('');
 
-  // Real-time search results
-  const searchResults = useMemo(() => {
-    if (!searchQuery.trim() || !articles.length) return [];
+  // Wait for a pause in typing before asking the server
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedQuery(searchQuery.trim()), 200);
+    return () => clearTimeout(timer);
+  }, [searchQuery]);
+
+  // Real-time search results, ranked server-side
+  const { data: searchData, isLoading } = useSearch({ q: debouncedQuery, limit: 6 });
+  const searchResults = searchData?.results || [];
 
-    const query = searchQuery.toLowerCase();
-    return articles.filter(article => {
-      return (
-        article.title.toLowerCase().includes(query) ||
-        article.dek?.toLowerCase().includes(query) ||
-        article.body?.toLowerCase().includes(query) ||
-        article.author_name?.toLowerCase().includes(query) ||
-        article.category?.toLowerCase().includes(query)
-      );
-    }).slice(0, 6); // Show top 6 results
-  }, [articles, searchQuery]);
+  // Prefix suggestions are cheap, so they follow every keystroke
+  const { data: suggestions = [] } = useSuggestions(searchQuery.trim(), 6);
 
   // Get article route helper
   const getArticleRoute = (article) => {
@@ -83,6 +79,17 @@ const SearchModal = ({ isOpen, onClose }) => {
     onClose();
   };
 
+  const handleSuggestionClick = (suggestion) => {
+    if (suggestion.type === 'article' && suggestion.slug) {
+      saveToRecentSearches(suggestion.text);
+      navigate(getArticleRoute(suggestion));
+      onClose();
+      setSearchQuery('');
+      return;
+    }
+    handleQuickSearch(suggestion.text);
+  };
+
   const handleArticleClick = (article) => {
     saveToRecentSearches(article.title);
     onClose();
@@ -183,6 +190,25 @@ const SearchModal = ({ isOpen, onClose }) => {
 
               {/* Search Content */}
               <div className="max-h-96 overflow-y-auto">
+                {/* Suggestions */}
+                {searchQuery.trim() && suggestions.length > 0 && (
+                  <div className="px-6 pt-4 flex flex-wrap gap-2">
+                    {suggestions.map((suggestion) => (
+                      <button
+                        key={`${suggestion.type}-${suggestion.slug || suggestion.text}`}
+                        onClick={() => handleSuggestionClick(suggestion)}
+                        className="flex items-center gap-1 px-3 py-1.5 bg-gray-50 hover:bg-gray-100 rounded-full text-sm text-gray-700 transition-colors"
+                      >
+                        {suggestion.type === 'author' ? <User className="h-3 w-3 text-gray-400" /> : <Search className="h-3 w-3 text-gray-400" />}
+                        <span className="line-clamp-1">{suggestion.text}</span>
+                        {suggestion.type !== 'article' && (
+                          <span className="text-xs text-gray-400 capitalize">{suggestion.type}</span>
+                        )}
+                      </button>
+                    ))}
+                  </div>
+                )}
+
                 {/* Real-time Search Results */}
                 {searchQuery.trim() && (
                   <div className="p-6 border-b border-gray-100">
@@ -23,6 +23,31 @@ export const useArticle = (id) => {
   );
 };
 
+export const useRelatedArticles = (id, limit = 6) => {
+  return useQuery(
+    ['articles', 'related', id, limit],
+    () => articlesApi.getRelated(id, limit),
+    {
+      select: (data) => data.data,
+      enabled: !!id,
+      staleTime: 5 * 60 * 1000, // 5 minutes
+    }
+  );
+};
+
+// Several articles by id or slug in one request; missing ones come back as null
+export const useArticlesBatch = (ids = [], view = 'card') => {
+  return useQuery(
+    ['articles', 'batch', ids, view],
+    () => articlesApi.getBatch(ids, view),
+    {
+      select: (data) => data.data.results.map((result) => result.article),
+      enabled: ids.length > 0,
+      staleTime: 5 * 60 * 1000, // 5 minutes
+    }
+  );
+};
+
 export const useFeaturedArticles = () => {
   return useQuery(
     ['articles', 'featured'],
@@ -0,0 +1,28 @@
+import { useQuery } from 'react-query';
+import { searchApi } from '../utils/api';
+
+export const useSearch = (params = {}) => {
+  return useQuery(
+    ['search', params],
+    () => searchApi.search(params),
+    {
+      select: (data) => data.data,
+      enabled: !!params.q,
+      keepPreviousData: true,
+      staleTime: 60 * 1000, // 1 minute
+    }
+  );
+};
+
+export const useSuggestions = (prefix, limit = 8) => {
+  return useQuery(
+    ['search-suggestions', prefix, limit],
+    () => searchApi.suggest(prefix, limit),
+    {
+      select: (data) => data.data.suggestions,
+      enabled: !!prefix,
+      keepPreviousData: true,
+      staleTime: 30 * 1000, // matches the endpoint's Cache-Control
+    }
+  );
+};
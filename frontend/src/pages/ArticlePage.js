@@ -6,7 +6,7 @@ import { motion } from 'framer-motion';
 import LoadingSpinner, { SkeletonArticle } from '../components/LoadingSpinner';
 import PremiumContentGate from '../components/PremiumContentGate';
 import { useAuth } from '../context/AuthContext';
-import { useArticle, useArticles } from '../hooks/useArticles';
+import { useArticle, useRelatedArticles } from '../hooks/useArticles';
 import { formatDate, formatReadingTime } from '../utils/formatters';
 
 const ArticlePage = () => {
@@ -14,7 +14,7 @@ const ArticlePage = () => {
   const navigate = useNavigate();
   const { user, isAuthenticated } = useAuth();
   const { data: article, isLoading, error } = useArticle(slug);
-  const { data: allArticles } = useArticles();
+  const { data: relatedArticles = [] } = useRelatedArticles(slug, 3);
 
 
   useEffect(() => {
@@ -357,6 +357,34 @@ const ArticlePage = () => {
             </motion.div>
           )}
 
+          {/* Related Articles */}
+          {relatedArticles.length > 0 && (
+            <motion.div 
+              className="mt-12 pt-8 border-t border-gray-200"
+              initial={{ opacity: 0 }}
+              animate={{ opacity: 1 }}
+              transition={{ duration: 0.6, delay: 0.7 }}
+            >
+              <h3 className="font-serif text-2xl font-bold text-gray-900 mb-6">Related Articles</h3>
+              <div className="grid grid-cols-1 sm:grid-cols-3 gap-6">
+                {relatedArticles.map((related) => (
+                  <Link key={related.id || related.slug} to={`/article/${related.slug}`} className="group">
+                    <img
+                      src={related.hero_image}
+                      alt={related.title}
+                      className="w-full h-40 object-cover rounded-lg mb-3"
+                      loading="lazy"
+                    />
+                    <span className="text-xs text-gray-500 uppercase tracking-wide">{related.category}</span>
+                    <h4 className="font-medium text-gray-900 group-hover:text-gray-600 transition-colors line-clamp-2">
+                      {related.title}
+                    </h4>
+                  </Link>
+                ))}
+              </div>
+            </motion.div>
+          )}
+
           {/* Back to Category */}
           <motion.div 
             className="mt-16 pt-8 border-t border-gray-200"
@@ -10,7 +10,7 @@ const CategoryPage = () => {
   const { slug } = useParams();
   const [searchQuery, setSearchQuery] = useState('');
 
-  const { data: articles = [], isLoading, error } = useCategoryArticles(slug, { limit: 50 });
+  const { data: articles = [], isLoading, error } = useCategoryArticles(slug, { limit: 50, view: 'card' });
 
   // Filter articles
   const filteredArticles = useMemo(() => {
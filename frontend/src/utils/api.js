@@ -40,15 +40,22 @@ api.interceptors.response.use(
 export const articlesApi = {
   getAll: (params = {}) => api.get('/articles', { params }),
   getById: (id) => api.get(`/articles/${id}`),
+  getRelated: (id, limit = 6) => api.get(`/articles/${id}/related`, { params: { limit } }),
+  getBatch: (ids, view = 'card') => api.post('/articles/batch', { ids, view }),
   create: (data) => api.post('/articles', data),
-  getFeatured: () => api.get('/articles?featured=true&limit=6'),
-  getTrending: () => api.get('/articles?trending=true&limit=8'),
+  getFeatured: () => api.get('/articles?featured=true&limit=6&view=card'),
+  getTrending: () => api.get('/articles?trending=true&limit=8&view=card'),
   getByCategory: (category, params = {}) => api.get('/articles', { params: { category, ...params } }),
   getBySubcategory: (category, subcategory, params = {}) => api.get('/articles', { params: { category, subcategory, ...params } }),
   getFree: (params = {}) => api.get('/free-articles', { params }),
   getPremium: (params = {}) => api.get('/premium-articles', { params })
 };
 
+export const searchApi = {
+  search: (params = {}) => api.get('/search', { params }),
+  suggest: (prefix, limit = 8) => api.get('/search/suggest', { params: { prefix, limit } })
+};
+
 export const categoriesApi = {
   getAll: () => api.get('/categories'),
   create: (data) => api.post('/categories', data)